@@ -1,6 +1,7 @@
 # pyright: reportMissingImports=false, reportMissingModuleSource=false, reportUnknownVariableType=false, reportUnknownArgumentType=false, reportUnknownParameterType=false, reportUnknownMemberType=false, reportGeneralTypeIssues=false
 import streamlit as st  # pyright: ignore[reportUndefinedVariable]
 import pandas as pd # pyright: ignore[reportMissingModuleSource]
+import numpy as np  # pyright: ignore[reportMissingModuleSource]
 from datetime import datetime, time as time_type, timezone, timedelta
 from typing import Any
 import os
@@ -14,6 +15,11 @@ import uuid  # for generating stable row IDs
 import json
 import io
 import html
+import copy
+import threading
+import sqlite3
+import bisect
+import heapq
 import openpyxl
 from openpyxl.utils import get_column_letter
 
@@ -512,42 +518,12 @@ def compute_free_minutes_for_assistant(schedule_df: pd.DataFrame, assistant: str
     now_dt = now_ist()
     now_min = now_dt.hour * 60 + now_dt.minute
 
-    def _assigned(row) -> bool:
-        for col in ["FIRST", "SECOND", "Third"]:
-            if col in row and str(row.get(col, "")).strip().upper() == assistant_upper:
-                return True
-        return False
-
-    def _minutes(val):
-        try:
-            if val is None or (isinstance(val, float) and pd.isna(val)):
-                return None
-            return int(val)
-        except Exception:
-            try:
-                return time_to_minutes(val)
-            except Exception:
-                return None
-
     next_in = None
-    for _, row in schedule_df.iterrows():
-        if not _assigned(row):
-            continue
-        status = str(row.get("STATUS", "")).strip().upper()
-        if any(s in status for s in ["CANCELLED", "DONE", "COMPLETED", "SHIFTED"]):
-            continue
-        in_min = _minutes(row.get("In_min"))
-        out_min = _minutes(row.get("Out_min"))
-        if in_min is None:
-            in_min = _minutes(row.get("In Time")) or _minutes(row.get("In Time Str"))
-        if out_min is None:
-            out_min = _minutes(row.get("Out Time")) or _minutes(row.get("Out Time Str"))
+    for _, _, in_min, out_min, _, _ in _assistant_appointments(assistant_upper, schedule_df):
         if in_min is None:
             continue
         if out_min is None:
             out_min = in_min
-        if out_min < in_min:
-            out_min += 1440
         if in_min <= now_min <= out_min:
             return 0
         if in_min > now_min:
@@ -2357,6 +2333,136 @@ def time_to_minutes(time_value: Any) -> int | None:
         return None
     return t.hour * 60 + t.minute
 
+# ================ Vectorized Time Parsing ================
+# Column-at-a-time equivalent of _coerce_to_time_obj. Common formats are parsed
+# with pandas string ops / NumPy; anything unusual goes through the scalar parser
+# so results stay identical.
+_VEC_AMPM_RE = r"^([0-9]{1,2}):([0-9]{1,2})(?::([0-9]{1,2}))? ?([AaPp][Mm])$"
+_VEC_COLON_RE = r"^([0-9]{1,2}):([0-9]{1,2})(?::[0-9]{1,2})?$"
+_VEC_DOT_RE = r"^([0-9]{1,2})\.([0-9]{1,2})$"
+_VEC_BLANK_STRINGS = ("", "N/A", "NAT", "NONE")
+_MINUTE_TO_STR = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(1440)] + ["N/A"], dtype=object)
+_MINUTE_TO_TIME = np.array([time_type(m // 60, m % 60) for m in range(1440)] + [None], dtype=object)
+
+
+def _numeric_times_to_minutes(values: np.ndarray) -> np.ndarray:
+    """Minutes for float values (Excel serial 0-1 or 9.30 decimals); -1 when invalid."""
+    out = np.full(len(values), -1, dtype=np.int64)
+    with np.errstate(invalid="ignore"):
+        serial = (values >= 0) & (values <= 1)
+        total = np.rint(values[serial] * 1440).astype(np.int64)
+        out[serial] = ((total // 60) % 24) * 60 + total % 60
+
+        dec_mask = (values > 1) & (values < 24)
+        v = values[dec_mask]
+        hours = np.trunc(v).astype(np.int64)
+        frac = v - hours
+        minutes = np.rint(frac * 100).astype(np.int64)
+        over = minutes > 59
+        minutes[over] = np.rint(frac[over] * 60).astype(np.int64)
+        carry = minutes >= 60
+        hours[carry] = (hours[carry] + 1) % 24
+        minutes[carry] = 0
+        out[dec_mask] = hours * 60 + minutes
+    return out
+
+
+def _times_to_minutes_vectorized(series: pd.Series) -> pd.Series:
+    """Vectorized time_to_minutes: returns an Int64 Series of minutes since midnight."""
+    n = len(series)
+    out = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return pd.Series(out, index=series.index, dtype="Int64")
+
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        out = _numeric_times_to_minutes(series.to_numpy(dtype="float64", na_value=np.nan))
+        return pd.Series(out, index=series.index).where(out >= 0).astype("Int64")
+
+    values = series.to_numpy(dtype=object)
+    # 0 = missing, 1 = string, 2 = float/int, 3 = time, 4 = needs scalar parser
+    kinds = np.fromiter(
+        (
+            1 if isinstance(v, str)
+            else 3 if isinstance(v, time_type)
+            else 2 if isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_)) and not pd.isna(v)
+            else 0 if v is None or v is pd.NA or (isinstance(v, float) or v is pd.NaT)
+            else 4
+            for v in values
+        ),
+        dtype=np.int8,
+        count=n,
+    )
+
+    num_idx = np.flatnonzero(kinds == 2)
+    if len(num_idx):
+        out[num_idx] = _numeric_times_to_minutes(values[num_idx].astype("float64"))
+
+    time_idx = np.flatnonzero(kinds == 3)
+    if len(time_idx):
+        out[time_idx] = [t.hour * 60 + t.minute for t in values[time_idx]]
+
+    leftover = [int(i) for i in np.flatnonzero(kinds == 4)]
+    str_idx = np.flatnonzero(kinds == 1)
+    if len(str_idx):
+        strs = pd.Series(values[str_idx], dtype=object).str.strip().str.replace(r"\s+", " ", regex=True)
+        unresolved = np.ones(len(str_idx), dtype=bool)
+        unresolved[strs.str.upper().isin(_VEC_BLANK_STRINGS).to_numpy()] = False
+
+        ampm = strs.str.extract(_VEC_AMPM_RE)
+        h = pd.to_numeric(ampm[0], errors="coerce").to_numpy()
+        m = pd.to_numeric(ampm[1], errors="coerce").to_numpy()
+        sec = pd.to_numeric(ampm[2], errors="coerce").fillna(0).to_numpy()
+        with np.errstate(invalid="ignore"):
+            ok = unresolved & (h >= 1) & (h <= 12) & (m <= 59) & (sec <= 59)
+        if ok.any():
+            is_pm = ampm[3].str.upper().eq("PM").to_numpy(dtype=bool, na_value=False)
+            h24 = (h[ok] % 12) + np.where(is_pm[ok], 12, 0)
+            out[str_idx[ok]] = (h24 * 60 + m[ok]).astype(np.int64)
+            unresolved &= ~ok
+
+        for pattern in (_VEC_COLON_RE, _VEC_DOT_RE):
+            parts = strs.str.extract(pattern)
+            h = pd.to_numeric(parts[0], errors="coerce").to_numpy()
+            m = pd.to_numeric(parts[1], errors="coerce").to_numpy()
+            with np.errstate(invalid="ignore"):
+                ok = unresolved & (h < 24) & (m < 60)
+            if ok.any():
+                out[str_idx[ok]] = (h[ok] * 60 + m[ok]).astype(np.int64)
+                unresolved &= ~ok
+
+        leftover.extend(int(i) for i in str_idx[unresolved])
+
+    for i in leftover:
+        mins = time_to_minutes(values[i])
+        out[i] = -1 if mins is None else mins
+
+    return pd.Series(out, index=series.index).where(out >= 0).astype("Int64")
+
+
+def _minutes_to_time_columns(minutes: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Build the HH:MM string and datetime.time columns from Int64 minutes."""
+    codes = minutes.fillna(1440).to_numpy(dtype=np.int64) if len(minutes) else np.array([], dtype=np.int64)
+    return (
+        pd.Series(_MINUTE_TO_STR[codes], index=minutes.index, dtype=object),
+        pd.Series(_MINUTE_TO_TIME[codes], index=minutes.index, dtype=object),
+    )
+
+
+def _add_schedule_time_columns(df: pd.DataFrame) -> None:
+    """Add In/Out Time Str, Time Obj and In_min/Out_min to df in one parse per column."""
+    in_min = _times_to_minutes_vectorized(df["In Time"])
+    out_min = _times_to_minutes_vectorized(df["Out Time"])
+    in_str, in_obj = _minutes_to_time_columns(in_min)
+    out_str, out_obj = _minutes_to_time_columns(out_min)
+    df["In Time Str"] = in_str
+    df["Out Time Str"] = out_str
+    df["In Time Obj"] = in_obj
+    df["Out Time Obj"] = out_obj
+    df["In_min"] = in_min
+    df["Out_min"] = out_min
+    # Handle possible overnight cases
+    df.loc[df["Out_min"] < df["In_min"], "Out_min"] += 1440
+
 # ================ DEPARTMENT & STAFF CONFIGURATION ================
 # Departments with their doctors and assistants
 # NOTE: Keep these lists as the single source of truth for dropdowns + allocation.
@@ -2473,11 +2579,22 @@ def _seed_supabase_profiles_if_needed(client) -> None:
 
 
 def _refresh_staff_options_from_supabase(client):
-    """Override ALL_ASSISTANTS/ALL_DOCTORS and WEEKLY_OFF from Supabase profiles."""
-    global ALL_ASSISTANTS, ALL_DOCTORS, WEEKLY_OFF
+    """Override ALL_ASSISTANTS/ALL_DOCTORS and WEEKLY_OFF from Supabase profiles.
+
+    Falls back to the locally cached profiles when Supabase is unreachable (or client is None).
+    """
+    global ALL_ASSISTANTS, ALL_DOCTORS, WEEKLY_OFF, STAFF_PROFILE_DEPARTMENTS, _department_index_current
     try:
-        resp = client.table(PROFILE_SUPABASE_TABLE).select("*").execute()
-        data = resp.data or []
+        local_key = f"profiles:{PROFILE_SUPABASE_TABLE}"
+        try:
+            if client is None:
+                raise RuntimeError("Supabase client unavailable")
+            resp = client.table(PROFILE_SUPABASE_TABLE).select("*").execute()
+            data = resp.data or []
+            _local_cache_put(local_key, None, data)
+        except Exception:
+            hit = _local_cache_get(local_key)
+            data = hit[1] if hit is not None and isinstance(hit[1], list) else []
         df = pd.DataFrame(data)
         if df.empty:
             return
@@ -2489,6 +2606,14 @@ def _refresh_staff_options_from_supabase(client):
             ALL_ASSISTANTS = _unique_preserve_order(assistants)
         if doctors:
             ALL_DOCTORS = _unique_preserve_order(doctors)
+        # Departments set on profiles cover staff missing from DEPARTMENTS
+        kinds = {PROFILE_DOCTOR_SHEET: "doctor", PROFILE_ASSISTANT_SHEET: "assistant"}
+        STAFF_PROFILE_DEPARTMENTS = [
+            (kinds[kind], name, dept)
+            for kind, name, dept in zip(df["kind"], df["name"], df["department"])
+            if kind in kinds and dept in DEPARTMENTS
+        ]
+        _department_index_current = None
         # Weekly off mapping
         week_map: dict[int, list[str]] = {i: [] for i in range(7)}
         if "weekly_off" in df.columns:
@@ -2595,21 +2720,77 @@ DEPARTMENTS = {
 ALL_DOCTORS = _unique_preserve_order(DEPARTMENTS["PROSTHO"]["doctors"] + DEPARTMENTS["ENDO"]["doctors"])
 ALL_ASSISTANTS = _unique_preserve_order(DEPARTMENTS["PROSTHO"]["assistants"] + DEPARTMENTS["ENDO"]["assistants"])
 
+# Name -> department index. A name matches a configured name when either key is a
+# suffix of the other (so "NIMAI" and "DR.NIMAI" both match "DR. NIMAI"); the first
+# match in DEPARTMENTS order wins, then departments set on staff profiles.
+# Built once per distinct staff configuration; lookups are memoised per key.
+STAFF_PROFILE_DEPARTMENTS: list[tuple[str, str, str]] = []  # (kind, name, department) from profiles
+_department_index_current: dict[str, Any] | None = None
+
+
+@st.cache_resource
+def _department_index_cache() -> dict:
+    """Process-wide {"signature", "index"} for the department index."""
+    return {"signature": None, "index": None}
+
+
+def _build_department_index(entries: list[tuple[str, str, str]]) -> dict[str, Any]:
+    """entries: (kind, name, department) in priority order."""
+    index: dict[str, Any] = {}
+    for kind in ("doctor", "assistant"):
+        exact: dict[str, tuple[int, str]] = {}
+        suffixes: dict[str, tuple[int, str]] = {}
+        for order, (entry_kind, name, dept) in enumerate(entries):
+            if entry_kind != kind:
+                continue
+            key = _norm_staff_key(name)
+            if not key:
+                continue
+            exact.setdefault(key, (order, dept))
+            for i in range(len(key)):
+                suffixes.setdefault(key[i:], (order, dept))
+        index[kind] = {"exact": exact, "suffixes": suffixes, "memo": {}}
+    return index
+
+
+def _department_index() -> dict[str, Any]:
+    global _department_index_current
+    if _department_index_current is None:
+        entries = [
+            (kind, name, dept)
+            for dept, config in DEPARTMENTS.items()
+            for kind, names in (("doctor", config["doctors"]), ("assistant", config["assistants"]))
+            for name in names
+        ] + list(STAFF_PROFILE_DEPARTMENTS)
+        signature = tuple(entries)
+        holder = _department_index_cache()
+        if holder["signature"] != signature:
+            holder["index"] = _build_department_index(entries)
+            holder["signature"] = signature
+        _department_index_current = holder["index"]
+    return _department_index_current
+
+
+def _lookup_department(kind: str, name: str) -> str:
+    table = _department_index()[kind]
+    memo = table["memo"]
+    dept = memo.get(name)
+    if dept is None:
+        key = _norm_staff_key(name)
+        # Configured names that are a suffix of the key, or that the key is a suffix of
+        matches = [table["exact"][key[i:]] for i in range(len(key)) if key[i:] in table["exact"]]
+        if key in table["suffixes"]:
+            matches.append(table["suffixes"][key])
+        dept = min(matches)[1] if matches else ""
+        memo[name] = dept
+    return dept
+
+
 def get_department_for_doctor(doctor_name: str) -> str:
     """Get the department a doctor belongs to"""
     if not doctor_name:
         return ""
-    doc_key = _norm_staff_key(doctor_name)
-    if not doc_key:
-        return ""
-    for dept, config in DEPARTMENTS.items():
-        for d in config["doctors"]:
-            d_key = _norm_staff_key(d)
-            if not d_key:
-                continue
-            if doc_key == d_key or doc_key.endswith(d_key) or d_key.endswith(doc_key):
-                return dept
-    return ""
+    return _lookup_department("doctor", doctor_name)
 
 def get_assistants_for_department(department: str) -> list[str]:
     """Get list of assistants for a specific department"""
@@ -2622,66 +2803,394 @@ def get_department_for_assistant(assistant_name: str) -> str:
     """Get the department an assistant belongs to"""
     if not assistant_name:
         return ""
-    assist_key = _norm_staff_key(assistant_name)
-    if not assist_key:
-        return ""
-    for dept, config in DEPARTMENTS.items():
-        for a in config["assistants"]:
-            a_key = _norm_staff_key(a)
-            if not a_key:
-                continue
-            if assist_key == a_key or assist_key.endswith(a_key) or a_key.endswith(assist_key):
-                return dept
     # ANSHIKA is shared between departments
-    return "SHARED"
+    return _lookup_department("assistant", assistant_name) or ("SHARED" if _norm_staff_key(assistant_name) else "")
+
+# ================ ALLOCATION RULES ENGINE ================
+# Allocation rules come from allocation_rules.json when it exists and is valid,
+# otherwise from DEPARTMENTS above. Rules are compiled into rank tables keyed by
+# (doctor, time segment, FIRST assistant) so the allocator does one dict lookup
+# per row and role. The file is re-read whenever its mtime changes.
+ALLOCATION_RULES_PATH = os.getenv(
+    "TDB_ALLOCATION_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "allocation_rules.json"),
+)
+ALLOCATION_ROLES = ("FIRST", "SECOND", "Third")
+ALLOCATION_FALLBACK_TIER = 4  # "any department assistant": no rule preference
+ALLOCATION_GLOBAL_DEFAULTS = {
+    "cross_department_fallback": False,
+    "use_profile_role_flags": False,
+    "load_balance": False,
+}
+
+
+def _rule_name_list(value: Any, where: str) -> list[str]:
+    if not isinstance(value, list) or not all(isinstance(x, str) and x.strip() for x in value):
+        raise ValueError(f"{where}: expected a list of names")
+    return [x.strip().upper() for x in value]
+
+
+def _rule_name_groups(value: Any, where: str) -> list[list[str]]:
+    """A preference list; a nested list ranks its names equally: ["A", ["B", "C"]]."""
+    if not isinstance(value, list):
+        raise ValueError(f"{where}: expected a list of names")
+    return [_rule_name_list(x if isinstance(x, list) else [x], where) for x in value]
+
+
+def _parse_time_overrides(value: Any, where: str) -> list[tuple[int, str]]:
+    """Accept [(13, "ARCHANA")], [[13, "ARCHANA"]] or [{"after_hour": 13, "assistant": "ARCHANA"}]."""
+    if not isinstance(value, list):
+        raise ValueError(f"{where}: expected a list")
+    out: list[tuple[int, str]] = []
+    for item in value:
+        if isinstance(item, dict):
+            hour, name = item.get("after_hour"), item.get("assistant")
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            hour, name = item
+        else:
+            raise ValueError(f"{where}: bad entry {item!r}")
+        if isinstance(hour, bool) or not isinstance(hour, (int, float)) or not 0 <= hour < 24:
+            raise ValueError(f"{where}: after_hour must be a number between 0 and 24")
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"{where}: assistant must be a name")
+        out.append((int(round(hour * 60)), name.strip().upper()))
+    return out
+
+
+def _compile_role_rule(rule: dict, assistants: list[str], where: str) -> dict:
+    """Compile one role's rule into {"thresholds", "doctors", "firsts", "ranks"}.
+
+    ranks[(doctor_key, segment, first)] maps assistant -> (tier, position, order within
+    an equal-rank group); tiers are default list, doctor list, when_first_is list, time
+    overrides, any department assistant (one group).
+    """
+    if not isinstance(rule, dict):
+        raise ValueError(f"{where}: expected an object")
+    default = _rule_name_groups(rule.get("default", []), f"{where}.default")
+    doctor_lists: dict[str, list[list[str]]] = {}
+    doctor_overrides = rule.get("doctor_overrides", {})
+    if not isinstance(doctor_overrides, dict):
+        raise ValueError(f"{where}.doctor_overrides: expected an object")
+    # Legacy layout: doctor names as keys directly on the rule
+    legacy = {k: v for k, v in rule.items() if k not in {"default", "doctor_overrides", "when_first_is", "time_override"}}
+    for doctor, names in {**legacy, **doctor_overrides}.items():
+        doc_key = _norm_staff_key(doctor)
+        if doc_key:
+            doctor_lists[doc_key] = _rule_name_groups(names, f"{where}.{doctor}")
+    when_first = rule.get("when_first_is", {})
+    if not isinstance(when_first, dict):
+        raise ValueError(f"{where}.when_first_is: expected an object")
+    first_lists = {str(k).strip().upper(): _rule_name_groups(v, f"{where}.when_first_is.{k}") for k, v in when_first.items()}
+    overrides = _parse_time_overrides(rule.get("time_override", []), f"{where}.time_override")
+    thresholds = sorted({minute for minute, _ in overrides})
+
+    ranks: dict[tuple, dict[str, tuple[int, int, int]]] = {}
+    for doc_key in [None] + list(doctor_lists):
+        for segment in range(len(thresholds) + 1):
+            # Overrides apply once the appointment starts at/after their hour; keep listed order
+            active = [[name] for minute, name in overrides if segment and minute <= thresholds[segment - 1]]
+            for first in [None] + list(first_lists):
+                tiers = [default, doctor_lists.get(doc_key, []), first_lists.get(first, []), active, [assistants]]
+                table: dict[str, tuple[int, int, int]] = {}
+                for tier, groups in enumerate(tiers):
+                    for pos, names in enumerate(groups):
+                        for sub, name in enumerate(names):
+                            table.setdefault(name, (tier, pos, sub))
+                ranks[(doc_key, segment, first)] = table
+    return {"thresholds": thresholds, "doctors": set(doctor_lists), "firsts": set(first_lists), "ranks": ranks}
+
+
+def _compile_allocation_rules(departments: dict, global_flags: dict | None = None, source: str = "built-in") -> dict:
+    compiled: dict[str, dict] = {}
+    for dept, config in departments.items():
+        where = f"departments.{dept}"
+        if not isinstance(config, dict):
+            raise ValueError(f"{where}: expected an object")
+        assistants = _rule_name_list(config.get("assistants", []), f"{where}.assistants")
+        _rule_name_list(config.get("doctors", []), f"{where}.doctors")
+        rules = config.get("allocation_rules", {})
+        if not isinstance(rules, dict):
+            raise ValueError(f"{where}.allocation_rules: expected an object")
+        unknown = set(rules) - set(ALLOCATION_ROLES)
+        if unknown:
+            raise ValueError(f"{where}.allocation_rules: unknown role(s) {sorted(unknown)}")
+        compiled[str(dept).strip().upper()] = {
+            "assistants": _unique_preserve_order(assistants),
+            "roles": {
+                role: _compile_role_rule(rule, _unique_preserve_order(assistants), f"{where}.allocation_rules.{role}")
+                for role, rule in rules.items()
+            },
+        }
+    flags = dict(ALLOCATION_GLOBAL_DEFAULTS)
+    for key, value in (global_flags or {}).items():
+        if key not in flags or not isinstance(value, bool):
+            raise ValueError(f"global.{key}: unknown flag or not true/false")
+        flags[key] = value
+    return {"departments": compiled, "global": flags, "source": source, "error": ""}
+
+
+def _load_allocation_rules_file(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as fh:
+        raw = json.load(fh)
+    if not isinstance(raw, dict) or not isinstance(raw.get("departments"), dict):
+        raise ValueError("expected an object with a 'departments' object")
+    if raw.get("version", 1) != 1:
+        raise ValueError(f"unsupported version {raw.get('version')!r}")
+    global_flags = raw.get("global", {})
+    if not isinstance(global_flags, dict):
+        raise ValueError("global: expected an object")
+    # Departments missing from the file keep their built-in rules
+    departments = {dept: cfg for dept, cfg in DEPARTMENTS.items()}
+    departments.update({str(k).strip().upper(): v for k, v in raw["departments"].items()})
+    return _compile_allocation_rules(departments, global_flags, source=os.path.basename(path))
+
+
+@st.cache_resource
+def _allocation_rules_state() -> dict:
+    """Process-wide {"mtime", "rules"} for the compiled rules."""
+    return {"mtime": None, "rules": None}
+
+
+def get_allocation_rules() -> dict:
+    """Compiled allocation rules, reloaded when allocation_rules.json changes."""
+    state = _allocation_rules_state()
+    try:
+        mtime = os.path.getmtime(ALLOCATION_RULES_PATH)
+    except OSError:
+        mtime = None
+    if state["rules"] is not None and state["mtime"] == mtime:
+        return state["rules"]
+
+    builtin_error = ""
+    if mtime is not None:
+        try:
+            rules = _load_allocation_rules_file(ALLOCATION_RULES_PATH)
+        except Exception as e:
+            rules = None
+            builtin_error = f"{os.path.basename(ALLOCATION_RULES_PATH)}: {e}"
+    else:
+        rules = None
+    if rules is None:
+        rules = _compile_allocation_rules(DEPARTMENTS)
+        rules["error"] = builtin_error
+    state["mtime"], state["rules"] = mtime, rules
+    return rules
+
+
+def _allocation_role_ranks(
+    rules: dict,
+    department: str,
+    role: str,
+    doctor: str,
+    appt_minute: int,
+    first_assistant: str = "",
+) -> dict[str, tuple[int, int, int]]:
+    """Rank of each assistant for a role: (rule tier, position in that tier's list, order
+    within an equal-rank group). Names sharing tier and position are tied."""
+    dept_rules = rules["departments"].get(str(department).strip().upper())
+    if dept_rules is None:
+        return {a.upper(): (ALLOCATION_FALLBACK_TIER, 0, i) for i, a in enumerate(get_assistants_for_department(department))}
+    role_rules = dept_rules["roles"].get(role)
+    if role_rules is None:
+        # No rule for this role: any free department assistant, in department order
+        return {a: (ALLOCATION_FALLBACK_TIER, 0, i) for i, a in enumerate(dept_rules["assistants"])}
+    doc_key = _norm_staff_key(doctor)
+    first_key = str(first_assistant or "").strip().upper() if role == "SECOND" else ""
+    return role_rules["ranks"][(
+        doc_key if doc_key in role_rules["doctors"] else None,
+        bisect.bisect_right(role_rules["thresholds"], appt_minute),
+        first_key if first_key in role_rules["firsts"] else None,
+    )]
+
 
 # ================ TIME BLOCKING SYSTEM ================
-# Initialize time blocks in session state
-if "time_blocks" not in st.session_state:
-    st.session_state.time_blocks = []  # List of {assistant, start_time, end_time, reason, date}
+# Time blocks live in one process-wide store indexed by date, then assistant;
+# each (date, assistant) list is kept sorted by (start, end, id) with minutes
+# precomputed, so lookups and add/remove are bisects. Blocks are persisted on
+# their own (see "Time Block Persistence"); the Excel backend keeps them in the
+# schedule meta instead.
+TIME_BLOCK_RELOAD_SECONDS = 30
+_time_blocks_checked = False  # store freshness checked during this rerun
+
+
+@st.cache_resource
+def _time_block_store() -> dict[str, Any]:
+    """Process-wide time-block store; hold "lock" while reading or changing it."""
+    return {
+        "lock": threading.RLock(),
+        "source": None,  # backend the blocks were loaded from
+        "mode": "meta",  # "table" (own table/worksheet) or "meta" (schedule meta)
+        "error": "",
+        "loaded_at": 0.0,
+        "by_date": {},  # date -> assistant -> blocks sorted by _time_block_sort_key
+        "by_id": {},
+        "seq": 0,  # insertion counter: keeps "first added" order for messages
+        "version": 0,
+        "meta_sig": None,
+        "meta_checked": False,
+        "tables": {},  # date -> {"version", "by_assistant"} interval tables
+    }
+
+
+def _time_block_sort_key(block: dict) -> tuple:
+    return (block["start_min"], block["end_min"], block["id"])
+
+
+def _make_time_block(
+    assistant: Any,
+    date: Any,
+    start_time: Any,
+    end_time: Any,
+    reason: Any = "Backend Work",
+    block_id: str | None = None,
+) -> dict | None:
+    """Build a store record (None when assistant, date or times are missing)."""
+    start_obj = _coerce_to_time_obj(start_time)
+    end_obj = _coerce_to_time_obj(end_time)
+    assistant = str(assistant or "").strip().upper()
+    date = str(date or "").strip()
+    if not assistant or not date or start_obj is None or end_obj is None:
+        return None
+    start_min = start_obj.hour * 60 + start_obj.minute
+    end_min = end_obj.hour * 60 + end_obj.minute
+    if end_min < start_min:
+        end_min += 1440
+    return {
+        "id": str(block_id or uuid.uuid4()),
+        "assistant": assistant,
+        "date": date,
+        "reason": str(reason or "Backend Work").strip() or "Backend Work",
+        "start_time": start_obj,
+        "end_time": end_obj,
+        "start_min": start_min,
+        "end_min": end_min,
+    }
+
+
+def _store_insert(store: dict, block: dict) -> None:
+    _store_remove(store, block["id"])
+    store["seq"] += 1
+    block["seq"] = store["seq"]
+    day = store["by_date"].setdefault(block["date"], {})
+    bisect.insort(day.setdefault(block["assistant"], []), block, key=_time_block_sort_key)
+    store["by_id"][block["id"]] = block
+    store["version"] += 1
+
+
+def _store_remove(store: dict, block_id: str) -> dict | None:
+    block = store["by_id"].pop(block_id, None)
+    if block is None:
+        return None
+    day = store["by_date"].get(block["date"], {})
+    blocks = day.get(block["assistant"], [])
+    i = bisect.bisect_left(blocks, _time_block_sort_key(block), key=_time_block_sort_key)
+    if i < len(blocks) and blocks[i]["id"] == block_id:
+        blocks.pop(i)
+    if not blocks:
+        day.pop(block["assistant"], None)
+    if not day:
+        store["by_date"].pop(block["date"], None)
+    store["version"] += 1
+    return block
+
+
+def _store_replace(store: dict, blocks: list[dict]) -> None:
+    """Swap in a freshly loaded block list (no-op when nothing changed)."""
+    def _sig(b: dict) -> tuple:
+        return (b["id"], b["assistant"], b["date"], b["start_min"], b["end_min"], b["reason"])
+
+    if sorted(_sig(b) for b in blocks) == sorted(_sig(b) for b in store["by_id"].values()):
+        return
+    store["by_date"].clear()
+    store["by_id"].clear()
+    for block in blocks:
+        _store_insert(store, block)
+
+
+def _time_blocks() -> dict[str, Any]:
+    """The time-block store, reloaded from its backend when stale (once per rerun)."""
+    global _time_blocks_checked
+    store = _time_block_store()
+    if _time_blocks_checked:
+        return store
+    _time_blocks_checked = True
+    source = _time_block_source()
+    with store["lock"]:
+        if source[0] == "meta":
+            if store["source"] != source:
+                store.update(source=source, mode="meta", error="", meta_sig=None)
+            return store
+        if store["source"] == source and time_module.time() - store["loaded_at"] < TIME_BLOCK_RELOAD_SECONDS:
+            return store
+        try:
+            blocks = _load_time_blocks_from_backend(source)
+        except Exception as e:
+            # Table missing/unreachable: keep using the schedule meta until it works
+            store.update(source=source, mode="meta", error=str(e), loaded_at=time_module.time())
+            return store
+        if store["source"] != source or store["mode"] != "table":
+            store.update(meta_sig=None, meta_checked=False)
+        store.update(source=source, mode="table", error="", loaded_at=time_module.time())
+        _store_replace(store, blocks)
+    return store
+
+
+def _time_blocks_in_meta() -> bool:
+    """True when blocks are saved with the schedule meta rather than on their own."""
+    return _time_blocks()["mode"] == "meta"
+
+
+def list_time_blocks(date: str | None = None) -> list[dict]:
+    """Blocks for one date (all dates when None), by assistant then start time."""
+    store = _time_blocks()
+    with store["lock"]:
+        dates = [date] if date is not None else sorted(store["by_date"])
+        return [
+            block
+            for d in dates
+            for assistant, blocks in sorted(store["by_date"].get(d, {}).items())
+            for block in blocks
+        ]
+
 
 def add_time_block(assistant: str, start_time: Any, end_time: Any, reason: str = "Backend Work") -> bool:
     """Add a time block for an assistant. Returns True when recorded."""
-    today_str = now.strftime("%Y-%m-%d")
-    block = {
-        "assistant": assistant.upper(),
-        "start_time": start_time,
-        "end_time": end_time,
-        "reason": reason,
-        "date": today_str
-    }
-    st.session_state.time_blocks.append(block)
+    block = _make_time_block(assistant, now.strftime("%Y-%m-%d"), start_time, end_time, reason)
+    if block is None:
+        return False
+    store = _time_blocks()
+    with store["lock"]:
+        _store_insert(store, block)
+    if store["mode"] == "table" and not _persist_time_block_change(added=block):
+        with store["lock"]:
+            _store_remove(store, block["id"])
+        return False
     return True
 
-def remove_time_block(index: int):
-    """Remove a time block by index"""
-    if 0 <= index < len(st.session_state.time_blocks):
-        st.session_state.time_blocks.pop(index)
-        return True
-    return False
 
-def is_assistant_blocked(assistant: str, check_time: Any) -> tuple[bool, str]:
-    """Check if an assistant is blocked at a specific time. Returns (is_blocked, reason)"""
-    if not assistant or not check_time:
-        return False, ""
-    
-    assist_upper = str(assistant).strip().upper()
-    today_str = now.strftime("%Y-%m-%d")
-    check_minutes = check_time.hour * 60 + check_time.minute
-    
-    for block in st.session_state.time_blocks:
-        if block["date"] != today_str:
-            continue
-        if block["assistant"].upper() != assist_upper:
-            continue
-        
-        start_min = block["start_time"].hour * 60 + block["start_time"].minute
-        end_min = block["end_time"].hour * 60 + block["end_time"].minute
-        
-        if start_min <= check_minutes <= end_min:
-            return True, block.get("reason", "Blocked")
-    
-    return False, ""
+def remove_time_block(block_id: str) -> bool:
+    """Remove a time block by id. Returns True when removed."""
+    store = _time_blocks()
+    with store["lock"]:
+        block = _store_remove(store, block_id)
+    if block is None:
+        return False
+    if store["mode"] == "table" and not _persist_time_block_change(removed=block):
+        with store["lock"]:
+            _store_insert(store, block)
+        return False
+    return True
+
+
+def _prune_time_blocks(today: str) -> None:
+    """Drop blocks from days before `today` (the schedule rolled over)."""
+    store = _time_blocks()
+    with store["lock"]:
+        old = [block for date, day in store["by_date"].items() if date < today for blocks in day.values() for block in blocks]
+        for block in old:
+            _store_remove(store, block["id"])
+    if old and store["mode"] == "table":
+        _persist_time_block_change(pruned_before=today)
 
 
 def _time_to_hhmm(t: time_type | None) -> str:
@@ -2773,55 +3282,372 @@ def _set_meta_on_df(df_any: pd.DataFrame, meta: dict) -> None:
         pass
 
 
+def _blocks_from_meta(meta: dict) -> list[dict]:
+    """Store records for the blocks kept in schedule meta (ids derived from content)."""
+    out: list[dict] = []
+    seen: dict[str, int] = {}
+    for b in _serialize_time_blocks(_deserialize_time_blocks(meta.get("time_blocks"))):
+        digest = hashlib.md5(json.dumps(b, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        seen[digest] = seen.get(digest, 0) + 1
+        block = _make_time_block(
+            b["assistant"], b["date"], b["start_time"], b["end_time"], b["reason"], block_id=f"{digest}-{seen[digest]}"
+        )
+        if block is not None:
+            out.append(block)
+    return out
+
+
 def _sync_time_blocks_from_meta(df_any: pd.DataFrame | None) -> None:
-    """Load persisted time blocks into session_state (once per run)."""
+    """Load blocks kept in the schedule meta into the store.
+
+    In "meta" mode the meta is the source of truth. In "table" mode blocks still
+    found in the meta (older saves) are moved into the table once.
+    """
     try:
         meta = _get_meta_from_df(df_any)
-        if "time_blocks" in meta:
-            blocks = _deserialize_time_blocks(meta.get("time_blocks"))
-            st.session_state.time_blocks = blocks
+        store = _time_blocks()
+        if "time_blocks" not in meta:
+            return
+        sig = json.dumps(meta.get("time_blocks"), sort_keys=True, default=str)
+        with store["lock"]:
+            if store["mode"] == "meta":
+                if store["meta_sig"] != sig:
+                    _store_replace(store, _blocks_from_meta(meta))
+                    store["meta_sig"] = sig
+                return
+            if store["meta_checked"]:
+                return
+            today = now.strftime("%Y-%m-%d")
+            legacy = [b for b in _blocks_from_meta(meta) if b["date"] >= today and b["id"] not in store["by_id"]]
+        for block in legacy:
+            with store["lock"]:
+                _store_insert(store, block)
+            _persist_time_block_change(added=block)
+        with store["lock"]:
+            store["meta_checked"] = True
     except Exception:
         pass
 
 
 def _apply_time_blocks_to_meta(meta: dict) -> dict:
     out = dict(meta or {})
-    out["time_blocks"] = _serialize_time_blocks(st.session_state.get("time_blocks", []))
-    out["time_blocks_updated_at"] = datetime.now(IST).isoformat()
+    store = _time_blocks()
+    if store["mode"] == "meta":
+        out["time_blocks"] = _serialize_time_blocks(list_time_blocks())
+        out["time_blocks_updated_at"] = datetime.now(IST).isoformat()
+    elif store["meta_checked"]:
+        # Blocks are in their own table now; stop carrying a stale copy
+        out.pop("time_blocks", None)
+        out.pop("time_blocks_updated_at", None)
     return out
 
 # ================ ASSISTANT AVAILABILITY TRACKING ================
-def get_assistant_schedule(assistant_name: str, df_schedule: pd.DataFrame) -> list[dict[str, Any]]:
-    """Get all appointments where this assistant is assigned"""
-    if not assistant_name or df_schedule.empty:
+# Assistant -> appointments index. Cached process-wide by the content key of the
+# columns it reads (the derived display frame shares one per data version), so
+# reruns reuse it, in-place edits of any kind get a fresh index, and
+# per-assistant lookups don't rescan every row. Records are (pos, row_id, in_min, out_min, role, status);
+# minutes are None when the time can't be parsed.
+ASSISTANT_ROLE_COLUMNS = ("FIRST", "SECOND", "Third")
+ASSISTANT_INDEX_COLUMNS = ("REMINDER_ROW_ID", "In Time", "Out Time", "STATUS") + ASSISTANT_ROLE_COLUMNS
+INACTIVE_APPOINTMENT_STATUSES = ("CANCELLED", "DONE", "COMPLETED", "SHIFTED")
+ASSISTANT_INDEX_CACHE_SIZE = 16
+
+
+@st.cache_resource
+def _assistant_index_store() -> dict:
+    """Process-wide {content key: {"index", "intervals", "occupancy"}}, oldest first."""
+    return {}
+
+
+def _schedule_row_hashes(frame: pd.DataFrame) -> np.ndarray | None:
+    """One uint64 digest per row over all cell values (None if unhashable)."""
+    try:
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    except Exception:
+        return None
+
+
+def _schedule_content_key(frame: pd.DataFrame, row_hashes: np.ndarray | None) -> str | None:
+    """Stable digest of the frame's columns, index and row digests (in order).
+
+    The index is part of the key: edits are mapped back to df_raw by index label.
+    """
+    if row_hashes is None:
+        return None
+    digest = hashlib.md5("\x1f".join(map(str, frame.columns)).encode("utf-8"))
+    try:
+        digest.update(pd.util.hash_pandas_object(frame.index).to_numpy().tobytes())
+    except Exception:
+        return None
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()
+
+
+def _assistant_index_key(df_schedule: pd.DataFrame) -> str | None:
+    """Content key of the columns the assistant index is built from."""
+    cols = [c for c in ASSISTANT_INDEX_COLUMNS if c in df_schedule.columns]
+    sub = df_schedule[cols]
+    return _schedule_content_key(sub, _schedule_row_hashes(sub))
+
+
+def _is_inactive_status(status: str) -> bool:
+    return any(s in status for s in INACTIVE_APPOINTMENT_STATUSES)
+
+
+def _schedule_minutes_lists(df_schedule: pd.DataFrame) -> tuple[list, list]:
+    """In/Out minutes per row (Out shifted by a day for overnight); None if unparseable."""
+    in_min = _times_to_minutes_vectorized(df_schedule["In Time"]) if "In Time" in df_schedule.columns else pd.Series(pd.NA, index=df_schedule.index, dtype="Int64")
+    out_min = _times_to_minutes_vectorized(df_schedule["Out Time"]) if "Out Time" in df_schedule.columns else pd.Series(pd.NA, index=df_schedule.index, dtype="Int64")
+    out_min = out_min.mask((out_min < in_min).fillna(False), out_min + 1440)
+    return (
+        [None if pd.isna(v) else int(v) for v in in_min],
+        [None if pd.isna(v) else int(v) for v in out_min],
+    )
+
+
+def _build_assistant_index(df_schedule: pd.DataFrame) -> dict[str, list[tuple]]:
+    index: dict[str, list[tuple]] = {}
+    n = len(df_schedule)
+    roles = [c for c in ASSISTANT_ROLE_COLUMNS if c in df_schedule.columns]
+    if n == 0 or not roles:
+        return index
+
+    def _column(col: str, default: str = "") -> list[str]:
+        if col not in df_schedule.columns:
+            return [default] * n
+        return [str(v).strip() for v in df_schedule[col].tolist()]
+
+    statuses = [s.upper() for s in _column("STATUS")]
+    row_ids = _column("REMINDER_ROW_ID")
+    in_mins, out_mins = _schedule_minutes_lists(df_schedule)
+    role_keys = [(role, [v.upper() for v in _column(role)]) for role in roles]
+
+    for pos in range(n):
+        if _is_inactive_status(statuses[pos]):
+            continue
+        for role, keys in role_keys:
+            name = keys[pos]
+            if name:
+                index.setdefault(name, []).append((pos, row_ids[pos], in_mins[pos], out_mins[pos], role, statuses[pos]))
+    return index
+
+
+def _register_assistant_index(
+    df_schedule: pd.DataFrame,
+    index: dict[str, list[tuple]],
+    intervals: dict[str, tuple] | None = None,
+    occupancy: dict[str, Any] | None = None,
+    key: str | None = None,
+) -> dict[str, Any]:
+    """Cache a prebuilt index for the frame's content. Registered entries are never updated in place."""
+    entry = {
+        "index": index,
+        "intervals": intervals if intervals is not None else {},
+        "occupancy": occupancy if occupancy is not None else {},
+    }
+    key = key if key is not None else _assistant_index_key(df_schedule)
+    if key is not None:
+        store = _assistant_index_store()
+        store.pop(key, None)
+        store[key] = entry
+        while len(store) > ASSISTANT_INDEX_CACHE_SIZE:
+            store.pop(next(iter(store)), None)
+    return entry
+
+
+def _assistant_index_entry(df_schedule: pd.DataFrame) -> dict[str, Any]:
+    key = _assistant_index_key(df_schedule)
+    entry = _assistant_index_store().get(key) if key is not None else None
+    if entry is not None:
+        return entry
+    return _register_assistant_index(df_schedule, _build_assistant_index(df_schedule), key=key)
+
+
+def _assistant_index(df_schedule: pd.DataFrame) -> dict[str, list[tuple]]:
+    """Return the assistant index for this frame, building it on first use."""
+    return _assistant_index_entry(df_schedule)["index"]
+
+
+def _assistant_appointments(assistant_name: str, df_schedule: pd.DataFrame) -> list[tuple]:
+    if not assistant_name or df_schedule is None or df_schedule.empty:
         return []
-    
-    assist_upper = str(assistant_name).strip().upper()
-    appointments = []
-    
-    for idx, row in df_schedule.iterrows():
-        # Check FIRST, SECOND, Third columns
-        for col in ["FIRST", "SECOND", "Third"]:
-            if col in row.index:
-                val = str(row.get(col, "")).strip().upper()
-                if val == assist_upper:
-                    # Skip cancelled/done/completed/shifted appointments
-                    status = str(row.get("STATUS", "")).strip().upper()
-                    if any(s in status for s in ["CANCELLED", "DONE", "COMPLETED", "SHIFTED"]):
-                        continue
-                    
-                    appointments.append({
-                        "row_id": row.get("REMINDER_ROW_ID", ""),
-                        "patient": row.get("Patient Name", "Unknown"),
-                        "in_time": row.get("In Time"),
-                        "out_time": row.get("Out Time"),
-                        "doctor": row.get("DR.", ""),
-                        "op": row.get("OP", ""),
-                        "role": col,
-                        "status": status
-                    })
-    
-    return appointments
+    return _assistant_index(df_schedule).get(str(assistant_name).strip().upper(), [])
+
+
+def _working_assistant_index(df_schedule: pd.DataFrame) -> dict[str, Any]:
+    """Private copy of the frame's index entry, for _set_assistant_cell to update in place."""
+    entry = _assistant_index_entry(df_schedule)
+    return {
+        "index": {k: list(v) for k, v in entry["index"].items()},
+        "intervals": dict(entry["intervals"]),
+        "occupancy": {},
+    }
+
+
+def _set_assistant_cell(
+    df_schedule: pd.DataFrame,
+    pos: int,
+    role: str,
+    name: str,
+    entry: dict[str, Any] | None = None,
+    row_info: tuple | None = None,
+) -> None:
+    """Write an assistant into a role cell and keep the frame's index in step.
+
+    entry: a working copy from _working_assistant_index, updated in place; the
+    caller registers it once after its last write (batches hash the frame once).
+    Without it the entry is copied and re-registered for this single write.
+    row_info: optional precomputed (row_id, in_min, out_min, status) for the row.
+    """
+    if entry is None:
+        entry = _working_assistant_index(df_schedule)
+        _set_assistant_cell(df_schedule, pos, role, name, entry, row_info)
+        _register_assistant_index(df_schedule, entry["index"], intervals=entry["intervals"])
+        return
+    col_idx = df_schedule.columns.get_loc(role)
+    old_key = str(df_schedule.iat[pos, col_idx]).strip().upper()
+    df_schedule.iat[pos, col_idx] = name
+    index = entry["index"]
+
+    new_key = str(name).strip().upper()
+    entry["intervals"].pop(old_key, None)
+    entry["intervals"].pop(new_key, None)
+    entry["occupancy"].clear()
+    recs = index.get(old_key)
+    if recs:
+        recs[:] = [r for r in recs if not (r[0] == pos and r[4] == role)]
+    if not new_key:
+        return
+    if row_info is None:
+        row = df_schedule.iloc[pos]
+        in_min = time_to_minutes(row.get("In Time"))
+        out_min = time_to_minutes(row.get("Out Time"))
+        if in_min is not None and out_min is not None and out_min < in_min:
+            out_min += 1440
+        row_info = (str(row.get("REMINDER_ROW_ID", "")).strip(), in_min, out_min, str(row.get("STATUS", "")).strip().upper())
+    row_id, in_min, out_min, status = row_info
+    if _is_inactive_status(status):
+        return
+    rec = (pos, row_id, in_min, out_min, role, status)
+    bisect.insort(index.setdefault(new_key, []), rec, key=lambda r: (r[0], r[4]))
+
+
+def _schedule_cell(df_schedule: pd.DataFrame, pos: int, col: str, default: Any = "") -> Any:
+    if col not in df_schedule.columns:
+        return default
+    return df_schedule.iat[pos, df_schedule.columns.get_loc(col)]
+
+
+# Busy intervals per assistant, sorted by start with a running max of end
+# times: (starts, ends, max_end, items). Any interval overlapping [a, b) lies
+# in starts[:bisect_left(starts, b)] and can only exist if max_end there > a.
+def _build_intervals(spans: list[tuple[int, int, Any]]) -> tuple[list[int], list[int], list[int], list[Any]]:
+    spans = sorted(spans, key=lambda x: (x[0], x[1]))
+    starts = [x[0] for x in spans]
+    ends = [x[1] for x in spans]
+    max_end: list[int] = []
+    running = -1
+    for e in ends:
+        running = e if e > running else running
+        max_end.append(running)
+    return starts, ends, max_end, [x[2] for x in spans]
+
+
+def _first_overlap(intervals: tuple | None, start_min: int, end_min: int, skip=None, order=None) -> Any:
+    """Return the earliest (by `order`) item overlapping [start_min, end_min), or None."""
+    if not intervals:
+        return None
+    starts, ends, max_end, items = intervals
+    j = bisect.bisect_left(starts, end_min) - 1
+    best = None
+    while j >= 0 and max_end[j] > start_min:
+        if ends[j] > start_min and not (skip and skip(items[j])):
+            if best is None or (order(items[j]) if order else 0) < (order(best) if order else 0):
+                best = items[j]
+                if order is None:
+                    break
+        j -= 1
+    return best
+
+
+def _assistant_busy_intervals(assistant_name: str, df_schedule: pd.DataFrame) -> tuple | None:
+    """Appointment intervals for one assistant (items are index records)."""
+    if not assistant_name or df_schedule is None or df_schedule.empty:
+        return None
+    key = str(assistant_name).strip().upper()
+    entry = _assistant_index_entry(df_schedule)
+    cached = entry["intervals"].get(key)
+    if cached is None:
+        spans = [
+            (rec[2], rec[3], rec)
+            for rec in entry["index"].get(key, [])
+            if rec[2] is not None and rec[3] is not None
+        ]
+        cached = _build_intervals(spans)
+        entry["intervals"][key] = cached
+    return cached
+
+
+def _time_block_table() -> dict[str, Any]:
+    """{"sig", "by_assistant"}: today's time-block intervals, rebuilt when the blocks change."""
+    store = _time_blocks()
+    today_str = now.strftime("%Y-%m-%d")
+    with store["lock"]:
+        cached = store["tables"].get(today_str)
+        if cached is None or cached["sig"] != (today_str, store["version"]):
+            by_assistant = {
+                assistant: _build_intervals([(b["start_min"], b["end_min"], (b["seq"], b["reason"])) for b in blocks])
+                for assistant, blocks in store["by_date"].get(today_str, {}).items()
+            }
+            cached = {"sig": (today_str, store["version"]), "by_assistant": by_assistant}
+            store["tables"] = {today_str: cached}
+        return cached
+
+
+def _time_block_intervals(assistant_name: str) -> tuple | None:
+    """Today's time-block intervals for one assistant (items are (list_pos, reason))."""
+    return _time_block_table()["by_assistant"].get(str(assistant_name).strip().upper())
+
+
+def _is_weekly_off_today(assistant_name: str) -> bool:
+    try:
+        off_assistants = WEEKLY_OFF.get(now.weekday(), [])  # 0=Monday, 6=Sunday
+        key = str(assistant_name).strip().upper()
+        return any(str(a).strip().upper() == key for a in off_assistants)
+    except Exception:
+        return False
+
+
+def next_free_slot(
+    assistant_name: str,
+    df_schedule: pd.DataFrame,
+    after_min: int,
+    duration_min: int,
+    day_end_min: int = 1440,
+    exclude_row_id: str | None = None,
+) -> int | None:
+    """Earliest start >= after_min with `duration_min` free of appointments and blocks."""
+    if not assistant_name or _is_weekly_off_today(assistant_name):
+        return None
+    exclude_key = str(exclude_row_id).strip() if exclude_row_id else ""
+    streams = []
+    for intervals, skip in (
+        (_assistant_busy_intervals(assistant_name, df_schedule), lambda rec: bool(exclude_key) and rec[1] == exclude_key),
+        (_time_block_intervals(assistant_name), None),
+    ):
+        if not intervals:
+            continue
+        starts, ends, max_end, items = intervals
+        lo = bisect.bisect_right(max_end, after_min)  # everything before ends by after_min
+        streams.append([(starts[k], ends[k]) for k in range(lo, len(starts)) if not (skip and skip(items[k]))])
+
+    t = after_min
+    for start, end in heapq.merge(*streams):
+        if start >= t + duration_min:
+            break
+        t = max(t, end)
+    return t if t + duration_min <= day_end_min else None
+
 
 def is_assistant_available(
     assistant_name: str,
@@ -2840,13 +3666,8 @@ def is_assistant_available(
     assist_upper = str(assistant_name).strip().upper()
     
     # Check if today is the assistant's weekly off day
-    try:
-        today_weekday = now.weekday()  # 0=Monday, 6=Sunday
-        off_assistants = WEEKLY_OFF.get(today_weekday, [])
-        if any(str(a).strip().upper() == assist_upper for a in off_assistants):
-            return False, f"Weekly off on {now.strftime('%A')}"
-    except Exception:
-        pass
+    if _is_weekly_off_today(assist_upper):
+        return False, f"Weekly off on {now.strftime('%A')}"
     
     # Convert check times to minutes
     check_in = _coerce_to_time_obj(check_in_time)
@@ -2862,50 +3683,25 @@ def is_assistant_available(
     
     # Check time blocks first (overlap against the whole appointment window)
     try:
-        today_str = now.strftime("%Y-%m-%d")
-        for block in st.session_state.get("time_blocks", []):
-            if str(block.get("date", "")).strip() != today_str:
-                continue
-            if str(block.get("assistant", "")).strip().upper() != assist_upper:
-                continue
-
-            start_t = _coerce_to_time_obj(block.get("start_time"))
-            end_t = _coerce_to_time_obj(block.get("end_time"))
-            if start_t is None or end_t is None:
-                continue
-
-            start_min = start_t.hour * 60 + start_t.minute
-            end_min = end_t.hour * 60 + end_t.minute
-            if end_min < start_min:
-                end_min += 1440
-
-            if not (check_out_min <= start_min or check_in_min >= end_min):
-                return False, f"Blocked: {block.get('reason', 'Blocked')}"
+        block = _first_overlap(_time_block_intervals(assist_upper), check_in_min, check_out_min, order=lambda b: b[0])
+        if block is not None:
+            return False, f"Blocked: {block[1]}"
     except Exception:
         pass
     
-    # Check existing appointments
-    schedule = get_assistant_schedule(assist_upper, df_schedule)
-    
-    for appt in schedule:
-        # Skip if it's the same row we're editing
-        if exclude_row_id and str(appt.get("row_id", "")).strip() == str(exclude_row_id).strip():
-            continue
-        
-        appt_in = _coerce_to_time_obj(appt.get("in_time"))
-        appt_out = _coerce_to_time_obj(appt.get("out_time"))
-        
-        if appt_in is None or appt_out is None:
-            continue
-        
-        appt_in_min = appt_in.hour * 60 + appt_in.minute
-        appt_out_min = appt_out.hour * 60 + appt_out.minute
-        if appt_out_min < appt_in_min:
-            appt_out_min += 1440
-        
-        # Check for overlap
-        if not (check_out_min <= appt_in_min or check_in_min >= appt_out_min):
-            return False, f"With {appt.get('patient', 'patient')} ({appt_in.strftime('%H:%M')}-{appt_out.strftime('%H:%M')})"
+    # Check existing appointments (skip the same row we're editing)
+    exclude_key = str(exclude_row_id).strip() if exclude_row_id else ""
+    appt = _first_overlap(
+        _assistant_busy_intervals(assist_upper, df_schedule),
+        check_in_min,
+        check_out_min,
+        skip=(lambda rec: rec[1] == exclude_key) if exclude_key else None,
+        order=lambda rec: (rec[0], rec[4]),
+    )
+    if appt is not None:
+        pos, _, appt_in_min, appt_out_min, _, _ = appt
+        patient = _schedule_cell(df_schedule, pos, "Patient Name", "patient")
+        return False, f"With {patient} ({mins_to_hhmm(appt_in_min % 1440)}-{mins_to_hhmm(appt_out_min % 1440)})"
     
     return True, ""
 
@@ -2964,123 +3760,378 @@ def auto_allocate_assistants(
     return result
 
 
-def _auto_fill_assistants_for_row(df_schedule: pd.DataFrame, row_index: int, only_fill_empty: bool = True) -> bool:
-    """Auto-fill FIRST/SECOND/Third for a single row based on doctor-specific and time-based allocation rules. Returns True if anything changed."""
-    try:
-        if row_index < 0 or row_index >= len(df_schedule):
-            return False
+# ================ BATCH ASSISTANT ALLOCATION ================
+# Fills FIRST/SECOND/Third for many rows in one pass. Busy intervals are built
+# once from the assistant index and updated as rows get assigned; rows are
+# handled in (In, Out, row id) order so the result doesn't depend on editor
+# row order. Each row is a small assignment problem: fill as many roles as
+# possible, then take the best rule rank for FIRST, then SECOND, then Third.
+# When every role can be filled this is exactly what the rule tiers picked
+# one role at a time.
+#
+# This is a greedy pass, not a day-wide matching or min-cost flow: each row is
+# solved given the rows before it, and those keep their picks. Earlier rows
+# therefore take precedence; one can take an assistant that a later
+# overlapping row needed and leave that row's role empty, or push it to a
+# worse-ranked pick, where a global assignment would have filled both.
+# Rules that depend on who is FIRST (when_first_is) don't fit a plain flow
+# network, and empty roles stay visible for staff to fill by hand.
+_UNRANKED = (99, 0, 0)
+# With global.load_balance, candidates tied on rule tier and list position (an
+# equal-rank group in a preferred list, or any department assistant as a last
+# resort) are ordered by booked minutes in steps of this size before their
+# order within the group. Tiers and list positions keep their order.
+LOAD_BALANCE_STEP_MIN = 60
+
+
+def _solve_row_roles(roles: list[str], candidates: list[str], rank_for) -> dict[str, str]:
+    """Best distinct assignment of candidates to roles (see section comment).
+
+    `rank_for(role, assigned)` returns {candidate: rank} given the roles assigned so far.
+    Only the top-k candidates per role are tried, k being the number of roles still
+    open; any better-count/better-rank solution can be swapped onto those.
+    """
+    best: list[Any] = [None, None]
+
+    def _search(i: int, used: frozenset, assigned: dict[str, str], ranks: tuple) -> None:
+        if i == len(roles):
+            key = (-len(assigned), ranks)
+            if best[0] is None or key < best[0]:
+                best[0], best[1] = key, dict(assigned)
+            return
+        role = roles[i]
+        role_ranks = rank_for(role, assigned)
+        options = sorted((role_ranks.get(c, _UNRANKED), c) for c in candidates if c not in used)
+        for rank, cand in options[: len(roles) - i]:
+            assigned[role] = cand
+            _search(i + 1, used | {cand}, assigned, ranks + (rank,))
+            del assigned[role]
+        _search(i + 1, used, assigned, ranks + (_UNRANKED,))
 
-        row = df_schedule.iloc[row_index]
-        doctor = str(row.get("DR.", "")).strip()
-        in_time_val = row.get("In Time", None)
-        out_time_val = row.get("Out Time", None)
-        row_id = str(row.get("REMINDER_ROW_ID", "")).strip()
+    _search(0, frozenset(), {}, ())
+    return best[1] or {}
 
-        if not doctor:
-            return False
-        if _coerce_to_time_obj(in_time_val) is None or _coerce_to_time_obj(out_time_val) is None:
-            return False
 
+def allocate_assistants_batch(
+    df_schedule: pd.DataFrame,
+    row_positions: list[int] | None = None,
+    only_fill_empty: bool = True,
+) -> list[int]:
+    """Auto-fill FIRST/SECOND/Third for the given rows (all rows by default).
+
+    Uses the compiled allocation rules (see get_allocation_rules); with
+    load_balance on, ties within a rank go to the less booked assistant.
+    Rows are filled greedily in time order, so earlier rows take precedence
+    over later overlapping ones (see section comment).
+    Writes into df_schedule in place and returns the positions that changed.
+    """
+    n = len(df_schedule)
+    roles_present = [r for r in ASSISTANT_ROLE_COLUMNS if r in df_schedule.columns]
+    if n == 0 or not roles_present:
+        return []
+    positions = sorted({int(p) for p in (range(n) if row_positions is None else row_positions) if 0 <= int(p) < n})
+    if not positions:
+        return []
+
+    in_mins, out_mins = _schedule_minutes_lists(df_schedule)
+    rules = get_allocation_rules()
+
+    def _dept_assistants(department: str) -> list[str]:
+        dept_rules = rules["departments"].get(department)
+        return dept_rules["assistants"] if dept_rules else get_assistants_for_department(department)
+
+    def _column(col: str) -> list:
+        return df_schedule[col].tolist() if col in df_schedule.columns else [""] * n
+
+    doctors, row_ids, statuses = _column("DR."), _column("REMINDER_ROW_ID"), _column("STATUS")
+    role_values = {role: _column(role) for role in ASSISTANT_ROLE_COLUMNS}
+
+    # Rows to allocate, in a canonical order
+    jobs = []
+    for pos in positions:
+        doctor = str(doctors[pos]).strip()
+        if not doctor or in_mins[pos] is None or out_mins[pos] is None:
+            continue
         department = get_department_for_doctor(doctor)
         if not department:
+            continue
+        current = {role: role_values[role][pos] for role in ASSISTANT_ROLE_COLUMNS}
+        if only_fill_empty and not any(_is_blank_cell(v) for v in current.values()):
+            continue
+        row_info = (str(row_ids[pos]).strip(), in_mins[pos], out_mins[pos], str(statuses[pos]).strip().upper())
+        jobs.append((in_mins[pos], out_mins[pos], row_info[0], pos, doctor, department, current, row_info))
+    if not jobs:
+        return []
+    jobs.sort(key=lambda j: (j[0], j[1], j[2], j[3]))
+
+    # Busy intervals per assistant from the current assignments: items are (pos, role)
+    spans: dict[str, list[tuple[int, int, tuple[int, str]]]] = {}
+    work = _working_assistant_index(df_schedule)
+    for name, recs in work["index"].items():
+        for rec in recs:
+            if rec[2] is not None and rec[3] is not None:
+                spans.setdefault(name, []).append((rec[2], rec[3], (rec[0], rec[4])))
+    intervals: dict[str, tuple] = {}
+    # Running booked minutes per assistant, kept in step with `spans`
+    load_balance = bool(rules["global"].get("load_balance"))
+    booked = {name: sum(end - start for start, end, _ in items) for name, items in spans.items()}
+
+    def _busy(name: str, start_min: int, end_min: int, pos: int) -> bool:
+        if name not in intervals:
+            intervals[name] = _build_intervals(spans.get(name, []))
+        return _first_overlap(intervals[name], start_min, end_min, skip=lambda item: item[0] == pos) is not None
+
+    def _is_free(name: str, start_min: int, end_min: int, pos: int) -> bool:
+        if _is_weekly_off_today(name):
             return False
+        try:
+            if _first_overlap(_time_block_intervals(name), start_min, end_min) is not None:
+                return False
+        except Exception:
+            pass
+        return not _busy(name, start_min, end_min, pos)
+
+    changed: list[int] = []
+    for start_min, end_min, _, pos, doctor, department, current, row_info in jobs:
+        already = {str(v).strip().upper() for v in current.values() if not _is_blank_cell(v)}
+        roles = [r for r in roles_present if not (only_fill_empty and not _is_blank_cell(current.get(r)))]
+        dept_assistants = _dept_assistants(department)
+        free = {a.upper(): a for a in dept_assistants if _is_free(a.upper(), start_min, end_min, pos)}
+        candidates = [key for key in free if key not in already]
+        if not roles or not candidates:
+            continue
 
-        current_first = row.get("FIRST", "")
-        current_second = row.get("SECOND", "")
-        current_third = row.get("Third", "")
+        appt_minute = start_min % 1440
+        current_first = str(current.get("FIRST", "")).strip()
 
-        # If all 3 are truly filled, nothing to do.
-        if only_fill_empty and (not _is_blank_cell(current_first)) and (not _is_blank_cell(current_second)) and (not _is_blank_cell(current_third)):
-            return False
+        def _rank_for(role: str, assigned: dict[str, str]) -> dict[str, tuple]:
+            first = assigned["FIRST"] if "FIRST" in assigned else current_first
+            ranks = _allocation_role_ranks(rules, department, role, doctor, appt_minute, first)
+            if not load_balance:
+                return ranks
+            return {
+                c: (ranks[c][0], ranks[c][1], booked.get(c, 0) // LOAD_BALANCE_STEP_MIN, ranks[c][2])
+                for c in candidates if c in ranks
+            }
 
-        already = {
-            str(x).strip().upper()
-            for x in [current_first, current_second, current_third]
-            if not _is_blank_cell(x)
-        }
+        for role, key in _solve_row_roles(roles, candidates, _rank_for).items():
+            name = free[key]
+            old_key = str(current.get(role, "")).strip().upper()
+            if old_key in spans:
+                kept = [x for x in spans[old_key] if x[2] != (pos, role)]
+                booked[old_key] -= sum(end - start for start, end, item in spans[old_key] if item == (pos, role))
+                spans[old_key] = kept
+                intervals.pop(old_key, None)
+            # Cancelled/done rows still get filled but never hold their assistants
+            # (the index skips them too), or later rows would see phantom clashes.
+            if not _is_inactive_status(row_info[3]):
+                spans.setdefault(key, []).append((start_min, end_min, (pos, role)))
+                booked[key] = booked.get(key, 0) + (end_min - start_min)
+                intervals.pop(key, None)
+            _set_assistant_cell(df_schedule, pos, role, name, work, row_info)
+            if not changed or changed[-1] != pos:
+                changed.append(pos)
+    if changed:
+        _register_assistant_index(df_schedule, work["index"], intervals=work["intervals"])
+    return changed
+
+
+# Incremental mode: an edit can only change allocation for the edited rows and
+# the rows whose time windows overlap their old or new window. Rows with an
+# empty role are retried on every save, as the full pass did.
+_ALLOCATION_INPUT_COLUMNS = ("DR.", "STATUS") + ASSISTANT_ROLE_COLUMNS
+
+
+def _allocation_signature_lists(df_schedule: pd.DataFrame) -> tuple[list, list, dict[str, list[str]]]:
+    in_mins, out_mins = _schedule_minutes_lists(df_schedule)
+    values = {
+        col: (
+            ["" if _is_blank_cell(v) else str(v).strip().upper() for v in df_schedule[col].tolist()]
+            if col in df_schedule.columns else [""] * len(df_schedule)
+        )
+        for col in _ALLOCATION_INPUT_COLUMNS
+    }
+    return in_mins, out_mins, values
 
-        # Get appointment time in hours (decimal format for comparison)
-        in_time_obj = _coerce_to_time_obj(in_time_val)
-        appt_hour = in_time_obj.hour + in_time_obj.minute / 60.0 if in_time_obj else 0
 
-        # Compute free assistants for this time window, excluding this same row.
-        avail = get_available_assistants(department, in_time_val, out_time_val, df_schedule, exclude_row_id=row_id)
-        free_assistants = {a["name"].upper(): a["name"] for a in avail if a.get("available")}
+def _overlapping_items(intervals: tuple | None, start_min: int, end_min: int) -> list[Any]:
+    """All items overlapping [start_min, end_min) (same layout as _build_intervals)."""
+    if not intervals:
+        return []
+    starts, ends, max_end, items = intervals
+    found = []
+    j = bisect.bisect_left(starts, end_min) - 1
+    while j >= 0 and max_end[j] > start_min:
+        if ends[j] > start_min:
+            found.append(items[j])
+        j -= 1
+    return found
+
+
+def incremental_allocation_rows(
+    df_before: pd.DataFrame, df_after: pd.DataFrame, include_unfilled: bool = True
+) -> list[int]:
+    """Positions in df_after whose assistant choices may change after an edit.
+
+    That is every row whose doctor, times, status or assistants changed (or is
+    new), plus every row overlapping the old or new window of such a row.
+    Rows are matched by REMINDER_ROW_ID, falling back to position. With
+    include_unfilled, rows that still have an empty role are included too, so
+    any save (even a notes-only edit) keeps filling open slots as a full pass did.
+    """
+    if df_after is None or df_after.empty:
+        return []
+    if df_before is None or df_before.empty:
+        return list(range(len(df_after)))
+
+    b_in, b_out, b_vals = _allocation_signature_lists(df_before)
+    a_in, a_out, a_vals = _allocation_signature_lists(df_after)
+
+    before_pos: dict[str, int] = {}
+    if "REMINDER_ROW_ID" in df_before.columns and "REMINDER_ROW_ID" in df_after.columns:
+        for pos, rid in enumerate(df_before["REMINDER_ROW_ID"].tolist()):
+            if not _is_blank_cell(rid):
+                before_pos.setdefault(str(rid).strip(), pos)
+        after_ids = df_after["REMINDER_ROW_ID"].tolist()
+    else:
+        after_ids = [None] * len(df_after)
+
+    changed: set[int] = set()
+    windows: list[tuple[int, int]] = []
+    unfilled: set[int] = set()
+    if include_unfilled:
+        roles = [col for col in ASSISTANT_ROLE_COLUMNS if col in df_after.columns]
+        unfilled = {pos for pos in range(len(df_after)) if any(not a_vals[col][pos] for col in roles)}
+    for pos in range(len(df_after)):
+        rid = after_ids[pos]
+        if rid is not None and not _is_blank_cell(rid):
+            old = before_pos.get(str(rid).strip())
+        else:
+            old = pos if pos < len(df_before) else None
+        if old is not None and (b_in[old], b_out[old]) == (a_in[pos], a_out[pos]) and all(
+            b_vals[col][old] == a_vals[col][pos] for col in _ALLOCATION_INPUT_COLUMNS
+        ):
+            continue
+        changed.add(pos)
+        if a_in[pos] is not None and a_out[pos] is not None:
+            windows.append((a_in[pos], a_out[pos]))
+        if old is not None and b_in[old] is not None and b_out[old] is not None:
+            windows.append((b_in[old], b_out[old]))
+
+    if not windows:
+        return sorted(changed | unfilled)
+    rows = _build_intervals([
+        (a_in[pos], a_out[pos], pos)
+        for pos in range(len(df_after))
+        if a_in[pos] is not None and a_out[pos] is not None
+    ])
+    affected = changed | unfilled
+    for start_min, end_min in windows:
+        affected.update(_overlapping_items(rows, start_min, end_min))
+    return sorted(affected)
+
+
+# ================ ASSISTANT OCCUPANCY MATRIX ================
+# One int8 row per assistant (ALL_ASSISTANTS plus any department assistant the
+# staff profiles left out), one column per minute of today. Built once per
+# schedule version (and time blocks / weekly offs / staff list), so "who is free
+# now" or "who is free 14:00-15:30" are array slices. Later codes win when painting.
+# Appointments and blocks are busy over [In, Out): an assistant is free again
+# from the Out minute, the same boundary the allocator and the old window check
+# used. (The old "who is busy now" scan also counted the Out minute itself.)
+OCC_FREE, OCC_BUSY, OCC_BLOCKED, OCC_OFF = 0, 1, 2, 3
+OCC_STATUS = {OCC_FREE: "FREE", OCC_BUSY: "BUSY", OCC_BLOCKED: "BLOCKED", OCC_OFF: "BLOCKED"}
+
+
+def _is_forced_busy(in_min: int | None, out_min: int | None, status_text: str) -> bool:
+    """ON GOING rows (and ARRIVED rows without times) count as busy whatever the clock says."""
+    if "ON GOING" in status_text or "ONGOING" in status_text:
+        return True
+    return (in_min is None or out_min is None) and "ARRIVED" in status_text
 
-        changed = False
-        
-        # Get allocation rules for this department
-        dept_config = DEPARTMENTS.get(department, {})
-        allocation_rules = dept_config.get("allocation_rules", {})
 
-        roles = [("FIRST", current_first), ("SECOND", current_second), ("Third", current_third)]
-        for role, current_val in roles:
-            if only_fill_empty and (not _is_blank_cell(current_val)):
-                continue
-            
-            # Get preferred assistants for this role based on doctor, time, and other roles
-            preferred_assistants = []
-            
-            if role in allocation_rules:
-                rule = allocation_rules[role]
-                
-                # Try default rules first (unless there are conditional rules for SECOND)
-                default_list = rule.get("default", [])
-                for assistant_name in default_list:
-                    if assistant_name.upper() not in already and assistant_name.upper() in free_assistants:
-                        preferred_assistants.append(free_assistants[assistant_name.upper()])
-                
-                # If we found from default, use them
-                if preferred_assistants:
-                    pass  # We have preferred assistants from default rules
-                else:
-                    # Only use doctor-specific rules if we're short of assistants (fallback)
-                    doctor_assistant_list = rule.get(doctor, [])
-                    for assistant_name in doctor_assistant_list:
-                        if assistant_name.upper() not in already and assistant_name.upper() in free_assistants:
-                            preferred_assistants.append(free_assistants[assistant_name.upper()])
-                    
-                    # If still no preferred assistants and conditional rules exist, try those
-                    if not preferred_assistants and "when_first_is" in rule and role == "SECOND":
-                        first_assistant = df_schedule.iloc[row_index, df_schedule.columns.get_loc("FIRST")] if "FIRST" in df_schedule.columns else ""
-                        first_assistant = str(first_assistant).strip()
-                        if first_assistant and first_assistant in rule["when_first_is"]:
-                            conditional_list = rule["when_first_is"][first_assistant]
-                            for assistant_name in conditional_list:
-                                if assistant_name.upper() not in already and assistant_name.upper() in free_assistants:
-                                    preferred_assistants.append(free_assistants[assistant_name.upper()])
-                    
-                    # Last resort: check time overrides (for FIRST role)
-                    if not preferred_assistants and role == "FIRST" and "time_override" in rule:
-                        time_overrides = rule["time_override"]
-                        if isinstance(time_overrides, list):
-                            for item in time_overrides:
-                                if isinstance(item, tuple):
-                                    start_hour, assistant_name = item
-                                    if appt_hour >= start_hour:
-                                        if assistant_name.upper() not in already and assistant_name.upper() in free_assistants:
-                                            preferred_assistants.append(free_assistants[assistant_name.upper()])
-
-            # If we have preferred assistants from rules, use the first available
-            if preferred_assistants:
-                chosen = preferred_assistants[0]
-                if role in df_schedule.columns:
-                    df_schedule.iloc[row_index, df_schedule.columns.get_loc(role)] = chosen
-                already.add(chosen.upper())
-                changed = True
-            else:
-                # Fallback: use any free assistant not already assigned
-                for free_name in free_assistants.values():
-                    if free_name.upper() not in already:
-                        if role in df_schedule.columns:
-                            df_schedule.iloc[row_index, df_schedule.columns.get_loc(role)] = free_name
-                        already.add(free_name.upper())
-                        changed = True
-                        break
+def assistant_occupancy(df_schedule: pd.DataFrame) -> dict[str, Any]:
+    """{"names", "rows", "matrix", "forced"} for every known assistant (see section comment)."""
+    entry = _assistant_index_entry(df_schedule)
+    names = _unique_preserve_order(
+        [str(a).strip().upper() for a in ALL_ASSISTANTS]
+        + [str(a).strip().upper() for dept in DEPARTMENTS.values() for a in dept["assistants"]]
+    )
+    off = {str(a).strip().upper() for a in WEEKLY_OFF.get(now.weekday(), [])}
+    blocks = _time_block_table()
+    sig = (now.strftime("%Y-%m-%d"), tuple(names), tuple(sorted(off)), blocks["sig"])
+    occupancy = entry["occupancy"]
+    if occupancy.get("sig") == sig:
+        return occupancy
+
+    matrix = np.zeros((len(names), 1440), dtype=np.int8)
+    forced = np.zeros(len(names), dtype=bool)
+    for i, name in enumerate(names):
+        for _, _, in_min, out_min, _, status_text in entry["index"].get(name, []):
+            if _is_forced_busy(in_min, out_min, status_text):
+                forced[i] = True
+            if in_min is not None and out_min is not None:
+                # Zero-length rows still hold their start minute
+                matrix[i, max(in_min, 0):min(max(out_min, in_min + 1), 1440)] = OCC_BUSY
+        block_intervals = blocks["by_assistant"].get(name)
+        if block_intervals:
+            for start_min, end_min in zip(block_intervals[0], block_intervals[1]):
+                matrix[i, max(start_min, 0):min(end_min, 1440)] = OCC_BLOCKED
+        if name in off:
+            matrix[i, :] = OCC_OFF
+
+    occupancy.clear()
+    occupancy.update({
+        "sig": sig,
+        "names": names,
+        "rows": {name: i for i, name in enumerate(names)},
+        "matrix": matrix,
+        "forced": forced,
+    })
+    return occupancy
+
+
+def occupancy_codes_at(occupancy: dict[str, Any], minute: int) -> np.ndarray:
+    """State code per assistant at `minute` (forced-busy rows count as busy when otherwise free)."""
+    codes = occupancy["matrix"][:, int(minute) % 1440].copy()
+    codes[(codes == OCC_FREE) & occupancy["forced"]] = OCC_BUSY
+    return codes
+
+
+def _occupancy_rows(occupancy: dict[str, Any], assistants: list[str] | None) -> np.ndarray:
+    if assistants is None:
+        return np.arange(len(occupancy["names"]))
+    rows = occupancy["rows"]
+    return np.array([rows[a] for a in (str(x).strip().upper() for x in assistants) if a in rows], dtype=np.intp)
+
+
+def assistants_free_between(
+    df_schedule: pd.DataFrame,
+    start_min: int,
+    end_min: int,
+    assistants: list[str] | None = None,
+) -> list[str]:
+    """Assistants with no appointment, block or weekly off in [start_min, end_min)."""
+    occupancy = assistant_occupancy(df_schedule)
+    rows = _occupancy_rows(occupancy, assistants)
+    start_min, end_min = max(int(start_min), 0), min(int(end_min), 1440)
+    if end_min <= start_min:
+        return [occupancy["names"][i] for i in rows]
+    free = ~(occupancy["matrix"][rows, start_min:end_min] != OCC_FREE).any(axis=1)
+    return [occupancy["names"][i] for i in rows[free]]
+
+
+def occupancy_counts(df_schedule: pd.DataFrame, minute: int, assistants: list[str] | None = None) -> dict[str, int]:
+    """FREE/BUSY/BLOCKED counts at `minute` for the given assistants (all by default)."""
+    occupancy = assistant_occupancy(df_schedule)
+    codes = occupancy_codes_at(occupancy, minute)[_occupancy_rows(occupancy, assistants)]
+    tally = np.bincount(codes, minlength=4)
+    return {
+        "FREE": int(tally[OCC_FREE]),
+        "BUSY": int(tally[OCC_BUSY]),
+        "BLOCKED": int(tally[OCC_BLOCKED] + tally[OCC_OFF]),
+    }
 
-        return changed
-    except Exception:
-        return False
 
 def get_current_assistant_status(df_schedule: pd.DataFrame) -> dict[str, dict[str, str]]:
     """
@@ -3088,7 +4139,6 @@ def get_current_assistant_status(df_schedule: pd.DataFrame) -> dict[str, dict[st
     Returns dict with assistant name -> status info
     """
     status = {}
-    current_time = time_type(now.hour, now.minute)
     current_min = now.hour * 60 + now.minute
     today_weekday = now.weekday()
     weekday_name_list = globals().get("weekday_names", [])
@@ -3097,81 +4147,57 @@ def get_current_assistant_status(df_schedule: pd.DataFrame) -> dict[str, dict[st
         if isinstance(weekday_name_list, list) and 0 <= today_weekday < len(weekday_name_list)
         else now.strftime("%A")
     )
-    weekly_off_set = {
-        str(name).strip().upper()
-        for name in WEEKLY_OFF.get(today_weekday, [])
-        if str(name).strip()
-    }
-    
-    for assistant in ALL_ASSISTANTS:
-        assist_upper = assistant.upper()
+    occupancy = assistant_occupancy(df_schedule)
+    codes = occupancy_codes_at(occupancy, current_min)
+
+    for assist_upper, code in zip(occupancy["names"], codes.tolist()):
+        department = get_department_for_assistant(assist_upper)
 
         # Weekly off overrides all other availability states
-        if assist_upper in weekly_off_set:
+        if code == OCC_OFF:
             status[assist_upper] = {
                 "status": "BLOCKED",
                 "reason": f"Weekly off ({weekday_label})",
-                "department": get_department_for_assistant(assist_upper),
+                "department": department,
             }
             continue
-        
-        # Check if blocked
-        is_blocked, block_reason = is_assistant_blocked(assist_upper, current_time)
-        if is_blocked:
+
+        if code == OCC_BLOCKED:
+            block = _first_overlap(_time_block_intervals(assist_upper), current_min, current_min + 1)
             status[assist_upper] = {
                 "status": "BLOCKED",
-                "reason": block_reason,
-                "department": get_department_for_assistant(assist_upper)
+                "reason": block[1] if block else "Blocked",
+                "department": department,
             }
             continue
-        
-        # Check current appointments
-        schedule = get_assistant_schedule(assist_upper, df_schedule)
-        current_appt = None
-        
-        for appt in schedule:
-            status_text = str(appt.get("status", "")).upper()
-            appt_in = _coerce_to_time_obj(appt.get("in_time"))
-            appt_out = _coerce_to_time_obj(appt.get("out_time"))
-
-            # If status explicitly says ON GOING, treat as busy regardless of time parsing.
-            if "ON GOING" in status_text or "ONGOING" in status_text:
-                current_appt = appt
-                break
-
-            # If timing is missing but status shows ARRIVED, treat as busy to avoid zero-count glitch.
-            if (appt_in is None or appt_out is None) and "ARRIVED" in status_text:
-                current_appt = appt
-                break
-            
-            if appt_in is None or appt_out is None:
-                continue
-            
-            appt_in_min = appt_in.hour * 60 + appt_in.minute
-            appt_out_min = appt_out.hour * 60 + appt_out.minute
-            if appt_out_min < appt_in_min:
-                appt_out_min += 1440
-            
-            if appt_in_min <= current_min <= appt_out_min:
-                current_appt = appt
-                break
-        
-        if current_appt:
+
+        if code == OCC_BUSY:
+            # First appointment (row order) that makes the assistant busy right now
+            current_appt = next(
+                (
+                    pos
+                    for pos, _, appt_in_min, appt_out_min, _, status_text in _assistant_appointments(assist_upper, df_schedule)
+                    if _is_forced_busy(appt_in_min, appt_out_min, status_text)
+                    or (appt_in_min is not None and appt_out_min is not None and appt_in_min <= current_min < appt_out_min)
+                ),
+                None,
+            )
+            patient = _schedule_cell(df_schedule, current_appt, "Patient Name", "Unknown") if current_appt is not None else "Unknown"
             status[assist_upper] = {
                 "status": "BUSY",
-                "reason": f"With {current_appt.get('patient', 'patient')}",
-                "patient": current_appt.get("patient", ""),
-                "doctor": current_appt.get("doctor", ""),
-                "op": current_appt.get("op", ""),
-                "department": get_department_for_assistant(assist_upper)
+                "reason": f"With {patient}",
+                "patient": patient,
+                "doctor": _schedule_cell(df_schedule, current_appt, "DR.") if current_appt is not None else "",
+                "op": _schedule_cell(df_schedule, current_appt, "OP") if current_appt is not None else "",
+                "department": department,
             }
         else:
             status[assist_upper] = {
                 "status": "FREE",
                 "reason": "Available",
-                "department": get_department_for_assistant(assist_upper)
+                "department": department,
             }
-    
+
     return status
 
 
@@ -3237,6 +4263,10 @@ def _render_assistant_cards(card_entries: list[dict[str, Any]]) -> None:
                 if op_room:
                     detail_lines.append(f"OP: {op_room}")
 
+                next_free = str(info.get("next_free", "")).strip()
+                if next_free:
+                    detail_lines.append(f"Free from {next_free}")
+
                 detail_text = " | ".join(line for line in detail_lines if line)
 
                 # Use expander for card-like appearance
@@ -3276,6 +4306,16 @@ with st.sidebar:
         value=st.session_state.get("auto_assign_only_empty", True),
         help="If enabled, only empty assistant slots will be auto-filled."
     )
+    st.session_state.auto_assign_incremental = st.checkbox(
+        "Only re-allocate around edits",
+        value=st.session_state.get("auto_assign_incremental", True),
+        help="Recompute assistants only for edited rows and rows overlapping their old or new time. Turn off to re-check every row on save."
+    )
+    _rules_engine = get_allocation_rules()
+    if _rules_engine.get("error"):
+        st.caption(f"⚠️ Using built-in allocation rules ({_rules_engine['error']})")
+    else:
+        st.caption(f"Allocation rules: {_rules_engine.get('source', 'built-in')}")
 
 # ================ WEEKLY OFF DISPLAY ================
 with st.sidebar:
@@ -3322,6 +4362,25 @@ file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Putt Allot
 supabase_client = None
 supabase_table_name = "tdb_allotment_state"
 supabase_row_id = "main"
+# Row-level storage: one row per appointment (see _get_supabase_storage_config)
+supabase_rows_table_name = "tdb_allotment_rows"
+SUPABASE_STORAGE_MODES = ("blob", "rows")
+SUPABASE_STORAGE_MODE_DEFAULT = "blob"
+# Finished clinic days are archived here (one row per state_id + day)
+supabase_archive_table_name = "tdb_allotment_archive"
+LOCAL_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schedule_archive")
+# Blob payload encoding: "records" (list of row dicts) or "columnar" (see _encode_columnar_payload)
+SUPABASE_PAYLOAD_FORMATS = ("records", "columnar")
+SUPABASE_PAYLOAD_FORMAT_DEFAULT = "records"
+COLUMNAR_PAYLOAD_VERSION = "columnar-v1"
+COLUMNAR_DICT_COLUMNS = ("DR.", "OP", "FIRST", "SECOND", "Third", "STATUS")
+# Reminder snooze/dismiss sidecar (kept out of the schedule payload)
+supabase_reminder_table_name = "tdb_reminder_state"
+GSHEETS_REMINDERS_SHEET = "Reminders"
+LOCAL_REMINDER_STATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tdb_reminder_state.json")
+# Assistant time blocks (kept out of the schedule payload)
+supabase_time_blocks_table_name = "tdb_time_blocks"
+GSHEETS_TIME_BLOCKS_SHEET = "TimeBlocks"
 # Force supabase-only by default (no Excel fallback)
 FORCE_SUPABASE = True
 PROFILE_SUPABASE_TABLE = "profiles"
@@ -3346,6 +4405,145 @@ def _as_bool(val) -> bool:
         return str(val).strip().lower() in {"1", "true", "yes", "on"}
     except Exception:
         return False
+
+
+# ================ Supabase Client Pool ================
+# One client per (url, key) for the whole process. supabase-py keeps its HTTP
+# session alive between requests, so reusing the client keeps connections warm.
+# Health is probed only when the last successful use is older than the TTL.
+SUPABASE_HEALTH_TTL_SECONDS = 60
+
+
+@st.cache_resource
+def _supabase_client_pool() -> dict:
+    """Process-wide {(url, key): {"client", "last_ok"}} plus a lock."""
+    return {"lock": threading.Lock(), "clients": {}}
+
+
+def _get_supabase_client(url: str, key: str, probe_table: str | None = None):
+    """Return a pooled Supabase client, rebuilding it if a health probe fails."""
+    pool = _supabase_client_pool()
+    with pool["lock"]:
+        entry = pool["clients"].get((url, key))
+        if entry is None:
+            entry = {"client": create_client(url, key), "last_ok": 0.0}
+            pool["clients"][(url, key)] = entry
+
+    if probe_table and (time_module.time() - entry["last_ok"]) > SUPABASE_HEALTH_TTL_SECONDS:
+        try:
+            entry["client"].table(probe_table).select("id").limit(1).execute()
+        except Exception:
+            # Stale connection: rebuild once and re-probe (raises if still failing).
+            with pool["lock"]:
+                entry = {"client": create_client(url, key), "last_ok": 0.0}
+                pool["clients"][(url, key)] = entry
+            entry["client"].table(probe_table).select("id").limit(1).execute()
+        entry["last_ok"] = time_module.time()
+    return entry["client"]
+
+
+def _mark_supabase_client_ok(url: str, key: str) -> None:
+    entry = _supabase_client_pool()["clients"].get((url, key))
+    if entry is not None:
+        entry["last_ok"] = time_module.time()
+
+
+def _drop_supabase_client(url: str, key: str) -> None:
+    """Forget a pooled client after a failed request so the next call reconnects."""
+    pool = _supabase_client_pool()
+    with pool["lock"]:
+        pool["clients"].pop((url, key), None)
+
+
+# ================ Local Read-Through Cache (SQLite) ================
+# Last known schedule (with meta) and staff profiles, each stored with the
+# backend version it came from. New processes render from here immediately
+# while the backend is revalidated in the background, and the dashboard stays
+# usable (read-only) when the backend cannot be reached.
+LOCAL_CACHE_PATH = os.getenv(
+    "TDB_LOCAL_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tdb_cache.sqlite3"),
+)
+
+
+@st.cache_resource
+def _local_cache_db() -> dict:
+    """Process-wide SQLite connection + lock (None connection if the file is unusable)."""
+    conn = None
+    try:
+        conn = sqlite3.connect(LOCAL_CACHE_PATH, check_same_thread=False, timeout=5)
+        conn.execute(
+            "create table if not exists cache ("
+            " key text primary key, version text, payload text not null, stored_at real not null)"
+        )
+        conn.commit()
+    except Exception:
+        conn = None
+    return {"conn": conn, "lock": threading.Lock()}
+
+
+def _local_cache_put(key: str, version, payload) -> None:
+    db = _local_cache_db()
+    if db["conn"] is None:
+        return
+    try:
+        blob = json.dumps(payload, default=str)
+        with db["lock"]:
+            db["conn"].execute(
+                "insert or replace into cache (key, version, payload, stored_at) values (?, ?, ?, ?)",
+                (key, None if version is None else str(version), blob, time_module.time()),
+            )
+            db["conn"].commit()
+    except Exception:
+        pass
+
+
+def _local_cache_get(key: str):
+    """Return (version, payload, stored_at) or None."""
+    db = _local_cache_db()
+    if db["conn"] is None:
+        return None
+    try:
+        with db["lock"]:
+            row = db["conn"].execute("select version, payload, stored_at from cache where key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+    except Exception:
+        return None
+
+
+def _local_cache_put_frame(key: str, version, df: pd.DataFrame) -> None:
+    _local_cache_put(
+        key, version,
+        {"columns": df.columns.tolist(), "rows": _df_to_json_records(df), "meta": _get_meta_from_df(df)},
+    )
+
+
+def _local_cache_get_frame(key: str):
+    """Return (version, DataFrame, stored_at) from the local cache, or None."""
+    hit = _local_cache_get(key)
+    if hit is None or not isinstance(hit[1], dict):
+        return None
+    payload = hit[1]
+    df = _schedule_frame_from_records(payload.get("rows") or [], payload.get("columns"), payload.get("meta") or {})
+    return hit[0], df, hit[2]
+
+
+@st.cache_resource
+def _backend_health() -> dict:
+    """Process-wide backend reachability: {"offline", "error", "cached_at"}."""
+    return {"offline": False, "error": "", "cached_at": None}
+
+
+def _set_backend_online() -> None:
+    health = _backend_health()
+    health.update({"offline": False, "error": "", "cached_at": None})
+
+
+def _set_backend_offline(error, cached_at) -> None:
+    health = _backend_health()
+    health.update({"offline": True, "error": str(error), "cached_at": cached_at})
 # Allow forcing Supabase mode via env or secrets
 try:
     if _as_bool(_safe_secret_get("force_supabase", False)) or _as_bool(os.environ.get("FORCE_SUPABASE", "")):
@@ -3767,6 +4965,31 @@ def _get_supabase_config_from_secrets_or_env():
     return url, effective_key, table, row_id, profile_table
 
 
+def _get_supabase_storage_config():
+    """Return (storage_mode, rows_table) from Streamlit secrets/env vars.
+
+    storage_mode is "blob" (whole schedule in one `payload` row, the default)
+    or "rows" (one row per appointment in `rows_table`).
+    """
+    mode = SUPABASE_STORAGE_MODE_DEFAULT
+    rows_table = supabase_rows_table_name
+
+    try:
+        if hasattr(st, 'secrets'):
+            mode = str(st.secrets.get("supabase_storage_mode", mode) or mode).strip() or mode
+            rows_table = str(st.secrets.get("supabase_rows_table", rows_table) or rows_table).strip() or rows_table
+    except Exception:
+        pass
+
+    mode = os.getenv("SUPABASE_STORAGE_MODE", mode).strip() or mode
+    rows_table = os.getenv("SUPABASE_ROWS_TABLE", rows_table).strip() or rows_table
+
+    mode = mode.lower()
+    if mode not in SUPABASE_STORAGE_MODES:
+        mode = SUPABASE_STORAGE_MODE_DEFAULT
+    return mode, rows_table
+
+
 def _get_expected_columns():
     return [
         "Patient ID", "Patient Name", "In Time", "Out Time", "Procedure", "DR.",
@@ -3850,7 +5073,7 @@ def search_patients_from_supabase(
 ):
     """Search patients (id + name) from a Supabase table."""
     q = (_query or "").strip()
-    client = create_client(_url, _key)
+    client = _get_supabase_client(_url, _key)
 
     def _is_simple_ident(name: str) -> bool:
         return bool(re.match(r"^[A-Za-z_][A-Za-z0-9_]*$", str(name or "")))
@@ -3985,84 +5208,661 @@ def search_patients_from_supabase(
     return out
 
 
-@st.cache_data(ttl=30)
+# ================ Columnar Payload Encoding ================
+# payload = {"format": "columnar-v1", "columns": [...], "data": {col: [values...]}}
+# Low-cardinality columns are dictionary-encoded as {"dict": [...], "codes": [...]}
+# so names like "DR.SHIFA" or "WAITING" are stored once instead of once per row.
+def _get_supabase_payload_format() -> str:
+    # Env wins over secrets, as in _get_supabase_storage_config.
+    fmt = os.getenv("SUPABASE_PAYLOAD_FORMAT", "").strip() or _safe_secret_get("supabase_payload_format", None)
+    fmt = str(fmt or SUPABASE_PAYLOAD_FORMAT_DEFAULT).strip().lower()
+    return fmt if fmt in SUPABASE_PAYLOAD_FORMATS else SUPABASE_PAYLOAD_FORMAT_DEFAULT
+
+
+def _encode_columnar_payload(df: pd.DataFrame) -> dict:
+    df_clean = df.copy().fillna("")
+    data: dict = {}
+    for col in df_clean.columns:
+        values = df_clean[col].astype(object)
+        if col in COLUMNAR_DICT_COLUMNS:
+            codes, uniques = pd.factorize(values)
+            data[col] = {"dict": list(uniques), "codes": codes.tolist()}
+        else:
+            data[col] = values.tolist()
+    return {"format": COLUMNAR_PAYLOAD_VERSION, "columns": df_clean.columns.tolist(), "data": data}
+
+
+def _decode_columnar_data(payload: dict) -> dict:
+    """Return {col: [values...]} from a columnar payload."""
+    out: dict = {}
+    for col, values in (payload.get("data") or {}).items():
+        if isinstance(values, dict):
+            lookup = values.get("dict") or []
+            out[col] = [lookup[c] if 0 <= c < len(lookup) else "" for c in (values.get("codes") or [])]
+        else:
+            out[col] = list(values or [])
+    return out
+
+
+# ================ Supabase Row-Level Storage ================
+# In "rows" mode each appointment lives in its own row of `supabase_rows_table_name`
+# keyed by (state_id, row_id), where row_id is REMINDER_ROW_ID. The single state row
+# in `supabase_table_name` keeps only the columns + meta header and a
+# {"storage": "rows"} marker. Saves diff against the last loaded/saved snapshot
+# and send only the inserted, updated and deleted rows.
+SUPABASE_ROWS_PAGE_SIZE = 1000
+SUPABASE_ROWS_WRITE_CHUNK = 500
+
+
+@st.cache_resource
+def _supabase_row_baselines() -> dict:
+    """Process-wide {(url, rows_table, state_id): snapshot} of the last synced rows."""
+    return {}
+
+
+def _row_record_digest(record: dict) -> str:
+    return hashlib.md5(json.dumps(record, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _df_to_json_records(df: pd.DataFrame) -> list[dict]:
+    df_clean = df.copy().fillna("")
+    # Convert to JSON-serializable primitives; avoid pandas NA
+    for col in df_clean.columns:
+        df_clean[col] = df_clean[col].astype(object)
+    return df_clean.to_dict(orient="records")
+
+
+def _assign_row_positions(row_ids: list[str], old_positions: dict) -> list[float]:
+    """Keep stored positions where df order allows it; slot the rest in between.
+
+    Only rows that were added or moved get a new position, so reordering one
+    row does not rewrite every row after it.
+    """
+    n = len(row_ids)
+    positions: list = [None] * n
+    last = None
+    for i, rid in enumerate(row_ids):
+        p = old_positions.get(rid)
+        if p is not None and (last is None or p > last):
+            positions[i] = float(p)
+            last = float(p)
+
+    i = 0
+    while i < n:
+        if positions[i] is not None:
+            i += 1
+            continue
+        j = i
+        while j < n and positions[j] is None:
+            j += 1
+        lo = positions[i - 1] if i > 0 else None
+        hi = positions[j] if j < n else None
+        k = j - i
+        if lo is None and hi is None:
+            lo, hi = 0.0, float(k + 1)
+        elif lo is None:
+            lo = hi - float(k + 1)
+        elif hi is None:
+            hi = lo + float(k + 1)
+        step = (hi - lo) / (k + 1)
+        if step < 1e-6:
+            # Gaps exhausted after many inserts; renumber everything.
+            return [float(x) for x in range(n)]
+        for off in range(k):
+            positions[i + off] = lo + step * (off + 1)
+        i = j
+    return positions
+
+
+def _supabase_rows_header(columns: list, meta: dict) -> dict:
+    return {"columns": list(columns), "rows": [], "meta": meta or {}, "storage": "rows"}
+
+
+def _fetch_supabase_rows(client, rows_table: str, state_id: str) -> list[dict]:
+    """Fetch all stored rows for a state id (paginated), ordered by position."""
+    out: list[dict] = []
+    start = 0
+    while True:
+        resp = (
+            client.table(rows_table)
+            .select("row_id,day,position,data")
+            .eq("state_id", state_id)
+            .order("position")
+            .range(start, start + SUPABASE_ROWS_PAGE_SIZE - 1)
+            .execute()
+        )
+        batch = getattr(resp, "data", None) or []
+        out.extend(batch)
+        if len(batch) < SUPABASE_ROWS_PAGE_SIZE:
+            break
+        start += SUPABASE_ROWS_PAGE_SIZE
+    return out
+
+
+def _migrate_blob_to_supabase_rows(client, table: str, rows_table: str, state_id: str, payload: dict) -> None:
+    """One-time move of a legacy blob payload into the rows table."""
+    columns = payload.get("columns") or _get_expected_columns()
+    legacy_rows = payload.get("rows") or []
+    if payload.get("format") == COLUMNAR_PAYLOAD_VERSION:
+        legacy_rows = pd.DataFrame(_decode_columnar_data(payload)).to_dict(orient="records")
+    day = now_ist().date().isoformat()
+    seen: set = set()
+    records = []
+    for pos, rec in enumerate(legacy_rows):
+        rec = dict(rec or {})
+        rid = str(rec.get("REMINDER_ROW_ID", "") or "").strip()
+        if not rid or rid.lower() == "nan" or rid in seen:
+            rid = str(uuid.uuid4())
+            rec["REMINDER_ROW_ID"] = rid
+        seen.add(rid)
+        records.append({"state_id": state_id, "row_id": rid, "day": day, "position": float(pos), "data": rec})
+    for i in range(0, len(records), SUPABASE_ROWS_WRITE_CHUNK):
+        client.table(rows_table).upsert(
+            records[i:i + SUPABASE_ROWS_WRITE_CHUNK], on_conflict="state_id,row_id"
+        ).execute()
+    client.table(table).upsert(
+        {
+            "id": state_id,
+            "payload": _supabase_rows_header(columns, payload.get("meta") or {}),
+            "updated_at": _new_supabase_version(),
+        }
+    ).execute()
+
+
+def _schedule_frame_from_records(records: list, columns, meta) -> pd.DataFrame:
+    """Build the schedule DataFrame from stored records or {col: values} (expected columns added, ordered)."""
+    columns = list(columns or _get_expected_columns())
+    # Ensure new expected columns are added for older saved payloads.
+    for col in _get_expected_columns():
+        if col not in columns:
+            columns.append(col)
+    df = pd.DataFrame(records)
+    # Ensure expected columns are present and ordered
+    for col in columns:
+        if col not in df.columns:
+            df[col] = ""
+    df = df[columns]
+
+    # Optional metadata (e.g., assistant time blocks)
+    if isinstance(meta, dict):
+        df.attrs["meta"] = dict(meta)
+    return df
+
+
+def _load_supabase_rows(client, url: str, table: str, rows_table: str, state_id: str, header: dict):
+    """Load the schedule from the rows table and remember it as the save baseline."""
+    stored = _fetch_supabase_rows(client, rows_table, state_id)
+    records = [dict(r.get("data") or {}) for r in stored]
+    df = _schedule_frame_from_records(records, header.get("columns"), header.get("meta"))
+
+    _supabase_row_baselines()[(url, rows_table, state_id)] = {
+        "rows": {
+            str(r.get("row_id")): {
+                "digest": _row_record_digest(dict(r.get("data") or {})),
+                "day": r.get("day"),
+                "position": r.get("position"),
+            }
+            for r in stored
+        },
+        "header": _row_record_digest(_supabase_rows_header(header.get("columns") or [], header.get("meta") or {})),
+    }
+    return df
+
+
+def _save_supabase_rows(client, url: str, table: str, rows_table: str, state_id: str,
+                        df: pd.DataFrame, meta: dict, version: str) -> list[dict]:
+    """Write only the inserted/updated/deleted rows and bump the state row version.
+
+    Returns the stored records in schedule order.
+    """
+    key = (url, rows_table, state_id)
+    baselines = _supabase_row_baselines()
+    baseline = baselines.get(key)
+    if baseline is None:
+        # No snapshot in this process yet (e.g. first save after restart).
+        stored = _fetch_supabase_rows(client, rows_table, state_id)
+        baseline = {
+            "rows": {
+                str(r.get("row_id")): {
+                    "digest": _row_record_digest(dict(r.get("data") or {})),
+                    "day": r.get("day"),
+                    "position": r.get("position"),
+                }
+                for r in stored
+            },
+            "header": None,
+        }
+    old_rows = baseline.get("rows") or {}
+
+    # Give blank/duplicate rows a stable id in the frame itself, so the next save
+    # sees the same ids instead of inserting fresh rows and deleting these.
+    current_ids = df["REMINDER_ROW_ID"].tolist() if "REMINDER_ROW_ID" in df.columns else [""] * len(df)
+    row_ids: list[str] = []
+    seen: set = set()
+    for value in current_ids:
+        rid = "" if _is_blank_cell(value) else str(value).strip()
+        if not rid or rid in seen:
+            rid = str(uuid.uuid4())
+        seen.add(rid)
+        row_ids.append(rid)
+    if row_ids != current_ids:
+        df["REMINDER_ROW_ID"] = row_ids
+    records = _df_to_json_records(df)
+
+    positions = _assign_row_positions(
+        row_ids, {rid: info.get("position") for rid, info in old_rows.items() if info.get("position") is not None}
+    )
+    today = now_ist().date().isoformat()
+
+    new_rows: dict = {}
+    upserts: list[dict] = []
+    for rid, rec, pos in zip(row_ids, records, positions):
+        digest = _row_record_digest(rec)
+        old = old_rows.get(rid) or {}
+        day = old.get("day") or today
+        new_rows[rid] = {"digest": digest, "day": day, "position": pos}
+        if old.get("digest") != digest or old.get("position") != pos:
+            upserts.append({"state_id": state_id, "row_id": rid, "day": day, "position": pos, "data": rec})
+    deleted = [rid for rid in old_rows if rid not in new_rows]
+
+    for i in range(0, len(upserts), SUPABASE_ROWS_WRITE_CHUNK):
+        client.table(rows_table).upsert(
+            upserts[i:i + SUPABASE_ROWS_WRITE_CHUNK], on_conflict="state_id,row_id"
+        ).execute()
+    for i in range(0, len(deleted), SUPABASE_ROWS_WRITE_CHUNK):
+        client.table(rows_table).delete().eq("state_id", state_id).in_(
+            "row_id", deleted[i:i + SUPABASE_ROWS_WRITE_CHUNK]
+        ).execute()
+
+    # The state row carries the schedule version, so touch it whenever anything changed.
+    header = _supabase_rows_header(df.columns.tolist(), meta)
+    header_digest = _row_record_digest(header)
+    if upserts or deleted or header_digest != baseline.get("header"):
+        client.table(table).upsert({"id": state_id, "payload": header, "updated_at": version}).execute()
+
+    baselines[key] = {"rows": new_rows, "header": header_digest}
+    return records
+
+
+# ================ Supabase Versioned Schedule Cache ================
+# The state row's `updated_at` is the schedule version. Loads probe just that
+# column and reuse the last decoded DataFrame while it has not moved; saves
+# write a new `updated_at` and keep the frame they wrote as the cached copy.
+SUPABASE_VERSION_PROBE_SECONDS = 5
+# Without a usable `updated_at` the version cannot be probed; refetch at most this often.
+SUPABASE_UNVERSIONED_REFETCH_SECONDS = 60
+
+
+@st.cache_resource
+def _supabase_frame_cache() -> dict:
+    """Process-wide {(url, table, row_id): {"version", "probed_at", "fetched_at", "df"}}."""
+    return {}
+
+
+def _copy_schedule_frame(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    out.attrs = copy.deepcopy(df.attrs)
+    return out
+
+
+def _new_supabase_version() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _remember_supabase_frame(url: str, table: str, row_id: str, version, df: pd.DataFrame,
+                             persist_local: bool = True) -> None:
+    now_ts = time_module.time()
+    _supabase_frame_cache()[(url, table, row_id)] = {
+        "version": _parse_iso_ts(version) if version else None,
+        "probed_at": now_ts,
+        "fetched_at": now_ts,
+        "df": df,
+    }
+    if persist_local:
+        _local_cache_put_frame(f"schedule:{url}:{table}:{row_id}", version, df)
+
+
+def _invalidate_supabase_schedule_cache(url: str | None = None, table: str | None = None, row_id: str | None = None) -> None:
+    """Drop cached schedule frames (all of them when no key is given)."""
+    cache = _supabase_frame_cache()
+    if url is None:
+        cache.clear()
+    else:
+        cache.pop((url, table, row_id), None)
+
+
+def _fetch_supabase_schedule(client, url: str, table: str, row_id: str):
+    """Download and decode the stored schedule; returns (DataFrame, version)."""
+    storage_mode, rows_table = _get_supabase_storage_config()
+    resp = client.table(table).select("payload,updated_at").eq("id", row_id).execute()
+
+    data = getattr(resp, "data", None)
+    payload = data[0].get("payload") if (data and isinstance(data, list)) else None
+    version = data[0].get("updated_at") if (data and isinstance(data, list)) else None
+    if storage_mode == "rows" and isinstance(payload, dict) and (payload.get("rows") or payload.get("data")) and payload.get("storage") != "rows":
+        _migrate_blob_to_supabase_rows(client, table, rows_table, row_id, payload)
+        payload = _supabase_rows_header(payload.get("columns") or _get_expected_columns(), payload.get("meta") or {})
+        version = None
+    if storage_mode == "rows" or (isinstance(payload, dict) and payload.get("storage") == "rows"):
+        df = _load_supabase_rows(client, url, table, rows_table, row_id, payload or {})
+    elif not payload:
+        df = pd.DataFrame(columns=_get_expected_columns())
+    elif payload.get("format") == COLUMNAR_PAYLOAD_VERSION:
+        df = _schedule_frame_from_records(_decode_columnar_data(payload), payload.get("columns"), payload.get("meta"))
+    else:
+        df = _schedule_frame_from_records(payload.get("rows") or [], payload.get("columns"), payload.get("meta"))
+    return df, version
+
+
+def _probe_supabase_version(client, table: str, row_id: str):
+    resp = client.table(table).select("updated_at").eq("id", row_id).execute()
+    data = getattr(resp, "data", None)
+    return _parse_iso_ts(data[0].get("updated_at")) if (data and isinstance(data, list)) else None
+
+
+def _revalidate_supabase_schedule(url: str, key: str, table: str, row_id: str) -> None:
+    """Background check after a cold start served from the local cache."""
+    def _run():
+        try:
+            client = _get_supabase_client(url, key)
+            cached = _supabase_frame_cache().get((url, table, row_id)) or {}
+            version = _probe_supabase_version(client, table, row_id)
+            if version is not None and version == cached.get("version"):
+                _set_backend_online()
+                return
+            df, version = _fetch_supabase_schedule(client, url, table, row_id)
+            _remember_supabase_frame(url, table, row_id, version, df)
+            _set_backend_online()
+            _publish_schedule_change()
+        except Exception as e:
+            _set_backend_offline(e, (_local_cache_get(f"schedule:{url}:{table}:{row_id}") or (None, None, None))[2])
+            _publish_schedule_change()
+
+    threading.Thread(target=_run, name="tdb-revalidate", daemon=True).start()
+
+
 def load_data_from_supabase(_url: str, _key: str, _table: str, _row_id: str):
     """Load dataframe payload from Supabase.
 
-    Storage model: a single row with `id` and `payload` (jsonb).
+    Storage model ("blob"): a single row with `id` and `payload` (jsonb).
     payload = {"columns": [...], "rows": [ {col: val, ...}, ... ]}
+    In "rows" mode the payload only carries columns/meta and each appointment
+    is read from the rows table (a legacy blob is migrated on first load).
+    The payload is only downloaded when the row's `updated_at` moved. A cold
+    process renders from the local cache and revalidates in the background;
+    if Supabase is unreachable the last known copy is returned (read-only).
     """
+    cache_key = (_url, _table, _row_id)
+    local_key = f"schedule:{_url}:{_table}:{_row_id}"
     try:
-        client = create_client(_url, _key)
-        resp = client.table(_table).select("payload").eq("id", _row_id).execute()
-
-        data = getattr(resp, "data", None)
-        if not data:
-            return pd.DataFrame(columns=_get_expected_columns())
-        payload = data[0].get("payload") if isinstance(data, list) else None
-        if not payload:
-            return pd.DataFrame(columns=_get_expected_columns())
-
-        columns = payload.get("columns") or _get_expected_columns()
-        # Ensure new expected columns are added for older saved payloads.
-        try:
-            expected = _get_expected_columns()
-            for col in expected:
-                if col not in columns:
-                    columns.append(col)
-        except Exception:
-            pass
-        rows = payload.get("rows") or []
-        df = pd.DataFrame(rows)
-        # Ensure expected columns are present and ordered
-        for col in columns:
-            if col not in df.columns:
-                df[col] = ""
-        df = df[columns]
-
-        # Optional metadata (e.g., assistant time blocks)
-        try:
-            meta = payload.get("meta")
-            if isinstance(meta, dict):
-                df.attrs["meta"] = dict(meta)
-        except Exception:
-            pass
-        return df
+        client = _get_supabase_client(_url, _key)
+        cached = _supabase_frame_cache().get(cache_key)
+        now_ts = time_module.time()
+        if cached is None:
+            hit = _local_cache_get_frame(local_key)
+            if hit is not None:
+                _remember_supabase_frame(_url, _table, _row_id, hit[0], hit[1], persist_local=False)
+                _revalidate_supabase_schedule(_url, _key, _table, _row_id)
+                return _copy_schedule_frame(hit[1])
+        else:
+            probe_every = (
+                SUPABASE_PUSH_PROBE_SECONDS if _schedule_notifier()["push_connected"]() else SUPABASE_VERSION_PROBE_SECONDS
+            )
+            if now_ts - cached["probed_at"] < probe_every:
+                return _copy_schedule_frame(cached["df"])
+            version = _probe_supabase_version(client, _table, _row_id)
+            unversioned_fresh = (
+                version is None
+                and cached["version"] is None
+                and now_ts - cached.get("fetched_at", 0) < SUPABASE_UNVERSIONED_REFETCH_SECONDS
+            )
+            if (version is not None and version == cached["version"]) or unversioned_fresh:
+                cached["probed_at"] = now_ts
+                _mark_supabase_client_ok(_url, _key)
+                _set_backend_online()
+                return _copy_schedule_frame(cached["df"])
+
+        df, version = _fetch_supabase_schedule(client, _url, _table, _row_id)
+        _mark_supabase_client_ok(_url, _key)
+        _set_backend_online()
+        _remember_supabase_frame(_url, _table, _row_id, version, df)
+        return _copy_schedule_frame(df)
     except Exception as e:
+        _drop_supabase_client(_url, _key)
+        cached = _supabase_frame_cache().get(cache_key)
+        hit = None if cached is not None else _local_cache_get_frame(local_key)
+        if cached is not None or hit is not None:
+            _set_backend_offline(e, hit[2] if hit is not None else cached["probed_at"])
+            if cached is not None:
+                # Retry on the normal probe schedule rather than on every rerun.
+                cached["probed_at"] = time_module.time()
+            return _copy_schedule_frame(cached["df"] if cached is not None else hit[1])
         st.error(f"Error loading from Supabase: {e}")
         return None
 
 
-def save_data_to_supabase(_url: str, _key: str, _table: str, _row_id: str, df: pd.DataFrame) -> bool:
-    """Save dataframe payload to Supabase (upsert)."""
-    try:
-        client = create_client(_url, _key)
-
-        df_clean = df.copy().fillna("")
-        # Convert to JSON-serializable primitives; avoid pandas NA
-        for col in df_clean.columns:
-            df_clean[col] = df_clean[col].astype(object)
+def save_data_to_supabase(_url: str, _key: str, _table: str, _row_id: str, df: pd.DataFrame, meta: dict | None = None) -> bool:
+    """Save dataframe payload to Supabase (upsert, or row deltas in "rows" mode).
 
-        payload = {
-            "columns": df_clean.columns.tolist(),
-            "rows": df_clean.to_dict(orient="records"),
-        }
+    Pass `meta` when calling off the script thread (it is otherwise built from session state).
+    """
+    try:
+        client = _get_supabase_client(_url, _key)
+        storage_mode, rows_table = _get_supabase_storage_config()
+        version = _new_supabase_version()
 
         # Optional metadata (stored alongside rows/columns)
-        try:
-            meta = _get_meta_from_df(df)
-            meta = _apply_time_blocks_to_meta(meta)
-            payload["meta"] = meta
-        except Exception:
-            pass
-        client.table(_table).upsert({"id": _row_id, "payload": payload}).execute()
-        load_data_from_supabase.clear()
+        if meta is None:
+            try:
+                meta = _get_meta_from_df(df)
+                meta = _apply_time_blocks_to_meta(meta)
+            except Exception:
+                pass
+
+        if storage_mode == "rows":
+            records = _save_supabase_rows(client, _url, _table, rows_table, _row_id, df, meta or {}, version)
+        elif _get_supabase_payload_format() == "columnar":
+            payload = _encode_columnar_payload(df)
+            records = _decode_columnar_data(payload)
+            if meta is not None:
+                payload["meta"] = meta
+            client.table(_table).upsert({"id": _row_id, "payload": payload, "updated_at": version}).execute()
+        else:
+            records = _df_to_json_records(df)
+            payload = {
+                "columns": df.columns.tolist(),
+                "rows": records,
+            }
+            if meta is not None:
+                payload["meta"] = meta
+            client.table(_table).upsert({"id": _row_id, "payload": payload, "updated_at": version}).execute()
+        _mark_supabase_client_ok(_url, _key)
+        _remember_supabase_frame(
+            _url, _table, _row_id, version, _schedule_frame_from_records(records, df.columns.tolist(), meta or {})
+        )
         return True
     except Exception as e:
+        _drop_supabase_client(_url, _key)
+        _invalidate_supabase_schedule_cache(_url, _table, _row_id)
         st.error(f"Error saving to Supabase: {e}")
         return False
 
 
+# ================ Schedule Change Notifications ================
+# Every process keeps a change epoch behind a small notifier interface:
+#   {"publish": () -> int, "subscribe": (callback) -> unsubscribe,
+#    "version": () -> int, "push_connected": () -> bool}
+# The in-process notifier (also the stand-in for tests) is bumped by saves in
+# this process; the Supabase Realtime notifier wraps it and also publishes
+# writes made by other processes. Each session runs a tiny fragment that
+# compares the epoch it last rendered with the current one and reruns the app
+# only when it moved, so dashboards update within about a second without
+# polling the backend.
+SCHEDULE_WATCH_INTERVAL_SECONDS = 1
+# Safety-net version probe while Realtime push is connected.
+SUPABASE_PUSH_PROBE_SECONDS = 300
+
+
+def make_local_schedule_notifier() -> dict:
+    """In-process notifier: publishes bump a counter and call subscribers."""
+    lock = threading.Lock()
+    state = {"epoch": 0, "subscribers": []}
+
+    def publish() -> int:
+        with lock:
+            state["epoch"] += 1
+            epoch = state["epoch"]
+            subscribers = list(state["subscribers"])
+        for callback in subscribers:
+            try:
+                callback(epoch)
+            except Exception:
+                pass
+        return epoch
+
+    def subscribe(callback):
+        with lock:
+            state["subscribers"].append(callback)
+
+        def unsubscribe() -> None:
+            with lock:
+                if callback in state["subscribers"]:
+                    state["subscribers"].remove(callback)
+
+        return unsubscribe
+
+    return {
+        "publish": publish,
+        "subscribe": subscribe,
+        "version": lambda: state["epoch"],
+        "push_connected": lambda: False,
+    }
+
+
+@st.cache_resource
+def _schedule_notifier_slot() -> dict:
+    """Process-wide holder for the active notifier."""
+    return {"notifier": make_local_schedule_notifier()}
+
+
+def _schedule_notifier() -> dict:
+    return _schedule_notifier_slot()["notifier"]
+
+
+def set_schedule_notifier(notifier: dict) -> None:
+    """Swap the process's notifier (Realtime listener, or a stand-in in tests)."""
+    _schedule_notifier_slot()["notifier"] = notifier
+
+
+def _publish_schedule_change() -> int:
+    """Signal that the stored schedule changed; returns the new epoch."""
+    return _schedule_notifier()["publish"]()
+
+
+def _schedule_epoch() -> int:
+    return int(_schedule_notifier()["version"]())
+
+
+def _realtime_enabled() -> bool:
+    val = _safe_secret_get("supabase_realtime", None)
+    if val is None:
+        val = os.getenv("SUPABASE_REALTIME", "true")
+    return _as_bool(val)
+
+
+def _on_remote_schedule_change(url: str, table: str, row_id: str, record: dict) -> None:
+    """Realtime callback: drop the cached frame if the version moved, then notify sessions."""
+    if not isinstance(record, dict) or str(record.get("id", row_id)) != str(row_id):
+        return
+    cached = _supabase_frame_cache().get((url, table, row_id))
+    version = _parse_iso_ts(record.get("updated_at"))
+    if cached is not None and version is not None and cached.get("version") == version:
+        # Echo of a save this process already cached.
+        return
+    _invalidate_supabase_schedule_cache(url, table, row_id)
+    _publish_schedule_change()
+
+
+def make_supabase_realtime_notifier(url: str, key: str, table: str, row_id: str, base: dict) -> dict:
+    """Notifier that also publishes changes pushed by Supabase Realtime.
+
+    Shares publish/subscribe/version with `base`; call ["start"]() to run the
+    listener in a daemon thread.
+    """
+    connected = {"value": False}
+
+    def _record_from_payload(payload) -> dict:
+        if not isinstance(payload, dict):
+            return {}
+        data = payload.get("data") if isinstance(payload.get("data"), dict) else payload
+        return data.get("record") or data.get("new") or {}
+
+    async def _listen():
+        import asyncio
+        from supabase import acreate_client  # type: ignore
+
+        backoff = 1
+        while True:
+            try:
+                client = await acreate_client(url, key)
+                channel = client.channel("tdb-schedule")
+                channel.on_postgres_changes(
+                    "*", schema="public", table=table,
+                    callback=lambda payload: _on_remote_schedule_change(url, table, row_id, _record_from_payload(payload)),
+                )
+                await channel.subscribe()
+                connected["value"] = True
+                backoff = 1
+                while True:
+                    await asyncio.sleep(30)
+            except Exception:
+                connected["value"] = False
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def _run():
+        try:
+            import asyncio
+            asyncio.run(_listen())
+        except Exception:
+            # Realtime unavailable (older supabase-py, blocked websockets): fall
+            # back to the cheap updated_at probe in load_data_from_supabase.
+            connected["value"] = False
+
+    def start() -> threading.Thread:
+        thread = threading.Thread(target=_run, name="tdb-realtime", daemon=True)
+        thread.start()
+        return thread
+
+    return dict(base, push_connected=lambda: connected["value"], start=start)
+
+
+@st.cache_resource
+def _start_supabase_realtime_listener(url: str, key: str, table: str, row_id: str):
+    """Install the Realtime notifier and start its listener (once per process)."""
+    notifier = make_supabase_realtime_notifier(url, key, table, row_id, _schedule_notifier())
+    set_schedule_notifier(notifier)
+    return notifier["start"]()
+
+
+def _render_schedule_change_watcher() -> None:
+    """Rerun this session shortly after the schedule changes anywhere in the process."""
+    if "seen_schedule_epoch" not in st.session_state:
+        st.session_state.seen_schedule_epoch = _schedule_epoch()
+    fragment = getattr(st, "fragment", None)
+    if fragment is None:
+        return
+
+    @fragment(run_every=SCHEDULE_WATCH_INTERVAL_SECONDS)
+    def _schedule_change_watcher():
+        epoch = _schedule_epoch()
+        if st.session_state.get("seen_schedule_epoch") != epoch:
+            st.session_state.seen_schedule_epoch = epoch
+            st.rerun()
+
+    _schedule_change_watcher()
+
+
 def _validate_service_account_info(info: dict) -> list[str]:
     missing: list[str] = []
     if not isinstance(info, dict) or not info:
@@ -4078,12 +5878,12 @@ if SUPABASE_AVAILABLE:
     try:
         sup_url, sup_key, sup_table, sup_row, profile_table = _get_supabase_config_from_secrets_or_env()
         if sup_url and sup_key:
-            supabase_client = create_client(sup_url, sup_key)
+            # Pooled client; the connectivity check (which also validates credentials)
+            # only runs when the pooled connection has not been used recently.
+            supabase_client = _get_supabase_client(sup_url, sup_key, probe_table=sup_table)
             supabase_table_name = sup_table
             supabase_row_id = sup_row
             PROFILE_SUPABASE_TABLE = profile_table
-            # Quick connectivity check (will also validate credentials)
-            _ = supabase_client.table(supabase_table_name).select("id").limit(1).execute()
             USE_SUPABASE = True
             st.sidebar.success("🗄️ Connected to Supabase")
             _seed_supabase_profiles_if_needed(supabase_client)
@@ -4105,6 +5905,22 @@ if SUPABASE_AVAILABLE:
                     ");\n",
                     language="sql",
                 )
+                st.markdown(
+                    "Optional: set `supabase_storage_mode = \"rows\"` to store one row per appointment "
+                    "(saves then send only changed rows). This needs a second table:"
+                )
+                st.code(
+                    "create table if not exists tdb_allotment_rows (\n"
+                    "  state_id text not null,\n"
+                    "  row_id text not null,\n"
+                    "  day date not null default current_date,\n"
+                    "  position double precision not null default 0,\n"
+                    "  data jsonb not null,\n"
+                    "  updated_at timestamptz not null default now(),\n"
+                    "  primary key (state_id, row_id)\n"
+                    ");\n",
+                    language="sql",
+                )
                 st.markdown(
                     "If you use the **anon key**, you may need to adjust Row Level Security (RLS). "
                     "Recommended: enable RLS and add policies allowing the single state row (id = 'main'):"
@@ -4140,13 +5956,15 @@ if SUPABASE_AVAILABLE:
               "Either add a server-side `supabase_service_role_key` in Streamlit Secrets or disable RLS for this table."
         )
         USE_SUPABASE = False
+        # Keep staff lists from the last successful connection.
+        _refresh_staff_options_from_supabase(None)
 
 # Force Supabase if configured (skips Excel fallback)
 if FORCE_SUPABASE and not USE_SUPABASE:
     try:
         sup_url, sup_key, sup_table, sup_row, profile_table = _get_supabase_config_from_secrets_or_env()
         if sup_url and sup_key:
-            supabase_client = create_client(sup_url, sup_key)
+            supabase_client = _get_supabase_client(sup_url, sup_key)
             supabase_table_name = sup_table
             supabase_row_id = sup_row
             USE_SUPABASE = True
@@ -4370,58 +6188,137 @@ if (not USE_SUPABASE) and GSHEETS_AVAILABLE:
                     st.sidebar.error(f"❌ Test failed: {test_e}")
 
 # Helper functions for Google Sheets
+_GSHEETS_NUMERIC_RE = r"\s*[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?\s*|\s*[+-]?(?:inf|infinity|nan)\s*"
+
+
+def _gsheets_numericise(value):
+    """Same conversion gspread's get_all_records applies to a formatted cell."""
+    if isinstance(value, str) and "_" not in value:
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return value
+
+
+def _gsheets_values_to_frame(values: list) -> pd.DataFrame | None:
+    """Build the schedule DataFrame from a raw values grid (header row first).
+
+    Matches get_all_records typing, but only cells that look numeric go
+    through the Python conversion; everything else stays as-is.
+    """
+    if not values or len(values) < 2:
+        return None
+    header = [str(h) for h in values[0]]
+    width = len(header)
+    rows = [(list(r) + [""] * (width - len(r)))[:width] for r in values[1:]]
+    df = pd.DataFrame(rows, columns=header, dtype=object)
+    for col in range(width):
+        series = df.iloc[:, col]
+        mask = series.astype(str).str.fullmatch(_GSHEETS_NUMERIC_RE, case=False)
+        if mask.any():
+            converted = [_gsheets_numericise(v) for v in series[mask]]
+            df.iloc[mask.to_numpy(), col] = pd.Series(converted, index=series.index[mask], dtype=object)
+    return df
+
+
+def _gsheets_empty_frame() -> pd.DataFrame:
+    # Return empty dataframe with expected columns
+    return pd.DataFrame(columns=[
+        "Patient Name", "In Time", "Out Time", "Procedure", "DR.", 
+        "FIRST", "SECOND", "Third", "CASE PAPER", "OP", 
+        "SUCTION", "CLEANING", "STATUS", "REMINDER_ROW_ID",
+        "REMINDER_SNOOZE_UNTIL", "REMINDER_DISMISSED"
+    ])
+
+
+def _gsheets_sheet_range(ws) -> str:
+    return "'" + str(getattr(ws, "title", "Sheet1")).replace("'", "''") + "'"
+
+
 @st.cache_data(ttl=30)  # Cache for 30 seconds to reduce API calls
 def load_data_from_gsheets(_worksheet):
-    """Load data from Google Sheets worksheet"""
+    """Load data from Google Sheets worksheet
+
+    The schedule and Meta sheets are read together with one values_batch_get.
+    """
     try:
         meta: dict = {}
+        meta_ws = None
         try:
-            meta = load_meta_from_gsheets(_worksheet)
+            meta_ws = _get_or_create_gsheets_meta_worksheet(_worksheet)
+            ranges = [_gsheets_sheet_range(_worksheet)] + ([_gsheets_sheet_range(meta_ws)] if meta_ws is not None else [])
+            resp = _worksheet.spreadsheet.values_batch_get(ranges)
+            value_ranges = resp.get("valueRanges", []) if isinstance(resp, dict) else []
+            values = value_ranges[0].get("values", []) if value_ranges else []
+            meta_values = value_ranges[1].get("values", []) if len(value_ranges) > 1 else []
+        except Exception:
+            # Older gspread / restricted API: fall back to one call per sheet.
+            values = _worksheet.get_all_values()
+            meta_values = meta_ws.get_all_values() if meta_ws is not None else []
+
+        try:
+            meta = _parse_gsheets_meta_values(meta_values)
         except Exception:
             meta = {}
 
-        data = _worksheet.get_all_records()
-        if not data:
-            # Return empty dataframe with expected columns
-            df_empty = pd.DataFrame(columns=[
-                "Patient Name", "In Time", "Out Time", "Procedure", "DR.", 
-                "FIRST", "SECOND", "Third", "CASE PAPER", "OP", 
-                "SUCTION", "CLEANING", "STATUS", "REMINDER_ROW_ID",
-                "REMINDER_SNOOZE_UNTIL", "REMINDER_DISMISSED"
-            ])
+        # Baselines for the diff writer (save_data_to_gsheets)
+        baselines = _gsheets_grid_baselines()
+        baselines[_gsheets_grid_key(_worksheet)] = values
+        if meta_ws is not None:
+            baselines[_gsheets_grid_key(meta_ws)] = meta_values
+
+        df = _gsheets_values_to_frame(values)
+        if df is None:
+            df_empty = _gsheets_empty_frame()
             df_empty.attrs["meta"] = meta
             return df_empty
-        df = pd.DataFrame(data)
         df.attrs["meta"] = meta
+        _local_cache_put_frame("schedule:gsheets", None, df)
+        _set_backend_online()
         return df
     except Exception as e:
+        hit = _local_cache_get_frame("schedule:gsheets")
+        if hit is not None:
+            _set_backend_offline(e, hit[2])
+            return hit[1]
         st.error(f"Error loading from Google Sheets: {e}")
         return None
 
 
+@st.cache_resource
+def _gsheets_meta_worksheet_handles() -> dict:
+    """Process-wide {spreadsheet_id: Meta worksheet} so lookups skip a round trip."""
+    return {}
+
+
 def _get_or_create_gsheets_meta_worksheet(_worksheet):
     """Return the 'Meta' worksheet for the same spreadsheet, creating it if needed."""
     # gspread worksheet has .spreadsheet
     ss = getattr(_worksheet, "spreadsheet", None)
     if ss is None:
         raise RuntimeError("Unable to access spreadsheet from worksheet")
+    handles = _gsheets_meta_worksheet_handles()
+    ss_id = getattr(ss, "id", "")
+    if ss_id in handles:
+        return handles[ss_id]
     try:
-        return ss.worksheet("Meta")
+        ws = ss.worksheet("Meta")
     except Exception:
         try:
-            return ss.add_worksheet(title="Meta", rows=50, cols=2)
+            ws = ss.add_worksheet(title="Meta", rows=50, cols=2)
         except Exception:
             # Some environments disallow sheet creation; treat as non-fatal.
             return None
+    handles[ss_id] = ws
+    return ws
 
 
-@st.cache_data(ttl=30)
-def load_meta_from_gsheets(_worksheet) -> dict:
-    """Load metadata from a 'Meta' worksheet (2 columns: key, value)."""
-    ws = _get_or_create_gsheets_meta_worksheet(_worksheet)
-    if ws is None:
-        return {}
-    values = ws.get_all_values()
+def _parse_gsheets_meta_values(values: list) -> dict:
+    """Parse Meta sheet values (2 columns: key, value)."""
     if not values:
         return {}
 
@@ -4440,43 +6337,223 @@ def load_meta_from_gsheets(_worksheet) -> dict:
         meta[k] = v
     return dict(meta)
 
-def save_data_to_gsheets(worksheet, df):
-    """Save dataframe to Google Sheets worksheet"""
+
+@st.cache_data(ttl=30)
+def load_meta_from_gsheets(_worksheet) -> dict:
+    """Load metadata from a 'Meta' worksheet (2 columns: key, value)."""
+    ws = _get_or_create_gsheets_meta_worksheet(_worksheet)
+    if ws is None:
+        return {}
+    return _parse_gsheets_meta_values(ws.get_all_values())
+
+# ================ Google Sheets Diff Writer ================
+# Saves compare the new grid with the last grid loaded/written for the same
+# worksheet and send one values_batch_update with only the changed row ranges
+# (schedule + Meta). Before diffing, the row-id columns of both sheets are
+# re-read in one values_batch_get: if another editor inserted or deleted rows
+# since the baseline, the whole grid is written instead. Cells are compared
+# after normalising numbers and times (Sheets may return 1 or "9:30:00" for
+# "1.0" or "09:30"). Rows past the new end are deleted and the grid is grown
+# with add_rows/add_cols when needed, so the sheet is never cleared.
+_GSHEETS_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])?")
+
+@st.cache_resource
+def _gsheets_grid_baselines() -> dict:
+    """Process-wide {(spreadsheet_id, worksheet_id): last known cell grid}."""
+    return {}
+
+
+def _gsheets_grid_key(ws) -> tuple:
+    return (getattr(getattr(ws, "spreadsheet", None), "id", ""), getattr(ws, "id", ""))
+
+
+def _gsheets_a1(ws, first_row: int, last_row: int, width: int) -> str:
+    title = str(getattr(ws, "title", "Sheet1")).replace("'", "''")
+    return f"'{title}'!A{first_row}:{get_column_letter(max(1, width))}{last_row}"
+
+
+def _gsheets_cell_text(value: Any) -> str:
+    """Cell value as the diff writer compares it (numbers, times and booleans canonical)."""
+    text = "" if value is None else str(value).strip()
+    if re.fullmatch(_GSHEETS_NUMERIC_RE, text, flags=re.IGNORECASE):
+        try:
+            return repr(float(text))
+        except ValueError:
+            return text
+    match = _GSHEETS_TIME_RE.fullmatch(text)
+    if match:
+        hour, minute, second = int(match.group(1)), int(match.group(2)), int(match.group(3) or 0)
+        if match.group(4):
+            hour = hour % 12 + (12 if match.group(4).upper() == "PM" else 0)
+        return f"{hour:02d}:{minute:02d}" + (f":{second:02d}" if second else "")
+    if text.upper() in ("TRUE", "FALSE"):
+        return text.upper()
+    return text
+
+
+def _gsheets_changed_ranges(ws, old_grid: list, new_grid: list) -> list[dict]:
+    """Return values_batch_update data entries for rows of new_grid that differ (1-based rows)."""
+    width = max([len(r) for r in old_grid + new_grid] or [1])
+    height = len(new_grid)
+
+    def _row(grid, i):
+        r = [str(v) for v in grid[i]] if i < len(grid) else []
+        return r + [""] * (width - len(r))
+
+    def _same(i):
+        return [_gsheets_cell_text(v) for v in _row(old_grid, i)] == [_gsheets_cell_text(v) for v in _row(new_grid, i)]
+
+    out: list[dict] = []
+    start = None
+    block: list = []
+    for i in range(height + 1):
+        changed = i < height and not _same(i)
+        if changed:
+            if start is None:
+                start = i
+            block.append(_row(new_grid, i))
+        elif start is not None:
+            out.append({"range": _gsheets_a1(ws, start + 1, start + len(block), width), "values": block})
+            start, block = None, []
+    return out
+
+
+def _gsheets_key_column(grid: list) -> int:
+    """0-based column of the row ids in a grid (the first column without one)."""
+    header = [str(h) for h in grid[0]] if grid else []
+    return header.index("REMINDER_ROW_ID") if "REMINDER_ROW_ID" in header else 0
+
+
+def _gsheets_baseline_matches(live: list, grid: list) -> bool:
+    """True if the sheet's key column (as read) still has the baseline's rows."""
+    col = _gsheets_key_column(grid)
+
+    def _trimmed(values):
+        out = [_gsheets_cell_text(v) for v in values]
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    return _trimmed(live) == _trimmed([r[col] if col < len(r) else "" for r in grid])
+
+
+def _gsheets_checked_baselines(baselines: dict, sheets: list) -> list:
+    """Baseline grid per worksheet; None where there is none or the sheet's rows changed.
+
+    The key columns of every sheet with a baseline are read in one values_batch_get.
+    """
+    grids = [baselines.get(_gsheets_grid_key(ws)) for ws in sheets]
+    pending = [i for i, grid in enumerate(grids) if grid is not None]
+    if not pending:
+        return grids
+    letters = [get_column_letter(_gsheets_key_column(grids[i]) + 1) for i in pending]
     try:
-        # Clear existing data
-        worksheet.clear()
-        
-        # Convert dataframe to list of lists for gspread
-        # Handle NaN/None values
-        df_clean = df.fillna("")
-        
-        # Convert all values to strings to avoid serialization issues
-        for col in df_clean.columns:
-            df_clean[col] = df_clean[col].astype(str).replace('nan', '').replace('None', '').replace('NaT', '')
-        
-        # Write headers
-        headers = df_clean.columns.tolist()
-        
-        # Write data
-        values = [headers] + df_clean.values.tolist()
-        worksheet.update(values, 'A1')
+        resp = sheets[0].spreadsheet.values_batch_get(
+            [f"{_gsheets_sheet_range(sheets[i])}!{letter}:{letter}" for i, letter in zip(pending, letters)]
+        )
+        value_ranges = resp.get("valueRanges", []) if isinstance(resp, dict) else []
+        if len(value_ranges) != len(pending):
+            raise ValueError("incomplete values_batch_get response")
+        live = [[r[0] if r else "" for r in vr.get("values", [])] for vr in value_ranges]
+    except Exception:
+        # Older gspread / restricted API: fall back to one call per sheet.
+        live = [sheets[i].col_values(_gsheets_key_column(grids[i]) + 1) for i in pending]
+    for i, values in zip(pending, live):
+        if not _gsheets_baseline_matches(values, grids[i]):
+            grids[i] = None
+    return grids
+
+
+def _gsheets_diff_against_sheet(ws, old_grid: list | None, new_grid: list) -> tuple[list, int]:
+    """(values_batch_update entries, rows with data before the write) for one worksheet.
+
+    old_grid is the checked baseline (see _gsheets_checked_baselines), or None.
+    """
+    if old_grid is None:
+        # No trustworthy baseline: write every row of the new grid.
+        current = ws.get_all_values()
+        width = max([len(r) for r in current + new_grid] or [1])
+        rows = [[str(v) for v in r] + [""] * (width - len(r)) for r in new_grid]
+        data = [{"range": _gsheets_a1(ws, 1, len(rows), width), "values": rows}] if rows else []
+        return data, len(current)
+    return _gsheets_changed_ranges(ws, old_grid, new_grid), len(old_grid)
+
+
+def _gsheets_delete_surplus_rows(ws, old_height: int, new_height: int) -> None:
+    if old_height > new_height:
+        ws.delete_rows(new_height + 1, old_height)
+
 
-        # Persist metadata (time blocks) to Meta sheet
+def _gsheets_schedule_grid(df: pd.DataFrame) -> list:
+    df_clean = df.fillna("")
+    # Convert all values to strings to avoid serialization issues
+    for col in df_clean.columns:
+        df_clean[col] = df_clean[col].astype(str).replace('nan', '').replace('None', '').replace('NaT', '')
+    return [df_clean.columns.tolist()] + df_clean.values.tolist()
+
+
+def _gsheets_meta_grid(meta: dict) -> list:
+    return [["key", "value"]] + [[k, json.dumps(v) if isinstance(v, (dict, list)) else str(v)] for k, v in meta.items()]
+
+
+def _ensure_gsheets_grid_size(ws, rows: int, cols: int) -> None:
+    """Grow the worksheet so the write stays inside its grid limits."""
+    try:
+        if rows > int(getattr(ws, "row_count", rows)):
+            ws.add_rows(rows - int(ws.row_count))
+        if cols > int(getattr(ws, "col_count", cols)):
+            ws.add_cols(cols - int(ws.col_count))
+    except Exception:
+        pass
+
+
+def save_data_to_gsheets(worksheet, df, meta: dict | None = None):
+    """Save dataframe to Google Sheets worksheet (changed ranges only)"""
+    try:
+        baselines = _gsheets_grid_baselines()
+        new_grid = _gsheets_schedule_grid(df)
+        main_key = _gsheets_grid_key(worksheet)
+
+        # Persist metadata (time blocks) to Meta sheet in the same request
+        meta_ws = None
+        new_meta_grid = None
+        old_meta_height = 0
         try:
             meta_ws = _get_or_create_gsheets_meta_worksheet(worksheet)
             if meta_ws is not None:
-                meta = _apply_time_blocks_to_meta(_get_meta_from_df(df))
-                meta_ws.clear()
-                meta_ws.update([["key", "value"]] + [[k, json.dumps(v) if isinstance(v, (dict, list)) else str(v)] for k, v in meta.items()], "A1")
-                load_meta_from_gsheets.clear()
+                if meta is None:
+                    meta = _apply_time_blocks_to_meta(_get_meta_from_df(df))
+                new_meta_grid = _gsheets_meta_grid(meta)
         except Exception:
             # Non-fatal: schedule should still save
-            pass
-        
+            meta_ws = None
+
+        old_grids = _gsheets_checked_baselines(baselines, [worksheet] + ([meta_ws] if meta_ws is not None else []))
+        data, old_height = _gsheets_diff_against_sheet(worksheet, old_grids[0], new_grid)
+        _ensure_gsheets_grid_size(worksheet, len(new_grid), len(new_grid[0]) if new_grid else 1)
+        if meta_ws is not None:
+            try:
+                meta_data, old_meta_height = _gsheets_diff_against_sheet(meta_ws, old_grids[1], new_meta_grid)
+                data += meta_data
+                _ensure_gsheets_grid_size(meta_ws, len(new_meta_grid), 2)
+            except Exception:
+                meta_ws = None
+
+        if data:
+            worksheet.spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": data})
+        _gsheets_delete_surplus_rows(worksheet, old_height, len(new_grid))
+        baselines[main_key] = new_grid
+        if meta_ws is not None and new_meta_grid is not None:
+            _gsheets_delete_surplus_rows(meta_ws, old_meta_height, len(new_meta_grid))
+            baselines[_gsheets_grid_key(meta_ws)] = new_meta_grid
+
         # Clear the cache so next load gets fresh data
+        load_meta_from_gsheets.clear()
         load_data_from_gsheets.clear()
         return True
     except Exception as e:
+        # Unknown sheet state after a failed write; re-read before the next diff.
+        _gsheets_grid_baselines().pop(_gsheets_grid_key(worksheet), None)
         st.error(f"Error saving to Google Sheets: {e}")
         return False
 
@@ -4495,11 +6572,489 @@ def _data_editor_has_pending_edits(editor_key: str) -> bool:
         return False
 
 
+# ================ Write-Behind Save Queue ================
+# Supabase / Google Sheets saves are handed to a background writer so the UI
+# thread returns immediately. Saves for the same target within the coalesce
+# window collapse into one write of the latest frame. Each pending frame is
+# also spooled to disk, so a failed write is retried (with backoff) and
+# survives a restart. "Save Changes" flushes the queue and waits.
+WRITE_BEHIND_COALESCE_SECONDS = 1.5
+WRITE_BEHIND_MAX_BACKOFF_SECONDS = 60
+WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS = 30
+WRITE_BEHIND_SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tdb_write_behind")
+
+
+def _write_behind_enabled() -> bool:
+    val = _safe_secret_get("write_behind", None)
+    if val is None:
+        val = os.getenv("WRITE_BEHIND", "true")
+    return _as_bool(val)
+
+
+@st.cache_resource
+def _write_behind_queue() -> dict:
+    """Process-wide queue state plus its worker thread."""
+    q = {
+        "cond": threading.Condition(),
+        "jobs": {},          # target -> latest pending job
+        "inflight": set(),   # targets being written right now
+        "seq": 0,
+        "last_error": "",
+        "recovered": False,
+    }
+    thread = threading.Thread(target=_write_behind_worker, args=(q,), name="tdb-write-behind", daemon=True)
+    thread.start()
+    q["thread"] = thread
+    return q
+
+
+def _write_behind_spool_path(target: str) -> str:
+    return os.path.join(WRITE_BEHIND_SPOOL_DIR, hashlib.md5(target.encode("utf-8")).hexdigest() + ".json")
+
+
+def _spool_write_behind_job(target: str, job: dict) -> None:
+    """Persist a pending save so it can be retried after a crash/restart."""
+    try:
+        os.makedirs(WRITE_BEHIND_SPOOL_DIR, exist_ok=True)
+        path = _write_behind_spool_path(target)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "target": target,
+                    "seq": job["seq"],
+                    "enqueued_at": job["enqueued_at"],
+                    "columns": job["df"].columns.tolist(),
+                    "rows": _df_to_json_records(job["df"]),
+                    "meta": job["meta"],
+                },
+                fh,
+                default=str,
+            )
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+def _unspool_write_behind_job(target: str, seq: int) -> None:
+    path = _write_behind_spool_path(target)
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            if json.load(fh).get("seq") != seq:
+                return
+        os.remove(path)
+    except Exception:
+        pass
+
+
+def _write_behind_worker(q: dict) -> None:
+    cond = q["cond"]
+    while True:
+        with cond:
+            while True:
+                now_ts = time_module.time()
+                ready = [t for t, j in q["jobs"].items() if j["due_at"] <= now_ts and t not in q["inflight"]]
+                if ready:
+                    target = min(ready, key=lambda t: q["jobs"][t]["due_at"])
+                    job = q["jobs"][target]
+                    q["inflight"].add(target)
+                    break
+                waits = [j["due_at"] - now_ts for t, j in q["jobs"].items() if t not in q["inflight"]]
+                cond.wait(timeout=max(0.05, min(waits)) if waits else None)
+
+        ok = False
+        try:
+            ok = bool(job["write"](job["df"], job["meta"]))
+        except Exception:
+            ok = False
+
+        with cond:
+            q["inflight"].discard(target)
+            current = q["jobs"].get(target)
+            if ok:
+                if current is job:
+                    del q["jobs"][target]
+                q["last_error"] = ""
+                _unspool_write_behind_job(target, job["seq"])
+                _publish_schedule_change()
+            else:
+                job["attempts"] += 1
+                backoff = min(WRITE_BEHIND_MAX_BACKOFF_SECONDS, 2 ** job["attempts"])
+                if current is job:
+                    job["due_at"] = time_module.time() + backoff
+                q["last_error"] = f"Save failed ({job['attempts']} attempt(s)); retrying in {backoff}s"
+            cond.notify_all()
+
+
+def _enqueue_write_behind(target: str, write, df: pd.DataFrame, meta: dict) -> None:
+    """Queue the latest frame for `target`; coalesces with a pending save."""
+    q = _write_behind_queue()
+    with q["cond"]:
+        q["seq"] += 1
+        prev = q["jobs"].get(target)
+        now_ts = time_module.time()
+        job = {
+            "write": write,
+            "df": df.copy(),
+            "meta": dict(meta or {}),
+            "seq": q["seq"],
+            "enqueued_at": datetime.now(timezone.utc).isoformat(),
+            # Keep the first save's deadline so a stream of edits still lands promptly.
+            "due_at": prev["due_at"] if prev is not None else now_ts + WRITE_BEHIND_COALESCE_SECONDS,
+            "attempts": 0,
+        }
+        job["df"].attrs = {"meta": job["meta"]}
+        q["jobs"][target] = job
+        q["cond"].notify_all()
+    _spool_write_behind_job(target, job)
+
+
+def _flush_write_behind(timeout: float = WRITE_BEHIND_FLUSH_TIMEOUT_SECONDS) -> bool:
+    """Write pending saves now and wait; False if something is still pending."""
+    q = _write_behind_queue()
+    deadline = time_module.time() + timeout
+    with q["cond"]:
+        for job in q["jobs"].values():
+            job["due_at"] = min(job["due_at"], time_module.time())
+        q["cond"].notify_all()
+        while q["jobs"] or q["inflight"]:
+            if any(j["attempts"] > 0 for j in q["jobs"].values()):
+                return False
+            remaining = deadline - time_module.time()
+            if remaining <= 0:
+                return False
+            q["cond"].wait(timeout=remaining)
+    return True
+
+
+def _pending_write_behind_frame(target: str) -> pd.DataFrame | None:
+    """Latest not-yet-written frame for `target` (read-your-writes for reloads)."""
+    q = _write_behind_queue()
+    with q["cond"]:
+        job = q["jobs"].get(target)
+        if job is None:
+            return None
+        return _copy_schedule_frame(job["df"])
+
+
+def _current_save_target():
+    """Return (target key, writer) for the configured backend, or (None, None)."""
+    if USE_SUPABASE:
+        sup_url, sup_key, sup_table, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+        return (
+            f"supabase:{sup_url}:{sup_table}:{sup_row}",
+            lambda d, m: save_data_to_supabase(sup_url, sup_key, sup_table, sup_row, d, m),
+        )
+    if USE_GOOGLE_SHEETS and gsheet_worksheet is not None:
+        ws = gsheet_worksheet
+        return (
+            f"gsheets:{getattr(getattr(ws, 'spreadsheet', None), 'id', '')}:{getattr(ws, 'id', '')}",
+            lambda d, m: save_data_to_gsheets(ws, d, m),
+        )
+    return None, None
+
+
+def _recover_spooled_saves() -> None:
+    """Re-queue saves spooled by a previous process that never reached storage."""
+    q = _write_behind_queue()
+    if q["recovered"]:
+        return
+    q["recovered"] = True
+    target, write = _current_save_target()
+    if target is None:
+        return
+    path = _write_behind_spool_path(target)
+    try:
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as fh:
+            spooled = json.load(fh)
+        if USE_SUPABASE:
+            # Skip if storage has been written since the spooled save was queued.
+            sup_url, sup_key, sup_table, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+            cached = _supabase_frame_cache().get((sup_url, sup_table, sup_row)) or {}
+            stored_version = cached.get("version")
+            spooled_at = _parse_iso_ts(spooled.get("enqueued_at"))
+            if stored_version is not None and spooled_at is not None and stored_version >= spooled_at:
+                os.remove(path)
+                return
+        df_spooled = _schedule_frame_from_records(spooled.get("rows") or [], spooled.get("columns"), spooled.get("meta") or {})
+        _enqueue_write_behind(target, write, df_spooled, spooled.get("meta") or {})
+    except Exception:
+        pass
+
+
+# ================ Daily Rollover ================
+# The hot schedule only holds one clinic day (meta["schedule_day"]). The
+# rollover is lazy: nothing runs at IST midnight itself; the first schedule load
+# after midnight (any session's rerun) sees the older day stamp and rolls over,
+# so until someone opens the app the stored schedule still holds the old day.
+# Every row of that day is archived as one snapshot (Supabase archive table, or
+# a local Parquet/CSV file for other backends). Only rows that were never
+# started (blank/PENDING/WAITING) then stay in the live schedule, with status
+# history and reminder state reset (see _rollover_schedule). The archive write
+# is an upsert keyed by day, so a repeated rollover is harmless.
+ROLLOVER_KEEP_STATUSES = {"", "PENDING", "WAITING"}
+
+
+def _get_archive_table_name() -> str:
+    name = _safe_secret_get("supabase_archive_table", None) or os.getenv("SUPABASE_ARCHIVE_TABLE", "")
+    return str(name or supabase_archive_table_name).strip() or supabase_archive_table_name
+
+
+def _archive_schedule_day(df_day: pd.DataFrame, day: str, meta: dict) -> None:
+    """Store the full snapshot of a finished day (raises on failure)."""
+    if USE_SUPABASE:
+        sup_url, sup_key, _, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+        client = _get_supabase_client(sup_url, sup_key)
+        payload = {"columns": df_day.columns.tolist(), "rows": _df_to_json_records(df_day), "meta": meta}
+        client.table(_get_archive_table_name()).upsert(
+            {"state_id": sup_row, "day": day, "payload": payload}, on_conflict="state_id,day"
+        ).execute()
+        return
+
+    os.makedirs(LOCAL_ARCHIVE_DIR, exist_ok=True)
+    base = os.path.join(LOCAL_ARCHIVE_DIR, day)
+    df_out = df_day.copy().fillna("").astype(str)
+    try:
+        df_out.to_parquet(base + ".parquet", index=False)
+    except Exception:
+        # pyarrow/fastparquet not installed
+        df_out.to_csv(base + ".csv", index=False)
+    with open(base + ".meta.json", "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, default=str)
+
+
+def _rollover_schedule(df_any: pd.DataFrame, today: str) -> pd.DataFrame:
+    """Return today's working set: keep rows never started, reset day-specific fields.
+
+    Rows have no date of their own, so a never-started row may be a no-show or
+    a booking entered ahead for the new day; it is kept rather than lost, and
+    staff cancel or reschedule it. The archived snapshot holds it as well.
+    """
+    status = df_any.get("STATUS", pd.Series("", index=df_any.index)).fillna("").astype(str).str.strip().str.upper()
+    # Started rows (ARRIVED, ON GOING, ...) belong to the archived day.
+    out = df_any[status.isin(ROLLOVER_KEEP_STATUSES)].copy()
+    for col in ("STATUS_CHANGED_AT", "ACTUAL_START_AT", "ACTUAL_END_AT", "STATUS_LOG"):
+        if col in out.columns:
+            out[col] = ""
+    if "REMINDER_SNOOZE_UNTIL" in out.columns:
+        out["REMINDER_SNOOZE_UNTIL"] = pd.NA
+    if "REMINDER_DISMISSED" in out.columns:
+        out["REMINDER_DISMISSED"] = False
+    out = out.reset_index(drop=True)
+
+    meta = _get_meta_from_df(df_any)
+    meta["schedule_day"] = today
+    meta["time_blocks"] = [
+        b for b in _serialize_time_blocks(_deserialize_time_blocks(meta.get("time_blocks")))
+        if str(b.get("date", "")) >= today
+    ]
+    _set_meta_on_df(out, meta)
+    return out
+
+
+def _persist_schedule_from_load(df_any: pd.DataFrame) -> None:
+    """Save a frame during load (before save_data exists) through the normal writers."""
+    meta = _apply_time_blocks_to_meta(_get_meta_from_df(df_any))
+    _set_meta_on_df(df_any, meta)
+    target, write = _current_save_target()
+    if target is None:
+        return
+    if _write_behind_enabled():
+        _enqueue_write_behind(target, write, df_any, meta)
+    elif write(df_any, meta):
+        st.session_state.seen_schedule_epoch = _publish_schedule_change()
+
+
+def _apply_daily_rollover(df_any: pd.DataFrame) -> pd.DataFrame:
+    """Roll the schedule over to today's IST date if it still holds an older day.
+
+    Called on every schedule load; this is what triggers the rollover (the first
+    load after IST midnight), there is no timer.
+    """
+    today = now_ist().date().isoformat()
+    meta = _get_meta_from_df(df_any)
+    day = str(meta.get("schedule_day", "") or "").strip()
+    if day == today or _backend_health().get("offline"):
+        return df_any
+    if not day:
+        # Older data without a day stamp: claim it for today.
+        meta["schedule_day"] = today
+        _set_meta_on_df(df_any, meta)
+        _persist_schedule_from_load(df_any)
+        return df_any
+    if day > today:
+        return df_any
+
+    try:
+        _archive_schedule_day(df_any, day, meta)
+    except Exception as e:
+        st.sidebar.warning(
+            f"⚠️ Could not archive {day}; keeping it in the live schedule. ({e}) "
+            f"Create the `{_get_archive_table_name()}` table described in README."
+        )
+        return df_any
+
+    df_today = _rollover_schedule(df_any, today)
+    _prune_time_blocks(today)
+    _persist_schedule_from_load(df_today)
+    # Yesterday's snoozes/dismissals must not silence carried rows; cleared once the dispatcher is up.
+    if "REMINDER_ROW_ID" in df_today.columns:
+        st.session_state.rollover_reminder_clears = [
+            str(v).strip() for v in df_today["REMINDER_ROW_ID"].tolist() if not _is_blank_cell(v)
+        ]
+    st.toast(f"📦 Archived {day} and started {today}", icon="📅")
+    return df_today
+
+
+# ================ Time Block Persistence ================
+# One row per block in a Supabase table or a "TimeBlocks" worksheet, written on
+# each add/remove, so blocking an assistant never rewrites the schedule.
+def _get_time_blocks_table_name() -> str:
+    name = _safe_secret_get("supabase_time_blocks_table", None) or os.getenv("SUPABASE_TIME_BLOCKS_TABLE", "")
+    return str(name or supabase_time_blocks_table_name).strip() or supabase_time_blocks_table_name
+
+
+def _time_block_source() -> tuple:
+    """Identity of the backend that owns the time blocks ("meta" = schedule meta)."""
+    if USE_SUPABASE:
+        sup_url, _, _, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+        return ("supabase", sup_url, _get_time_blocks_table_name(), sup_row)
+    if USE_GOOGLE_SHEETS and gsheet_worksheet is not None:
+        ss = getattr(gsheet_worksheet, "spreadsheet", None)
+        return ("gsheets", str(getattr(ss, "id", "") or id(ss)))
+    return ("meta",)
+
+
+def _get_gsheets_time_blocks_worksheet(_worksheet):
+    """Return the 'TimeBlocks' worksheet for the same spreadsheet, creating it if needed."""
+    ss = getattr(_worksheet, "spreadsheet", None)
+    if ss is None:
+        return None
+    try:
+        return ss.worksheet(GSHEETS_TIME_BLOCKS_SHEET)
+    except Exception:
+        try:
+            return ss.add_worksheet(title=GSHEETS_TIME_BLOCKS_SHEET, rows=200, cols=6)
+        except Exception:
+            return None
+
+
+def _load_time_blocks_from_backend(source: tuple) -> list[dict]:
+    """Blocks from today on for a table source (raises when the table is unavailable)."""
+    today = now.strftime("%Y-%m-%d")
+    rows: list[dict] = []
+    if source[0] == "supabase":
+        sup_url, sup_key, _, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+        client = _get_supabase_client(sup_url, sup_key)
+        resp = (
+            client.table(source[2])
+            .select("block_id,day,assistant,start_time,end_time,reason")
+            .eq("state_id", sup_row)
+            .gte("day", today)
+            .order("updated_at")
+            .execute()
+        )
+        rows = [
+            {"id": r.get("block_id"), "date": str(r.get("day") or "")[:10], "assistant": r.get("assistant"),
+             "start_time": r.get("start_time"), "end_time": r.get("end_time"), "reason": r.get("reason")}
+            for r in getattr(resp, "data", None) or []
+        ]
+    elif source[0] == "gsheets":
+        ws = _get_gsheets_time_blocks_worksheet(gsheet_worksheet)
+        if ws is None:
+            raise RuntimeError(f"'{GSHEETS_TIME_BLOCKS_SHEET}' worksheet unavailable")
+        for r in (ws.get_all_values() or [])[1:]:
+            r = list(r) + [""] * (6 - len(r))
+            rows.append({"id": r[0], "date": r[1], "assistant": r[2], "start_time": r[3], "end_time": r[4], "reason": r[5]})
+    out: list[dict] = []
+    for r in rows:
+        if str(r["date"]) < today or not str(r["id"] or "").strip():
+            continue
+        block = _make_time_block(r["assistant"], r["date"], r["start_time"], r["end_time"], r["reason"], block_id=str(r["id"]).strip())
+        if block is not None:
+            out.append(block)
+    return out
+
+
+def _persist_time_block_change(
+    added: dict | None = None,
+    removed: dict | None = None,
+    pruned_before: str | None = None,
+) -> bool:
+    """Write one store change to the time-block table/worksheet."""
+    try:
+        if USE_SUPABASE:
+            sup_url, sup_key, _, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+            table = _get_supabase_client(sup_url, sup_key).table(_get_time_blocks_table_name())
+            if added is not None:
+                table.upsert({
+                    "state_id": sup_row,
+                    "block_id": added["id"],
+                    "day": added["date"],
+                    "assistant": added["assistant"],
+                    "start_time": _time_to_hhmm(added["start_time"]),
+                    "end_time": _time_to_hhmm(added["end_time"]),
+                    "reason": added["reason"],
+                    "updated_at": now_ist().isoformat(),
+                }, on_conflict="state_id,block_id").execute()
+            elif removed is not None:
+                table.delete().eq("state_id", sup_row).eq("block_id", removed["id"]).execute()
+            elif pruned_before:
+                table.delete().eq("state_id", sup_row).lt("day", pruned_before).execute()
+        elif USE_GOOGLE_SHEETS:
+            ws = _get_gsheets_time_blocks_worksheet(gsheet_worksheet)
+            if ws is None:
+                raise RuntimeError(f"'{GSHEETS_TIME_BLOCKS_SHEET}' worksheet unavailable")
+            # One row per block; only the changed rows are written or deleted so
+            # other processes' blocks survive and a failed call loses nothing.
+            ids = [str(v).strip() for v in ws.col_values(1)] if added is not None or removed is not None else []
+            if added is not None:
+                row = [
+                    added["id"], added["date"], added["assistant"],
+                    _time_to_hhmm(added["start_time"]), _time_to_hhmm(added["end_time"]), added["reason"],
+                ]
+                if added["id"] in ids:
+                    n = ids.index(added["id"]) + 1
+                    ws.update(values=[row], range_name=f"A{n}:F{n}", value_input_option="RAW")
+                else:
+                    header = [] if ids else [["block_id", "date", "assistant", "start_time", "end_time", "reason"]]
+                    ws.append_rows(header + [row], value_input_option="RAW")
+            else:
+                if removed is not None:
+                    doomed = [i + 1 for i, v in enumerate(ids) if i and v == removed["id"]]
+                else:
+                    dates = ws.col_values(2) if pruned_before else []
+                    doomed = [i + 1 for i, d in enumerate(dates) if i and str(d).strip() < pruned_before]
+                # Contiguous runs, bottom-up so earlier row numbers stay valid
+                runs: list[list[int]] = []
+                for n in doomed:
+                    if runs and runs[-1][1] == n - 1:
+                        runs[-1][1] = n
+                    else:
+                        runs.append([n, n])
+                for first, last in reversed(runs):
+                    ws.delete_rows(first, last)
+        return True
+    except Exception as e:
+        st.warning(f"Could not save time blocks: {e}")
+        return False
+
+
 # ================ Load Data ================
 df_raw = None
 
+# Note the change epoch before loading so a change during the load triggers a rerun.
+st.session_state.seen_schedule_epoch = _schedule_epoch()
+
 if USE_SUPABASE:
     sup_url, sup_key, sup_table, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+    if _realtime_enabled():
+        try:
+            _start_supabase_realtime_listener(sup_url, sup_key, sup_table, sup_row)
+        except Exception:
+            pass
     df_raw = load_data_from_supabase(sup_url, sup_key, sup_table, sup_row)
     if df_raw is None:
         st.error("⚠️ Failed to load data from Supabase.")
@@ -4511,8 +7066,36 @@ elif USE_GOOGLE_SHEETS:
         st.error("⚠️ Failed to load data from Google Sheets.")
         st.stop()
 else:
-    st.error("Excel backend disabled. Configure Supabase (recommended) or Google Sheets in secrets.")
-    st.stop()
+    _hit = _local_cache_get_frame("schedule:gsheets")
+    if _hit is None:
+        st.error("Excel backend disabled. Configure Supabase (recommended) or Google Sheets in secrets.")
+        st.stop()
+    df_raw = _hit[1]
+    _set_backend_offline("Google Sheets not connected", _hit[2])
+
+# Backend unreachable: we are rendering the last cached copy (read-only)
+_health = _backend_health()
+if _health.get("offline"):
+    _cached_at = _health.get("cached_at")
+    _cached_label = (
+        datetime.fromtimestamp(_cached_at, IST).strftime("%d %b %H:%M") if isinstance(_cached_at, (int, float)) else "earlier"
+    )
+    st.sidebar.warning(
+        f"📴 Offline: showing the schedule cached at {_cached_label}. Changes are disabled until the connection returns."
+    )
+
+# Saves still waiting in the write-behind queue are newer than storage.
+try:
+    _recover_spooled_saves()
+    _wb_target, _ = _current_save_target()
+    _wb_pending = _pending_write_behind_frame(_wb_target) if _wb_target else None
+    if _wb_pending is not None:
+        df_raw = _wb_pending
+    _wb_error = _write_behind_queue().get("last_error")
+    if _wb_error:
+        st.sidebar.warning(f"⚠️ {_wb_error}")
+except Exception:
+    pass
 
 # Prefer in-session pending changes when auto-save is off
 if st.session_state.get("unsaved_df") is not None:
@@ -4556,7 +7139,7 @@ def _is_time_block_valid(block):
 meta = df_raw.attrs.get("meta", {})
 blocks = meta.get("time_blocks", [])
 if not isinstance(blocks, list) or not all(_is_time_block_valid(b) for b in blocks):
-    # Attempt to repair by re-serializing current session_state.time_blocks
+    # Attempt to repair by re-serializing the time-block store
     import streamlit as st
     try:
         meta = _apply_time_blocks_to_meta(meta)
@@ -4566,6 +7149,12 @@ if not isinstance(blocks, list) or not all(_is_time_block_valid(b) for b in bloc
     except Exception as e:
         st.warning(f"[Auto-repair] Failed to repair time_blocks format: {e}")
 
+# Archive the previous clinic day on the first load after IST midnight
+try:
+    df_raw = _apply_daily_rollover(df_raw)
+except Exception as e:
+    st.warning(f"Daily rollover skipped: {e}")
+
 # Ensure expected columns exist (backfills older data/backends)
 for _col in _get_expected_columns():
     if _col in df_raw.columns:
@@ -4603,19 +7192,34 @@ _extra_statuses = _collect_unique_upper(df_raw, "STATUS")
 STATUS_OPTIONS = _unique_preserve_order(STATUS_BASE_OPTIONS + _extra_statuses)
 
 
-# Process data
-df = df_raw.copy()
-# Don't force numeric conversion yet - handle both formats
-df["In Time"] = df["In Time"]
-df["Out Time"] = df["Out Time"]
+# ================ Reminder Persistence Setup ================
+# Add stable row IDs and reminder columns if they don't exist
+if 'Patient ID' not in df_raw.columns:
+    df_raw['Patient ID'] = ""
 
-df["In Time Str"] = df["In Time"].apply(dec_to_time)
-df["Out Time Str"] = df["Out Time"].apply(dec_to_time)
+if 'REMINDER_ROW_ID' not in df_raw.columns:
+    df_raw['REMINDER_ROW_ID'] = [str(uuid.uuid4()) for _ in range(len(df_raw))]
+    # Save IDs immediately - will use save_data after it's defined
+    _needs_id_save = True
+else:
+    # Backfill missing/blank IDs so every row (including blank rows) can be targeted for delete/reminders.
+    _needs_id_save = False
+    try:
+        rid_series = df_raw['REMINDER_ROW_ID'].astype(str)
+        missing_mask = df_raw['REMINDER_ROW_ID'].isna() | rid_series.str.strip().eq("") | rid_series.str.lower().eq("nan")
+        if bool(missing_mask.any()):
+            df_raw.loc[missing_mask, 'REMINDER_ROW_ID'] = [str(uuid.uuid4()) for _ in range(int(missing_mask.sum()))]
+            _needs_id_save = True
+    except Exception:
+        # If anything goes wrong, keep dashboard usable; IDs will be handled elsewhere.
+        pass
 
-# Create time objects for picker
-df["In Time Obj"] = df["In Time Str"].apply(safe_str_to_time_obj)
-df["Out Time Obj"] = df["Out Time Str"].apply(safe_str_to_time_obj)
+if 'REMINDER_SNOOZE_UNTIL' not in df_raw.columns:
+    df_raw['REMINDER_SNOOZE_UNTIL'] = pd.NA
+if 'REMINDER_DISMISSED' not in df_raw.columns:
+    df_raw['REMINDER_DISMISSED'] = False
 
+# Process data
 # Convert checkbox columns (SUCTION, CLEANING) - checkmark or content to boolean
 def str_to_checkbox(val: Any) -> bool:
     """Convert string values to boolean for checkboxes"""
@@ -4648,92 +7252,138 @@ def str_to_checkbox(val: Any) -> bool:
     # Any other non-empty content is treated as checked (legacy behavior)
     return True
 
-# Convert existing checkbox data
-if "SUCTION" in df.columns:
-    df["SUCTION"] = df["SUCTION"].apply(str_to_checkbox)
-if "CLEANING" in df.columns:
-    df["CLEANING"] = df["CLEANING"].apply(str_to_checkbox)
+# ================ Derived Schedule Frame ================
+# The parsed time columns and checkbox booleans only depend on df_raw, so they
+# are derived once per schedule content and shared by every rerun and session.
+DERIVED_SCHEDULE_CACHE_SIZE = 8
+# pandas 3 copies on write, so a shallow copy is enough to keep a rerun's
+# in-place edits out of the cached frame; older pandas needs a deep copy.
+PANDAS_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3
 
-# Convert time values to minutes since midnight for comparison (function defined earlier)
-df["In_min"] = df["In Time"].apply(time_to_minutes).astype('Int64')
-df["Out_min"] = df["Out Time"].apply(time_to_minutes).astype('Int64')
 
-# Handle possible overnight cases
-df.loc[df["Out_min"] < df["In_min"], "Out_min"] += 1440
+@st.cache_resource
+def _derived_schedule_cache() -> dict:
+    """Process-wide {content key: {"df", "rows", "assistant_index", "assistant_intervals", "occupancy"}}, oldest first."""
+    return {}
 
-# Current time in minutes (same day)
-current_min = now.hour * 60 + now.minute
 
-# ================ Reminder Persistence Setup ================
-# Add stable row IDs and reminder columns if they don't exist
-if 'Patient ID' not in df_raw.columns:
-    df_raw['Patient ID'] = ""
+def _build_row_record(frame: pd.DataFrame, row_hashes: np.ndarray | None) -> dict[str, dict]:
+    """{"digest", "status", "pos"} maps keyed by REMINDER_ROW_ID.
 
-if 'REMINDER_ROW_ID' not in df_raw.columns:
-    df_raw['REMINDER_ROW_ID'] = [str(uuid.uuid4()) for _ in range(len(df_raw))]
-    # Save IDs immediately - will use save_data after it's defined
-    _needs_id_save = True
-else:
-    # Backfill missing/blank IDs so every row (including blank rows) can be targeted for delete/reminders.
-    _needs_id_save = False
-    try:
-        rid_series = df_raw['REMINDER_ROW_ID'].astype(str)
-        missing_mask = df_raw['REMINDER_ROW_ID'].isna() | rid_series.str.strip().eq("") | rid_series.str.lower().eq("nan")
-        if bool(missing_mask.any()):
-            df_raw.loc[missing_mask, 'REMINDER_ROW_ID'] = [str(uuid.uuid4()) for _ in range(int(missing_mask.sum()))]
-            _needs_id_save = True
-    except Exception:
-        # If anything goes wrong, keep dashboard usable; IDs will be handled elsewhere.
-        pass
+    Rows with a blank id, or repeating an id already seen, are keyed "#<pos>".
+    """
+    n = len(frame)
+    if row_hashes is None:
+        hashes = [hash(tuple(map(str, r))) for r in frame.itertuples(index=False, name=None)]
+    else:
+        hashes = row_hashes.tolist()
+    ids = frame["REMINDER_ROW_ID"].tolist() if "REMINDER_ROW_ID" in frame.columns else [""] * n
+    keys: list[str] = []
+    seen: set[str] = set()
+    for pos, rid in enumerate(ids):
+        key = "" if _is_blank_cell(rid) else str(rid).strip()
+        if not key or key in seen:
+            key = "#" + str(pos)
+        seen.add(key)
+        keys.append(key)
+    statuses = (
+        [str(v).strip().upper() for v in frame["STATUS"].tolist()] if "STATUS" in frame.columns else [""] * n
+    )
+    return {
+        "digest": dict(zip(keys, hashes)),
+        "status": dict(zip(keys, statuses)),
+        "pos": {key: pos for pos, key in enumerate(keys)},
+    }
 
-if 'REMINDER_SNOOZE_UNTIL' not in df_raw.columns:
-    df_raw['REMINDER_SNOOZE_UNTIL'] = pd.NA
-if 'REMINDER_DISMISSED' not in df_raw.columns:
-    df_raw['REMINDER_DISMISSED'] = False
 
-# Refresh df with new columns
-df = df_raw.copy()
+def _build_derived_schedule(frame: pd.DataFrame) -> pd.DataFrame:
+    out = frame.copy()
+    _add_schedule_time_columns(out)
+    # Convert existing checkbox data
+    for col in ("SUCTION", "CLEANING"):
+        if col in out.columns:
+            out[col] = out[col].apply(str_to_checkbox)
+    return out
+
 
-# Re-process time columns after df reassignment
-df["In Time Str"] = df["In Time"].apply(dec_to_time)
-df["Out Time Str"] = df["Out Time"].apply(dec_to_time)
-df["In Time Obj"] = df["In Time Str"].apply(safe_str_to_time_obj)
-df["Out Time Obj"] = df["Out Time Str"].apply(safe_str_to_time_obj)
+def _derive_schedule_frame(frame: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, dict]]:
+    """Return (df_raw plus derived display columns, per-row record), memoised by content."""
+    row_hashes = _schedule_row_hashes(frame)
+    key = _schedule_content_key(frame, row_hashes)
+    cache = _derived_schedule_cache()
+    entry = cache.get(key) if key is not None else None
+    if entry is None:
+        entry = {
+            "df": _build_derived_schedule(frame),
+            "rows": _build_row_record(frame, row_hashes),
+            "assistant_index": None,
+            "assistant_intervals": {},
+            "occupancy": {},
+        }
+        if key is not None:
+            cache[key] = entry
+            while len(cache) > DERIVED_SCHEDULE_CACHE_SIZE:
+                cache.pop(next(iter(cache)), None)
+    if entry["assistant_index"] is None:
+        entry["assistant_index"] = _build_assistant_index(entry["df"])
+    # Per-rerun edits must not leak into the shared frame (see PANDAS_COPY_ON_WRITE).
+    out = entry["df"].copy(deep=not PANDAS_COPY_ON_WRITE)
+    out.attrs = copy.deepcopy(frame.attrs)
+    _register_assistant_index(
+        out, entry["assistant_index"], intervals=entry["assistant_intervals"], occupancy=entry["occupancy"]
+    )
+    return out, entry["rows"]
 
-# Re-convert checkbox columns
-if "SUCTION" in df.columns:
-    df["SUCTION"] = df["SUCTION"].apply(str_to_checkbox)
-if "CLEANING" in df.columns:
-    df["CLEANING"] = df["CLEANING"].apply(str_to_checkbox)
 
-# Ensure In_min/Out_min exist
-df["In_min"] = df["In Time"].apply(time_to_minutes).astype('Int64')
-df["Out_min"] = df["Out Time"].apply(time_to_minutes).astype('Int64')
-# Handle possible overnight cases
-df.loc[df["Out_min"] < df["In_min"], "Out_min"] += 1440
+df, schedule_rows = _derive_schedule_frame(df_raw)
+
+# Current time in minutes (same day)
+current_min = now.hour * 60 + now.minute
 
 # Mark ongoing
 df["Is_Ongoing"] = (df["In_min"] <= current_min) & (current_min <= df["Out_min"])
 
 # ================ Unified Save Function ================
-def save_data(dataframe, show_toast=True, message="Data saved!"):
-    """Save dataframe to Google Sheets or Excel based on configuration"""
+def save_data(dataframe, show_toast=True, message="Data saved!", flush=False):
+    """Save dataframe to Google Sheets or Excel based on configuration
+
+    Cloud saves go through the write-behind queue; `flush=True` waits for the write.
+    """
     try:
+        if _backend_health().get("offline"):
+            st.warning("📴 Offline (read-only): this change was not saved. Try again once the connection returns.")
+            return False
+
         # Ensure metadata is updated with current time blocks before saving
         if not hasattr(dataframe, 'attrs'):
             dataframe.attrs = {}
         meta = _get_meta_from_df(dataframe)
         meta = _apply_time_blocks_to_meta(meta)
+        meta.setdefault("schedule_day", now_ist().date().isoformat())
         dataframe.attrs["meta"] = meta
-        
+
+        target, write = _current_save_target()
+        if target is not None and _write_behind_enabled():
+            _enqueue_write_behind(target, write, dataframe, meta)
+            success = _flush_write_behind() if flush else True
+            if not success:
+                st.warning("⚠️ Save is still pending; it will be retried in the background.")
+            elif show_toast:
+                st.toast(f"{'🗄️' if USE_SUPABASE else '☁️'} {message}", icon="✅")
+            return success
+
         if USE_SUPABASE:
             sup_url, sup_key, sup_table, sup_row, _ = _get_supabase_config_from_secrets_or_env()
             success = save_data_to_supabase(sup_url, sup_key, sup_table, sup_row, dataframe)
+            if success:
+                st.session_state.seen_schedule_epoch = _publish_schedule_change()
             if success and show_toast:
                 st.toast(f"🗄️ {message}", icon="✅")
             return success
         elif USE_GOOGLE_SHEETS:
             success = save_data_to_gsheets(gsheet_worksheet, dataframe)
+            if success:
+                st.session_state.seen_schedule_epoch = _publish_schedule_change()
             if success and show_toast:
                 st.toast(f"☁️ {message}", icon="✅")
             return success
@@ -4869,20 +7519,23 @@ with st.sidebar:
         if st.button("🔒 Add Block", key="add_block_btn", use_container_width=True):
             if not block_assistant:
                 st.warning("Please select an assistant")
-            else:
-                add_time_block(block_assistant, block_start, block_end, block_reason)
-                save_data(df_raw, show_toast=True, message="Time block saved")
+            elif add_time_block(block_assistant, block_start, block_end, block_reason):
+                if _time_blocks_in_meta():
+                    save_data(df_raw, show_toast=True, message="Time block saved")
                 st.success(
                     f"✅ Blocked {block_assistant} from {block_start.strftime('%H:%M')} to {block_end.strftime('%H:%M')}"
                 )
                 st.rerun()
 
     # Show current time blocks
-    if st.session_state.get("time_blocks"):
+    today_blocks = list_time_blocks(now.strftime("%Y-%m-%d"))
+    if _time_blocks().get("error"):
+        st.caption(
+            f"⚠️ Time blocks are saved with the schedule: the `{_get_time_blocks_table_name()}` table "
+            "is unavailable (see README)."
+        )
+    if today_blocks:
         st.markdown("**Current Blocks:**")
-        today_str = now.strftime("%Y-%m-%d")
-        today_blocks = [b for b in st.session_state.time_blocks if b.get("date") == today_str]
-
         for i, block in enumerate(today_blocks):
             col_info, col_del = st.columns([4, 1])
             with col_info:
@@ -4891,26 +7544,11 @@ with st.sidebar:
                 )
             with col_del:
                 if st.button("❌", key=f"del_block_{i}", help="Remove this block"):
-                    try:
-                        actual_idx = st.session_state.time_blocks.index(block)
-                        remove_time_block(actual_idx)
-                        save_data(df_raw, show_toast=True, message="Time block removed")
+                    if remove_time_block(block["id"]):
+                        if _time_blocks_in_meta():
+                            save_data(df_raw, show_toast=True, message="Time block removed")
                         st.success("Time block removed.")
                         st.rerun()
-                    except Exception:
-                        pass
-        # Debug: Show raw time_blocks and meta
-        st.markdown("---")
-        st.markdown("**[DEBUG] Time Blocks (formatted):**")
-        def _format_block(block):
-            return {
-                'Assistant': block.get('assistant', ''),
-                'Start': block.get('start_time').strftime('%H:%M') if block.get('start_time') else '',
-                'End': block.get('end_time').strftime('%H:%M') if block.get('end_time') else '',
-                'Date': block.get('date', ''),
-                'Reason': block.get('reason', '')
-            }
-        # Developer debug removed from sidebar per request
     else:
         st.caption("No time blocks set for today")
 
@@ -4972,221 +7610,625 @@ with st.sidebar:
                 success = save_data(df_cleared, message="Schedule cleared")
                 if success:
                     # Clear local notification/reminder state so we don't toast old rows.
-                    st.session_state.prev_hash = None
-                    st.session_state.prev_ongoing = set()
-                    st.session_state.prev_upcoming = set()
-                    st.session_state.prev_raw = pd.DataFrame()
-                    st.session_state.reminder_sent = set()
-                    st.session_state.snoozed = {}
+                    st.session_state.prev_rows = None
                     st.session_state.delete_row_id = ""
                     st.toast("🧹 Schedule cleared", icon="✅")
                     st.rerun()
             except Exception as e:
                 st.error(f"Error clearing schedule: {e}")
 
-# Helper to persist reminder state
-def _persist_reminder_to_storage(row_id, until, dismissed):
-    """Persist snooze/dismiss fields back to storage by row ID."""
+# ================ Reminder State Sidecar ================
+# Snooze/dismiss bookkeeping lives in a small keyed store (Supabase table, a
+# "Reminders" worksheet, or a local JSON file next to the Excel workbook) so
+# reminders never rewrite the schedule payload.
+# Only the reminder dispatcher writes it, batching updates per pass.
+def _get_reminder_table_name() -> str:
+    name = supabase_reminder_table_name
     try:
-        if df_raw is None or not isinstance(df_raw, pd.DataFrame):
-            st.error("Schedule not loaded; cannot persist reminder.")
-            return False
+        if hasattr(st, 'secrets'):
+            name = str(st.secrets.get("supabase_reminder_table", name) or name).strip() or name
+    except Exception:
+        pass
+    return os.getenv("SUPABASE_REMINDER_TABLE", name).strip() or name
 
-        if 'REMINDER_ROW_ID' not in df_raw.columns:
-            st.error("Reminder column missing; cannot persist reminder.")
-            return False
 
-        match = df_raw[df_raw['REMINDER_ROW_ID'] == row_id]
-        if match.empty:
-            return False
+@st.cache_data(ttl=30)
+def load_reminder_state_from_supabase(_url: str, _key: str, _table: str, _state_id: str) -> dict:
+    """Load {row_id: {"until": epoch|None, "dismissed": bool}} from the reminder table."""
+    client = _get_supabase_client(_url, _key)
+    resp = client.table(_table).select("row_id,snooze_until,dismissed").eq("state_id", _state_id).execute()
+    out: dict = {}
+    for r in getattr(resp, "data", None) or []:
+        rid = str(r.get("row_id") or "").strip()
+        if rid:
+            out[rid] = {"until": r.get("snooze_until"), "dismissed": bool(r.get("dismissed"))}
+    return out
 
-        ix = match.index[0]
-        df_raw.at[ix, 'REMINDER_SNOOZE_UNTIL'] = int(until) if until is not None else pd.NA
-        df_raw.at[ix, 'REMINDER_DISMISSED'] = bool(dismissed)
-        if st.session_state.get("auto_save_enabled", False):
-            return save_data(df_raw, show_toast=False)
-        _queue_unsaved_df(df_raw, reason="Reminder updates pending")
-        return True
-    except Exception as e:
-        st.error(f"Error persisting reminder: {e}")
-    return False
 
-# Save reminder IDs if they were just generated
-if _needs_id_save:
-    _maybe_save(df_raw, message="Generated stable row IDs for reminders")
+def _get_gsheets_reminders_worksheet(_worksheet):
+    """Return the 'Reminders' worksheet for the same spreadsheet, creating it if needed."""
+    ss = getattr(_worksheet, "spreadsheet", None)
+    if ss is None:
+        return None
+    try:
+        return ss.worksheet(GSHEETS_REMINDERS_SHEET)
+    except Exception:
+        try:
+            return ss.add_worksheet(title=GSHEETS_REMINDERS_SHEET, rows=200, cols=3)
+        except Exception:
+            return None
 
-# ================ Change Detection & Notifications ================
-if 'prev_hash' not in st.session_state:
-    st.session_state.prev_hash = None
-    st.session_state.prev_ongoing = set()
-    st.session_state.prev_upcoming = set()
-    st.session_state.prev_raw = pd.DataFrame()
-    st.session_state.reminder_sent = set()  # Track reminders by row ID
-    st.session_state.snoozed = {}  # Map row_id -> snooze_until_epoch_seconds
-
-# Load persisted reminders from storage
-for idx, row in df_raw.iterrows():
+
+@st.cache_data(ttl=30)
+def load_reminder_state_from_gsheets(_worksheet) -> dict:
+    """Load reminder state from the 'Reminders' worksheet (row_id, snooze_until, dismissed)."""
+    ws = _get_gsheets_reminders_worksheet(_worksheet)
+    if ws is None:
+        return {}
+    out: dict = {}
+    for r in (ws.get_all_values() or [])[1:]:
+        if not r or not str(r[0]).strip():
+            continue
+        until = str(r[1]).strip() if len(r) > 1 else ""
+        dismissed = str(r[2]).strip().upper() in ["TRUE", "1", "T", "YES"] if len(r) > 2 else False
+        out[str(r[0]).strip()] = {"until": int(until) if until.isdigit() else None, "dismissed": dismissed}
+    return out
+
+
+def load_reminder_state_from_file(path: str) -> dict:
+    """Load reminder state from the local JSON sidecar used with the Excel backend."""
     try:
-        row_id = row.get('REMINDER_ROW_ID')
-        if pd.notna(row_id):
-            until_raw = row.get('REMINDER_SNOOZE_UNTIL')
-            until_epoch = None
-            if pd.notna(until_raw) and until_raw != "":
-                try:
-                    # Normalize numeric strings
-                    if isinstance(until_raw, str) and until_raw.strip().isdigit():
-                        until_raw = int(until_raw.strip())
-
-                    if isinstance(until_raw, (int, float)):
-                        val = int(until_raw)
-                        # Legacy values were stored as minutes since midnight (small numbers)
-                        if val < 100000:
-                            midnight_ist = datetime(now.year, now.month, now.day, tzinfo=IST)
-                            until_epoch = int(midnight_ist.timestamp()) + (val * 60)
-                        else:
-                            until_epoch = val
-                    elif isinstance(until_raw, str):
-                        s = until_raw.strip().replace("Z", "+00:00")
-                        dt = datetime.fromisoformat(s)
-                        until_epoch = int(dt.timestamp())
-                except Exception:
-                    until_epoch = None
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return {str(rid): dict(v) for rid, v in (data or {}).items() if isinstance(v, dict)}
+
 
-            if until_epoch is not None and until_epoch > now_epoch:
-                st.session_state.snoozed[row_id] = until_epoch
-            dismissed = row.get('REMINDER_DISMISSED')
-            if str(dismissed).strip().upper() in ['TRUE','1','T','YES']:
-                st.session_state.reminder_sent.add(row_id)
+def _load_reminder_state() -> dict:
+    """Return persisted reminder state for the active backend ({} on failure)."""
+    try:
+        if USE_SUPABASE:
+            sup_url, sup_key, _, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+            return load_reminder_state_from_supabase(sup_url, sup_key, _get_reminder_table_name(), sup_row)
+        if USE_GOOGLE_SHEETS:
+            return load_reminder_state_from_gsheets(gsheet_worksheet)
+        return load_reminder_state_from_file(LOCAL_REMINDER_STATE_PATH)
     except Exception:
-        continue
+        pass
+    return {}
 
-# Compute hash to detect file changes
-current_hash = hashlib.md5(pd.util.hash_pandas_object(df_raw).values.tobytes()).hexdigest()
 
-if st.session_state.prev_hash != current_hash:
-    st.toast("📊 ALLOTMENT UPDATED", icon="🔄")
-    # Reset tracked sets on file change
-    st.session_state.prev_ongoing = set()
-    st.session_state.prev_upcoming = set()
-    st.session_state.reminder_sent = set()
-    st.session_state.snoozed = {}
+def _reminder_sheet_row(rid: str, v: dict) -> list:
+    return [rid, "" if v.get("until") is None else str(int(v["until"])), "TRUE" if v.get("dismissed") else "FALSE"]
 
-st.session_state.prev_hash = current_hash
 
-# Ensure Is_Ongoing column exists before using it
-if "Is_Ongoing" not in df.columns:
-    df["Is_Ongoing"] = (df["In_min"] <= current_min) & (current_min <= df["Out_min"])
+def _reminder_store_target() -> dict:
+    """Plain config for the active reminder store, resolved on the script thread.
+
+    The dispatcher thread writes with it, so it never touches st.secrets or caches.
+    """
+    if USE_SUPABASE:
+        sup_url, sup_key, _, sup_row, _ = _get_supabase_config_from_secrets_or_env()
+        return {
+            "backend": "supabase",
+            "client": _get_supabase_client(sup_url, sup_key),
+            "table": _get_reminder_table_name(),
+            "state_id": sup_row,
+        }
+    if USE_GOOGLE_SHEETS:
+        return {"backend": "gsheets", "worksheet": gsheet_worksheet}
+    return {"backend": "file", "path": LOCAL_REMINDER_STATE_PATH}
 
-# Currently Ongoing (filtered)
-ongoing_df = df[
-    df["Is_Ongoing"] &
-    ~df["STATUS"].astype(str).str.upper().str.contains("CANCELLED|DONE|COMPLETED|SHIFTED", na=True)
-]
 
-current_ongoing = set(ongoing_df["Patient Name"].dropna())
+def _write_reminder_updates(pending: dict, target: dict) -> None:
+    """Write {row_id: {"until", "dismissed"}} to the reminder store in one batch (raises on failure)."""
+    if not pending:
+        return
+    if target["backend"] == "supabase":
+        if target["client"] is None:
+            raise RuntimeError("Supabase client unavailable")
+        rows = [
+            {"state_id": target["state_id"], "row_id": rid, "snooze_until": v["until"], "dismissed": v["dismissed"]}
+            for rid, v in pending.items()
+        ]
+        target["client"].table(target["table"]).upsert(rows, on_conflict="state_id,row_id").execute()
+    elif target["backend"] == "gsheets":
+        ws = _get_gsheets_reminders_worksheet(target["worksheet"])
+        if ws is None:
+            raise RuntimeError(f"'{GSHEETS_REMINDERS_SHEET}' worksheet is not available")
+        # Rewrite only the rows for these ids; new ids are appended.
+        ids = ws.col_values(1) or []
+        row_of = {str(v).strip(): i + 1 for i, v in enumerate(ids) if i > 0 and str(v).strip()}
+        updates, appends = [], []
+        for rid, v in pending.items():
+            if rid in row_of:
+                updates.append({"range": f"A{row_of[rid]}:C{row_of[rid]}", "values": [_reminder_sheet_row(rid, v)]})
+            else:
+                appends.append(_reminder_sheet_row(rid, v))
+        if not ids:
+            ws.update([["row_id", "snooze_until", "dismissed"]], "A1")
+        if updates:
+            ws.batch_update(updates)
+        if appends:
+            ws.append_rows(appends, value_input_option="RAW")
+    else:
+        path = target["path"]
+        state = load_reminder_state_from_file(path)
+        state.update(pending)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(state, fh)
+        os.replace(tmp, path)
 
-# New ongoing (either from time passing or manual status update)
-new_ongoing = current_ongoing - st.session_state.prev_ongoing
-for patient in new_ongoing:
-    row = ongoing_df[ongoing_df["Patient Name"] == patient].iloc[0]
-    st.toast(f"🚨 NOW ONGOING: {patient} – {row['Procedure']} with {row['DR.']} (Chair {row['OP']})", icon="🟢")
 
-# Upcoming in next 15 minutes
-upcoming_min = current_min + 15
-upcoming_df = df[
-    (df["In_min"] > current_min) &
-    (df["In_min"] <= upcoming_min) &
-    ~df["STATUS"].astype(str).str.upper().str.contains("CANCELLED|DONE|COMPLETED|SHIFTED", na=True)
-]
+# Save reminder IDs if they were just generated
+if _needs_id_save:
+    _maybe_save(df_raw, message="Generated stable row IDs for reminders")
 
-current_upcoming = set(upcoming_df["Patient Name"].dropna())
+# ================ Reminder Scheduler ================
+# Reminder candidates are worked out once per data version (cached on the shared
+# row record). The reminder dispatcher keeps a min-heap of (fire_at_epoch, row_id)
+# built from them and pushes snooze events onto it; each pass only pops the entries
+# that are due. Stale entries (dismissed, re-snoozed, expired) are discarded when popped.
+REMINDER_LEAD_MIN = 15
+REMINDER_SKIP_STATUSES = ("CANCELLED", "DONE", "COMPLETED", "SHIFTED", "ARRIVED", "ARRIVING", "ON GOING", "ONGOING")
+
+
+def _reminder_plan(frame: pd.DataFrame, rows: dict) -> dict:
+    """{"in_min": {row_id: In_min}, "order": [(In_min, row_id)] sorted} for rows that can be reminded."""
+    plan = rows.get("reminders")
+    if plan is not None:
+        return plan
+    in_min = {}
+    if "In_min" in frame.columns:
+        starts = frame["In_min"].tolist()
+        for rid, pos in rows["pos"].items():
+            if rid.startswith("#") or _is_blank_cell(starts[pos]):
+                continue
+            status = rows["status"].get(rid, "")
+            if any(s in status for s in REMINDER_SKIP_STATUSES):
+                continue
+            in_min[rid] = int(starts[pos])
+    plan = {"in_min": in_min, "order": sorted((m, rid) for rid, m in in_min.items())}
+    rows["reminders"] = plan
+    return plan
 
-# New upcoming (just entered the 15-minute window)
-new_upcoming = current_upcoming - st.session_state.prev_upcoming
-for patient in new_upcoming:
-    row = upcoming_df[upcoming_df["Patient Name"] == patient].iloc[0]
-    mins_left = row["In_min"] - current_min
-    st.toast(f"⏰ Upcoming in ~{mins_left} min: {patient} – {row['Procedure']} with {row['DR.']}", icon="⚠️")
 
-# ================ 15-Minute Reminder System ================
-if st.session_state.get("enable_reminders", True):
-    # Clean up expired snoozes
-    expired = [rid for rid, until in list(st.session_state.snoozed.items()) if until <= now_epoch]
-    for rid in expired:
-        del st.session_state.snoozed[rid]
-        # Don't persist clears on natural expiry; we'll overwrite when re-snoozing.
-    
-    # Find patients needing reminders (0-15 min before In Time)
-    reminder_df = df[
-        (df["In_min"].notna()) &
-        (df["In_min"] - current_min > 0) &
-        (df["In_min"] - current_min <= 15) &
-        ~df["STATUS"].astype(str).str.upper().str.contains("CANCELLED|DONE|COMPLETED|SHIFTED|ARRIVED|ARRIVING|ON GOING|ONGOING", na=True)
-    ].copy()
-    
-    # Show toast for new reminders (not snoozed, not dismissed)
-    for idx, row in reminder_df.iterrows():
-        row_id = row.get('REMINDER_ROW_ID')
-        if pd.isna(row_id):
-            continue
-        patient = row.get("Patient Name", "Unknown")
-        mins_left = int(row["In_min"] - current_min)
-        
-        # Skip if snoozed (still active) or dismissed
-        snooze_until = st.session_state.snoozed.get(row_id)
-        if (snooze_until is not None and snooze_until > now_epoch) or (row_id in st.session_state.reminder_sent):
+def _parse_snooze_until(value: Any, midnight_epoch: int) -> int | None:
+    """Epoch seconds from a stored snooze value (epoch, legacy minutes since midnight, or ISO string)."""
+    if _is_blank_cell(value):
+        return None
+    try:
+        # Normalize numeric strings
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value.strip())
+        if isinstance(value, (int, float, np.integer, np.floating)):
+            val = int(value)
+            # Legacy values were stored as minutes since midnight (small numbers)
+            return midnight_epoch + val * 60 if val < 100000 else val
+        if isinstance(value, str):
+            return int(datetime.fromisoformat(value.strip().replace("Z", "+00:00")).timestamp())
+    except Exception:
+        pass
+    return None
+
+
+def _legacy_reminder_state(frame: pd.DataFrame, rows: dict, midnight_epoch: int) -> dict[str, tuple]:
+    """{row_id: (until_epoch, dismissed)} from the legacy schedule columns, parsed once per version and day."""
+    cached = rows.get("legacy_reminders")
+    if cached is not None and cached[0] == midnight_epoch:
+        return cached[1]
+    state = {}
+    n = len(frame)
+    untils = frame["REMINDER_SNOOZE_UNTIL"].tolist() if "REMINDER_SNOOZE_UNTIL" in frame.columns else [None] * n
+    dismissed = frame["REMINDER_DISMISSED"].tolist() if "REMINDER_DISMISSED" in frame.columns else [None] * n
+    for rid, pos in rows["pos"].items():
+        if rid.startswith("#") or (_is_blank_cell(untils[pos]) and _is_blank_cell(dismissed[pos])):
             continue
+        state[rid] = (_parse_snooze_until(untils[pos], midnight_epoch), dismissed[pos])
+    rows["legacy_reminders"] = (midnight_epoch, state)
+    return state
 
-        assistants = ", ".join(
-            [
-                a
-                for a in [
-                    str(row.get("FIRST", "")).strip(),
-                    str(row.get("SECOND", "")).strip(),
-                    str(row.get("Third", "")).strip(),
-                ]
-                if a and a.lower() not in {"nan", "none"}
+
+def _is_dismissed_flag(value: Any) -> bool:
+    return str(value).strip().upper() in ("TRUE", "1", "T", "YES")
+
+
+def upcoming_reminders(plan: dict, current_min: int) -> list[str]:
+    """Row IDs starting within the next REMINDER_LEAD_MIN minutes, earliest first."""
+    order = plan["order"]
+    lo = bisect.bisect_right(order, current_min, key=lambda e: e[0])
+    hi = bisect.bisect_right(order, current_min + REMINDER_LEAD_MIN, key=lambda e: e[0])
+    return [rid for _, rid in order[lo:hi]]
+
+
+# ================ Change Detection & Notifications ================
+# Each session keeps a reference to the row record it last rendered (shared per
+# data version, never copied) and diffs it against the current one by row ID.
+def schedule_row_delta(prev_rows: dict | None, cur_rows: dict) -> dict[str, list[str]]:
+    """Row IDs added, removed or changed between two row records."""
+    if prev_rows is cur_rows:
+        return {"added": [], "removed": [], "changed": []}
+    if prev_rows is None:
+        return {"added": list(cur_rows["digest"]), "removed": [], "changed": []}
+    prev_digest, cur_digest = prev_rows["digest"], cur_rows["digest"]
+    return {
+        "added": [rid for rid in cur_digest if rid not in prev_digest],
+        "removed": [rid for rid in prev_digest if rid not in cur_digest],
+        "changed": [rid for rid, d in cur_digest.items() if rid in prev_digest and prev_digest[rid] != d],
+    }
+
+
+# ================ Reminder Dispatcher ================
+# One daemon thread per process evaluates reminders and the "NOW ONGOING" /
+# "Upcoming" windows for every open screen. Sessions hand it the schedule they
+# rendered (a reference, only when the data version changes), apply snooze /
+# dismiss actions to its state, and read its events from a shared bus by sequence
+# number. The worker owns the snooze state and is the only writer of the
+# reminder sidecar, so N screens cost one evaluation and one write per change.
+REMINDER_TICK_SECONDS = 60
+REMINDER_AUTO_SNOOZE_SECONDS = 30
+REMINDER_EVENT_BACKLOG = 500
+REMINDER_FEED_INTERVAL_SECONDS = 5
+REMINDER_WINDOW_SKIP_PATTERN = "CANCELLED|DONE|COMPLETED|SHIFTED"
+
+
+@st.cache_resource
+def _reminder_dispatcher() -> dict:
+    """Process-wide reminder state, event bus and the worker thread that owns them."""
+    d = {
+        "cond": threading.Condition(),
+        "frame": None,        # latest published schedule and its row record
+        "rows": None,
+        "stored": None,       # sidecar state loaded by the first publishing session
+        "dirty": False,
+        "heap": [],           # (fire_at_epoch, row_id)
+        "heap_rows": None,
+        "heap_day": None,
+        "snoozed": {},        # row_id -> snooze_until_epoch_seconds
+        "dismissed": set(),
+        "ongoing": set(),     # patient names already announced
+        "upcoming": set(),
+        "minute": None,
+        "events": [],
+        "seq": 0,
+        "tick_seq": 0,        # seq before the latest minute's events (start point for new sessions)
+        "pending": {},        # sidecar writes not yet persisted
+        "target": None,       # _reminder_store_target() from the latest session
+        "last_error": "",
+    }
+    thread = threading.Thread(target=_reminder_worker, args=(d,), name="tdb-reminders", daemon=True)
+    thread.start()
+    d["thread"] = thread
+    return d
+
+
+def _emit_reminder_event(d: dict, kind: str, text: str, icon: str, row_id: str | None = None) -> None:
+    d["seq"] += 1
+    d["events"].append({"seq": d["seq"], "kind": kind, "text": text, "icon": icon, "row_id": row_id})
+    if len(d["events"]) > REMINDER_EVENT_BACKLOG:
+        del d["events"][: len(d["events"]) - REMINDER_EVENT_BACKLOG]
+
+
+def _snooze_reminder(d: dict, row_id: str, until: int) -> None:
+    d["snoozed"][row_id] = int(until)
+    d["dismissed"].discard(row_id)
+    heapq.heappush(d["heap"], (int(until), row_id))
+    d["pending"][row_id] = {"until": int(until), "dismissed": False}
+
+
+def _assistants_text(row, sep: str) -> str:
+    assistants = ", ".join(
+        [
+            a
+            for a in [
+                str(row.get("FIRST", "")).strip(),
+                str(row.get("SECOND", "")).strip(),
+                str(row.get("Third", "")).strip(),
             ]
+            if a and a.lower() not in {"nan", "none"}
+        ]
+    )
+    return f"{sep}Assist: {assistants}" if assistants else ""
+
+
+def _absorb_reminder_schedule(d: dict, frame: pd.DataFrame, rows: dict, plan: dict, midnight_epoch: int, now_epoch: int) -> None:
+    """Carry reminder state over to a new data version (or day) and rebuild the heap."""
+    prev = d["heap_rows"]
+    if prev is None:
+        # First schedule seen by this process: stored state (sidecar wins over legacy columns)
+        stored = dict(_legacy_reminder_state(frame, rows, midnight_epoch))
+        for rid, v in (d["stored"] or {}).items():
+            if rid in rows["pos"]:
+                stored[rid] = (_parse_snooze_until(v.get("until"), midnight_epoch), v.get("dismissed"))
+        for rid, (until, dismissed) in stored.items():
+            if until is not None and until > now_epoch:
+                d["snoozed"][rid] = until
+            if _is_dismissed_flag(dismissed):
+                d["dismissed"].add(rid)
+    elif prev is not rows:
+        # Changed rows get their ongoing/upcoming toasts and reminders again
+        delta = schedule_row_delta(prev, rows)
+        for rid in delta["changed"] + delta["removed"]:
+            if rid in d["dismissed"] or rid in d["snoozed"]:
+                # Clear the stored state too, or a restart would bring it back
+                d["pending"][rid] = {"until": None, "dismissed": False}
+            d["dismissed"].discard(rid)
+            d["snoozed"].pop(rid, None)
+        if "Patient Name" in frame.columns:
+            names = frame["Patient Name"].tolist()
+            for rid in delta["changed"] + delta["added"]:
+                d["ongoing"].discard(names[rows["pos"][rid]])
+                d["upcoming"].discard(names[rows["pos"][rid]])
+    d["snoozed"] = {rid: until for rid, until in d["snoozed"].items() if until > now_epoch}
+
+    heap = []
+    for rid, m in plan["in_min"].items():
+        if midnight_epoch + m * 60 <= now_epoch or rid in d["dismissed"]:
+            continue
+        fire_at = midnight_epoch + (m - REMINDER_LEAD_MIN) * 60
+        heap.append((max(fire_at, d["snoozed"].get(rid, 0)), rid))
+    heapq.heapify(heap)
+    d["heap"] = heap
+    d["heap_rows"] = rows
+    d["heap_day"] = midnight_epoch
+
+
+def _emit_window_events(d: dict, frame: pd.DataFrame, current_min: int) -> None:
+    """Announce patients that became ongoing or entered the 15-minute upcoming window."""
+    if frame.empty or not {"In_min", "Out_min", "Patient Name"}.issubset(frame.columns):
+        d["ongoing"], d["upcoming"] = set(), set()
+        return
+    in_min = pd.to_numeric(frame["In_min"], errors="coerce")
+    out_min = pd.to_numeric(frame["Out_min"], errors="coerce")
+    active = pd.Series(True, index=frame.index)
+    if "STATUS" in frame.columns:
+        active = ~frame["STATUS"].astype(str).str.upper().str.contains(REMINDER_WINDOW_SKIP_PATTERN, na=True)
+    ongoing_df = frame[((in_min <= current_min) & (current_min <= out_min)).fillna(False) & active]
+    upcoming_df = frame[((in_min > current_min) & (in_min <= current_min + REMINDER_LEAD_MIN)).fillna(False) & active]
+
+    current_ongoing = set(ongoing_df["Patient Name"].dropna())
+    for patient in current_ongoing - d["ongoing"]:
+        row = ongoing_df[ongoing_df["Patient Name"] == patient].iloc[0]
+        _emit_reminder_event(
+            d, "ongoing",
+            f"🚨 NOW ONGOING: {patient} – {row.get('Procedure', '')} with {row.get('DR.', '')} (Chair {row.get('OP', '')})",
+            "🟢",
         )
-        assistants_text = f" | Assist: {assistants}" if assistants else ""
-        
-        st.toast(
-            f"🔔 Reminder: {patient} in ~{mins_left} min at {row['In Time Str']} with {row.get('DR.','')} (OP {row.get('OP','')}){assistants_text}",
-            icon="🔔",
+    current_upcoming = set(upcoming_df["Patient Name"].dropna())
+    for patient in current_upcoming - d["upcoming"]:
+        row = upcoming_df[upcoming_df["Patient Name"] == patient].iloc[0]
+        mins_left = int(row["In_min"] - current_min)
+        _emit_reminder_event(
+            d, "upcoming",
+            f"⏰ Upcoming in ~{mins_left} min: {patient} – {row.get('Procedure', '')} with {row.get('DR.', '')}",
+            "⚠️",
         )
+    d["ongoing"], d["upcoming"] = current_ongoing, current_upcoming
+
 
+def _dispatch_reminders(d: dict, now: datetime) -> None:
+    """One worker pass (lock held): absorb a new schedule, announce a new minute, pop due reminders."""
+    frame, rows = d["frame"], d["rows"]
+    if rows is None:
+        return
+    now_epoch = int(now.timestamp())
+    current_min = now.hour * 60 + now.minute
+    midnight_epoch = int(datetime(now.year, now.month, now.day, tzinfo=IST).timestamp())
+    plan = _reminder_plan(frame, rows)
+    new_version = d["heap_rows"] is not rows or d["heap_day"] != midnight_epoch
+    if new_version:
+        _absorb_reminder_schedule(d, frame, rows, plan, midnight_epoch, now_epoch)
+    if new_version or d["minute"] != (midnight_epoch, current_min):
+        d["minute"] = (midnight_epoch, current_min)
+        d["tick_seq"] = d["seq"]
+        _emit_window_events(d, frame, current_min)
+
+    heap, seen = d["heap"], set()
+    while heap and heap[0][0] <= now_epoch:
+        _, rid = heapq.heappop(heap)
+        m = plan["in_min"].get(rid)
+        if m is None or not (0 < m - current_min <= REMINDER_LEAD_MIN) or rid in seen:
+            continue
+        if rid in d["dismissed"] or d["snoozed"].get(rid, 0) > now_epoch:
+            continue
+        seen.add(rid)
+        row = frame.iloc[rows["pos"][rid]]
+        _emit_reminder_event(
+            d, "reminder",
+            f"🔔 Reminder: {row.get('Patient Name', 'Unknown')} in ~{m - current_min} min at {row.get('In Time Str', '')} "
+            f"with {row.get('DR.','')} (OP {row.get('OP','')}){_assistants_text(row, ' | ')}",
+            "🔔",
+            row_id=rid,
+        )
         # Auto-snooze for 30 seconds, and re-alert until status changes.
-        next_until = now_epoch + 30
-        st.session_state.snoozed[row_id] = next_until
-        _persist_reminder_to_storage(row_id, next_until, False)
-    
+        _snooze_reminder(d, rid, now_epoch + REMINDER_AUTO_SNOOZE_SECONDS)
+
+
+def _reminder_worker(d: dict) -> None:
+    cond = d["cond"]
+    while True:
+        with cond:
+            now_ts = time_module.time()
+            deadline = (int(now_ts) // REMINDER_TICK_SECONDS + 1) * REMINDER_TICK_SECONDS
+            if d["heap"]:
+                deadline = min(deadline, d["heap"][0][0])
+            while not d["dirty"] and time_module.time() < deadline:
+                cond.wait(timeout=max(0.05, deadline - time_module.time()))
+            d["dirty"] = False
+            try:
+                _dispatch_reminders(d, now_ist())
+                pass_error = ""
+            except Exception as e:
+                pass_error = f"Reminder pass failed: {e}"
+            pending, d["pending"] = d["pending"], {}
+            target = d["target"]
+            if not pending or target is None:
+                d["pending"].update(pending)
+                d["last_error"] = pass_error
+            cond.notify_all()
+
+        if not pending or target is None:
+            continue
+        try:
+            _write_reminder_updates(pending, target)
+            error = ""
+        except Exception as e:
+            error = f"Could not save reminder state: {e}"
+        with cond:
+            if error:
+                # Keep newer updates; retried on the next pass.
+                for rid, v in pending.items():
+                    d["pending"].setdefault(rid, v)
+            d["last_error"] = pass_error or error
+            cond.notify_all()
+
+
+def _publish_reminder_schedule(frame: pd.DataFrame, rows: dict) -> None:
+    """Hand this rerun's schedule to the dispatcher (no-op unless the data version changed)."""
+    d = _reminder_dispatcher()
+    try:
+        target = _reminder_store_target()
+    except Exception:
+        target = None
+    with d["cond"]:
+        if target is not None:
+            d["target"] = target
+        if d["rows"] is rows:
+            return
+        first = d["stored"] is None
+    stored = _load_reminder_state() if first else None
+    with d["cond"]:
+        if d["rows"] is rows:
+            return
+        # Own copy: columns or cells this session changes later must not show up mid-pass.
+        d["frame"] = frame.copy(deep=not PANDAS_COPY_ON_WRITE)
+        d["rows"] = rows
+        if stored is not None and d["stored"] is None:
+            d["stored"] = stored
+        d["dirty"] = True
+        d["cond"].notify_all()
+
+
+def submit_reminder_action(row_id: str, action: str, until: int | None = None) -> None:
+    """Apply a "snooze" / "dismiss" / "cancel" from a session; the worker persists it."""
+    d = _reminder_dispatcher()
+    rid = str(row_id)
+    with d["cond"]:
+        if action == "snooze":
+            _snooze_reminder(d, rid, int(until))
+        elif action == "dismiss":
+            d["dismissed"].add(rid)
+            d["snoozed"].pop(rid, None)
+            d["pending"][rid] = {"until": None, "dismissed": True}
+        elif action == "cancel":
+            d["snoozed"].pop(rid, None)
+            heapq.heappush(d["heap"], (int(time_module.time()), rid))
+            d["pending"][rid] = {"until": None, "dismissed": False}
+        else:
+            raise ValueError(f"Unknown reminder action: {action}")
+        d["dirty"] = True
+        d["cond"].notify_all()
+
+
+def clear_reminder_state(row_ids: list[str]) -> None:
+    """Forget snooze/dismiss state for these rows (e.g. carried over by the daily rollover)."""
+    d = _reminder_dispatcher()
+    now = now_ist()
+    midnight_epoch = int(datetime(now.year, now.month, now.day, tzinfo=IST).timestamp())
+    with d["cond"]:
+        plan = _reminder_plan(d["frame"], d["rows"]) if d["rows"] is not None else {"in_min": {}}
+        for rid in map(str, row_ids):
+            d["snoozed"].pop(rid, None)
+            d["dismissed"].discard(rid)
+            if d["stored"]:
+                d["stored"].pop(rid, None)
+            d["pending"][rid] = {"until": None, "dismissed": False}
+            if rid in plan["in_min"]:
+                heapq.heappush(d["heap"], (midnight_epoch + (plan["in_min"][rid] - REMINDER_LEAD_MIN) * 60, rid))
+        d["dirty"] = True
+        d["cond"].notify_all()
+
+
+def reminder_snoozes() -> dict[str, int]:
+    """Snapshot of active snoozes {row_id: until_epoch}."""
+    d = _reminder_dispatcher()
+    now_ts = time_module.time()
+    with d["cond"]:
+        return {rid: until for rid, until in d["snoozed"].items() if until > now_ts}
+
+
+def drain_reminder_events() -> list[dict]:
+    """Events published since this session last looked (new sessions start at the latest minute)."""
+    d = _reminder_dispatcher()
+    with d["cond"]:
+        seen = st.session_state.get("reminder_event_seq")
+        if seen is None:
+            seen = d["tick_seq"]
+        st.session_state.reminder_event_seq = d["seq"]
+        if seen >= d["seq"]:
+            return []
+        return [e for e in d["events"] if e["seq"] > seen]
+
+
+def _show_reminder_events() -> None:
+    reminders_on = st.session_state.get("enable_reminders", True)
+    for event in drain_reminder_events():
+        if event["kind"] == "reminder" and not reminders_on:
+            continue
+        st.toast(event["text"], icon=event["icon"])
+
+
+def _render_reminder_feed() -> None:
+    """Show dispatcher events every few seconds without a full rerun."""
+    fragment = getattr(st, "fragment", None)
+    if fragment is None:
+        _show_reminder_events()
+        return
+
+    @fragment(run_every=REMINDER_FEED_INTERVAL_SECONDS)
+    def _reminder_feed():
+        _show_reminder_events()
+
+    _reminder_feed()
+
+
+if 'prev_rows' not in st.session_state:
+    st.session_state.prev_rows = None
+
+# Reminders and ongoing/upcoming toasts come from the process-wide dispatcher
+_publish_reminder_schedule(df, schedule_rows)
+if st.session_state.get("rollover_reminder_clears"):
+    clear_reminder_state(st.session_state.pop("rollover_reminder_clears"))
+
+# Rows added, removed or changed since this session last rendered
+row_delta = schedule_row_delta(st.session_state.prev_rows, schedule_rows)
+if any(row_delta.values()):
+    st.toast("📊 ALLOTMENT UPDATED", icon="🔄")
+
+# Ensure Is_Ongoing column exists before using it
+if "Is_Ongoing" not in df.columns:
+    df["Is_Ongoing"] = (df["In_min"] <= current_min) & (current_min <= df["Out_min"])
+
+# ================ 15-Minute Reminder System ================
+if st.session_state.get("enable_reminders", True):
+    reminder_plan = _reminder_plan(df, schedule_rows)
+
     # Reminder management UI
     def _safe_key(s):
         return re.sub(r"\W+", "_", str(s))
     
     with st.expander("🔔 Manage Reminders", expanded=False):
-        if reminder_df.empty:
+        reminder_ids = upcoming_reminders(reminder_plan, current_min)
+        if not reminder_ids:
             st.caption("No upcoming appointments in the next 15 minutes.")
         else:
-            for idx, row in reminder_df.iterrows():
-                row_id = row.get('REMINDER_ROW_ID')
-                if pd.isna(row_id):
-                    continue
+            for row_id in reminder_ids:
+                row = df.iloc[schedule_rows["pos"][row_id]]
                 patient = row.get('Patient Name', 'Unknown')
                 mins_left = int(row["In_min"] - current_min)
-
-                assistants = ", ".join(
-                    [
-                        a
-                        for a in [
-                            str(row.get("FIRST", "")).strip(),
-                            str(row.get("SECOND", "")).strip(),
-                            str(row.get("Third", "")).strip(),
-                        ]
-                        if a and a.lower() not in {"nan", "none"}
-                    ]
-                )
-                assistants_text = f" — Assist: {assistants}" if assistants else ""
+                assistants_text = _assistants_text(row, " — ")
                 
                 col1, col2, col3, col4, col5 = st.columns([4,1,1,1,1])
                 col1.markdown(
@@ -5195,77 +8237,63 @@ if st.session_state.get("enable_reminders", True):
                 
                 default_snooze_seconds = int(st.session_state.get("default_snooze_seconds", 30))
                 if col2.button(f"💤 {default_snooze_seconds}s", key=f"snooze_{_safe_key(row_id)}_default"):
-                    until = now_epoch + default_snooze_seconds
-                    st.session_state.snoozed[row_id] = until
-                    st.session_state.reminder_sent.discard(row_id)
-                    _persist_reminder_to_storage(row_id, until, False)
+                    submit_reminder_action(row_id, "snooze", now_epoch + default_snooze_seconds)
                     st.toast(f"😴 Snoozed {patient} for {default_snooze_seconds} sec", icon="💤")
                     st.rerun()
                     
                 if col3.button("💤 30s", key=f"snooze_{_safe_key(row_id)}_30s"):
-                    until = now_epoch + 30
-                    st.session_state.snoozed[row_id] = until
-                    st.session_state.reminder_sent.discard(row_id)
-                    _persist_reminder_to_storage(row_id, until, False)
+                    submit_reminder_action(row_id, "snooze", now_epoch + 30)
                     st.toast(f"😴 Snoozed {patient} for 30 sec", icon="💤")
                     st.rerun()
                     
                 if col4.button("💤 60s", key=f"snooze_{_safe_key(row_id)}_60s"):
-                    until = now_epoch + 60
-                    st.session_state.snoozed[row_id] = until
-                    st.session_state.reminder_sent.discard(row_id)
-                    _persist_reminder_to_storage(row_id, until, False)
+                    submit_reminder_action(row_id, "snooze", now_epoch + 60)
                     st.toast(f"😴 Snoozed {patient} for 60 sec", icon="💤")
                     st.rerun()
                     
                 if col5.button("🗑️", key=f"dismiss_{_safe_key(row_id)}"):
-                    st.session_state.reminder_sent.add(row_id)
-                    _persist_reminder_to_storage(row_id, None, True)
+                    submit_reminder_action(row_id, "dismiss")
                     st.toast(f"✅ Dismissed reminder for {patient}", icon="✅")
                     st.rerun()
             
             # Show snoozed reminders
-            if st.session_state.snoozed:
+            snoozed = reminder_snoozes()
+            if snoozed:
                 st.markdown("---")
                 st.markdown("**Snoozed Reminders**")
-                for row_id, until in list(st.session_state.snoozed.items()):
+                for row_id, until in snoozed.items():
                     remaining_sec = int(until - now_epoch)
                     if remaining_sec > 0:
-                        match_row = df[df.get('REMINDER_ROW_ID') == row_id]
-                        if not match_row.empty:
-                            name = match_row.iloc[0].get('Patient Name', row_id)
+                        pos = schedule_rows["pos"].get(row_id)
+                        if pos is not None:
+                            name = df.iloc[pos].get('Patient Name', row_id)
                             c1, c2 = st.columns([4,1])
                             c1.write(f"🕐 {name} — {remaining_sec} sec remaining")
                             if c2.button("Cancel", key=f"cancel_{_safe_key(row_id)}"):
-                                del st.session_state.snoozed[row_id]
-                                _persist_reminder_to_storage(row_id, None, False)
+                                submit_reminder_action(row_id, "cancel")
                                 st.toast(f"✅ Cancelled snooze for {name}", icon="✅")
                                 st.rerun()
 
-# New arrivals (manual status change in Excel)
-current_arrived = set(df_raw[df_raw["STATUS"].astype(str).str.upper() == "ARRIVED"]["Patient Name"].dropna())
-if ("STATUS" in st.session_state.prev_raw.columns) and ("Patient Name" in st.session_state.prev_raw.columns):
-    prev_arrived = set(
-        st.session_state.prev_raw[
-            st.session_state.prev_raw["STATUS"].astype(str).str.upper() == "ARRIVED"
-        ]["Patient Name"].dropna()
-    )
-else:
-    prev_arrived = set()
-new_arrived = current_arrived - prev_arrived
-for patient in new_arrived:
-    row = df[df["Patient Name"] == patient].iloc[0]
-    st.toast(f"👤 Patient ARRIVED: {patient} – {row['Procedure']}", icon="🟡")
+    _reminder_error = _reminder_dispatcher().get("last_error")
+    if _reminder_error:
+        st.warning(_reminder_error)
+
+# New arrivals (status changed to ARRIVED on an added or changed row)
+_prev_status = (st.session_state.prev_rows or {}).get("status", {})
+for rid in row_delta["added"] + row_delta["changed"]:
+    if schedule_rows["status"][rid] == "ARRIVED" and _prev_status.get(rid) != "ARRIVED":
+        row = df.iloc[schedule_rows["pos"][rid]]
+        st.toast(f"👤 Patient ARRIVED: {row.get('Patient Name', '')} – {row.get('Procedure', '')}", icon="🟡")
 
 # Update session state for next run
-st.session_state.prev_ongoing = current_ongoing
-st.session_state.prev_upcoming = current_upcoming
-st.session_state.prev_raw = df_raw.copy()
+st.session_state.prev_rows = schedule_rows
 
 # Sidebar header + attendance punch widget
 with st.sidebar:
     st.markdown('<div class="sidebar-title">🦷 TDB Dashboard</div>', unsafe_allow_html=True)
     st.markdown('<div class="live-pill"><span class="live-dot"></span> Live • Auto refresh</div>', unsafe_allow_html=True)
+    _render_schedule_change_watcher()
+    _render_reminder_feed()
     st.divider()
     schedule_for_punch = df if "df" in locals() else df_raw if "df_raw" in locals() else pd.DataFrame()
     try:
@@ -5584,15 +8612,6 @@ if category == "Scheduling":
                         raise ValueError("Missing REMINDER_ROW_ID column")
                     df_updated = df_raw[df_raw["REMINDER_ROW_ID"].astype(str) != rid].copy()
     
-                    # Clear local reminder state for this row id.
-                    try:
-                        if "snoozed" in st.session_state and rid in st.session_state.snoozed:
-                            del st.session_state.snoozed[rid]
-                        if "reminder_sent" in st.session_state:
-                            st.session_state.reminder_sent.discard(rid)
-                    except Exception:
-                        pass
-    
                     _maybe_save(df_updated, message="Row deleted")
                     st.session_state.delete_row_id = ""
                     st.rerun()
@@ -5792,7 +8811,7 @@ if category == "Scheduling":
         pending_df = st.session_state.get("unsaved_df")
         if pending_df is not None:
             pending_msg = st.session_state.get("pending_changes_reason") or "Pending changes saved!"
-            if save_data(pending_df, message=pending_msg):
+            if save_data(pending_df, message=pending_msg, flush=True):
                 st.session_state.unsaved_df = None
                 st.session_state.pending_changes = False
                 st.session_state.pending_changes_reason = ""
@@ -5963,11 +8982,16 @@ if category == "Scheduling":
                     # Auto-allocate assistants after applying all row edits
                     if bool(st.session_state.get("auto_assign_assistants", True)):
                         only_empty = bool(st.session_state.get("auto_assign_only_empty", True))
-                        for ix in sorted(allocation_candidates):
-                            _auto_fill_assistants_for_row(df_updated, ix, only_fill_empty=only_empty)
+                        try:
+                            alloc_rows = allocation_candidates
+                            if bool(st.session_state.get("auto_assign_incremental", True)):
+                                alloc_rows = allocation_candidates.intersection(incremental_allocation_rows(df_raw, df_updated))
+                            allocate_assistants_batch(df_updated, sorted(alloc_rows), only_fill_empty=only_empty)
+                        except Exception as alloc_error:
+                            st.warning(f"Auto-allocation skipped: {alloc_error}")
                     
                     # Write back to storage (manual save always persists)
-                    save_data(df_updated, message="Schedule updated!")
+                    save_data(df_updated, message="Schedule updated!", flush=True)
                     st.session_state.manual_save_triggered = False
                     st.session_state.unsaved_df = None
                     st.session_state.pending_changes = False
@@ -5977,7 +9001,10 @@ if category == "Scheduling":
                     st.error(f"Error saving: {e}")
                     st.session_state.manual_save_triggered = False
             else:
-                # Nothing changed; clear the trigger so it doesn't keep firing on rerun
+                # Nothing changed; still push any queued background saves now
+                if _write_behind_enabled() and not _flush_write_behind():
+                    st.warning("⚠️ Save is still pending; it will be retried in the background.")
+                # Clear the trigger so it doesn't keep firing on rerun
                 st.session_state.manual_save_triggered = False
         else:
             st.session_state.manual_save_triggered = False
@@ -6227,8 +9254,13 @@ if category == "Scheduling":
         
                                 if bool(st.session_state.get("auto_assign_assistants", True)):
                                     only_empty = bool(st.session_state.get("auto_assign_only_empty", True))
-                                    for ix in sorted(allocation_candidates):
-                                        _auto_fill_assistants_for_row(df_updated, ix, only_fill_empty=only_empty)
+                                    try:
+                                        alloc_rows = allocation_candidates
+                                        if bool(st.session_state.get("auto_assign_incremental", True)):
+                                            alloc_rows = allocation_candidates.intersection(incremental_allocation_rows(df_raw, df_updated))
+                                        allocate_assistants_batch(df_updated, sorted(alloc_rows), only_fill_empty=only_empty)
+                                    except Exception as alloc_error:
+                                        st.warning(f"Auto-allocation skipped: {alloc_error}")
         
                                 _maybe_save(df_updated, message=f"Schedule updated for {op}!")
                                 st.rerun()
@@ -6271,8 +9303,7 @@ if category == "Assistants" and assist_view == "Availability":
             s = ""
         return s if s else "UNKNOWN"
     
-    assistant_entries: list[dict] = []
-    for assistant in ALL_ASSISTANTS:
+    def _assistant_entry(assistant: str) -> dict:
         raw_name = assistant.strip().upper()
         info = dict(assistant_status.get(raw_name, {}))
         if not info:
@@ -6281,14 +9312,46 @@ if category == "Assistants" and assist_view == "Availability":
             info["department"] = get_department_for_assistant(raw_name)
         if not info.get("status"):
             info["status"] = "UNKNOWN"
-        assistant_entries.append({
+        if info["status"] in ("BUSY", "BLOCKED"):
+            free_at = next_free_slot(raw_name, df, current_min, 15)
+            if free_at is not None:
+                info["next_free"] = mins_to_hhmm(free_at % 1440)
+        return {
             "name": assistant.title(),
             "raw_name": raw_name,
             "info": info,
-        })
+        }
+
+    assistant_entries: list[dict] = [_assistant_entry(assistant) for assistant in ALL_ASSISTANTS]
     
     assistant_lookup = {entry["raw_name"]: entry for entry in assistant_entries}
-    
+
+    with st.expander("🔎 Find free assistants", expanded=False):
+        col_from, col_to, col_dept = st.columns(3)
+        with col_from:
+            free_from = st.time_input("From", value=time_type(now.hour, now.minute), key="free_window_from")
+        with col_to:
+            default_to = min(now.hour * 60 + now.minute + 60, 23 * 60 + 59)
+            free_to = st.time_input("To", value=time_type(default_to // 60, default_to % 60), key="free_window_to")
+        with col_dept:
+            free_dept = st.selectbox("Department", options=["All"] + list(DEPARTMENTS.keys()), key="free_window_dept")
+        free_from_min = free_from.hour * 60 + free_from.minute
+        free_to_min = free_to.hour * 60 + free_to.minute
+        if free_to_min <= free_from_min:
+            st.warning("End time must be after start time.")
+        else:
+            free_names = assistants_free_between(
+                df,
+                free_from_min,
+                free_to_min,
+                None if free_dept == "All" else get_assistants_for_department(free_dept),
+            )
+            window_label = f"{mins_to_hhmm(free_from_min)}–{mins_to_hhmm(free_to_min)}"
+            if free_names:
+                st.success(f"Free {window_label}: " + ", ".join(name.title() for name in free_names))
+            else:
+                st.info(f"No assistants are free for the whole of {window_label}.")
+
     # Create tabs for each department
     dept_tabs = st.tabs(["📊 All Assistants", "🦷 PROSTHO Department", "🔬 ENDO Department"])
     
@@ -6373,20 +9436,11 @@ if category == "Assistants" and assist_view == "Availability":
         st.markdown("#### PROSTHO Department Assistants")
         prostho_entries: list[dict] = []
         for assistant in DEPARTMENTS["PROSTHO"]["assistants"]:
-            entry = assistant_lookup.get(assistant.upper())
-            if entry is None:
-                fallback_info = {
-                    "status": "UNKNOWN",
-                    "reason": "No schedule",
-                    "department": "PROSTHO",
-                }
-                entry = {"name": assistant.title(), "raw_name": assistant.upper(), "info": fallback_info}
+            # Assistants missing from the staff profiles still have a matrix row
+            entry = assistant_lookup.get(assistant.upper()) or _assistant_entry(assistant)
             prostho_entries.append(entry)
     
-        prostho_counts: dict[str, int] = {}
-        for entry in prostho_entries:
-            status_key = _norm_status_value(entry["info"].get("status"))
-            prostho_counts[status_key] = prostho_counts.get(status_key, 0) + 1
+        prostho_counts = occupancy_counts(df, current_min, DEPARTMENTS["PROSTHO"]["assistants"])
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -6402,20 +9456,11 @@ if category == "Assistants" and assist_view == "Availability":
         st.markdown("#### ENDO Department Assistants")
         endo_entries: list[dict] = []
         for assistant in DEPARTMENTS["ENDO"]["assistants"]:
-            entry = assistant_lookup.get(assistant.upper())
-            if entry is None:
-                fallback_info = {
-                    "status": "UNKNOWN",
-                    "reason": "No schedule",
-                    "department": "ENDO",
-                }
-                entry = {"name": assistant.title(), "raw_name": assistant.upper(), "info": fallback_info}
+            # Assistants missing from the staff profiles still have a matrix row
+            entry = assistant_lookup.get(assistant.upper()) or _assistant_entry(assistant)
             endo_entries.append(entry)
     
-        endo_counts: dict[str, int] = {}
-        for entry in endo_entries:
-            status_key = _norm_status_value(entry["info"].get("status"))
-            endo_counts[status_key] = endo_counts.get(status_key, 0) + 1
+        endo_counts = occupancy_counts(df, current_min, DEPARTMENTS["ENDO"]["assistants"])
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -6454,11 +9499,15 @@ if category == "Assistants" and assist_view == "Auto Allocation":
             available = get_available_assistants(dept, alloc_in_time, alloc_out_time, df)
             
             st.markdown("**Assistant Availability:**")
+            alloc_in_min = alloc_in_time.hour * 60 + alloc_in_time.minute
+            alloc_duration = (alloc_out_time.hour * 60 + alloc_out_time.minute - alloc_in_min) % 1440 or 15
             for a in available:
                 if a["available"]:
                     st.success(f"✅ {a['name']} - Available")
                 else:
-                    st.error(f"❌ {a['name']} - {a['reason']}")
+                    free_at = next_free_slot(a["name"], df, alloc_in_min, alloc_duration)
+                    next_text = f" (next free {mins_to_hhmm(free_at % 1440)})" if free_at is not None else ""
+                    st.error(f"❌ {a['name']} - {a['reason']}{next_text}")
             
             # Auto-allocate button
             if st.button("🎯 Get Recommended Allocation", key="auto_alloc_btn"):
@@ -6484,8 +9533,7 @@ if category == "Assistants" and assist_view == "Workload":
     # Count appointments per assistant
     assistant_workload = {}
     for assistant in ALL_ASSISTANTS:
-        schedule = get_assistant_schedule(assistant.upper(), df)
-        assistant_workload[assistant] = len(schedule)
+        assistant_workload[assistant] = len(_assistant_appointments(assistant, df))
     
     # Create workload dataframe
     workload_data = []
@@ -0,0 +1,122 @@
+"""Shared fixtures: load app.py's functions without running the Streamlit script.
+
+app.py is a single Streamlit script, so importing it would render the whole
+dashboard. `load_app()` executes only its imports, function definitions and
+module-level constants against a minimal stand-in for `streamlit`.
+"""
+import ast
+import functools
+import re
+import types
+from pathlib import Path
+
+import pytest
+
+APP_PATH = Path(__file__).resolve().parents[1] / "app.py"
+_CONSTANT_NAME = re.compile(r"^_?[A-Z][A-Z0-9_]*$")
+_EXTRA_NAMES = {"file_path"}
+
+
+class RerunRequested(Exception):
+    """Raised by the stand-in `st.rerun()`."""
+
+
+class SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError as exc:
+            raise AttributeError(name) from exc
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+def _cache_decorator(func=None, **_kwargs):
+    """Stand-in for st.cache_resource / st.cache_data (memoised per loaded app)."""
+    if func is None:
+        return _cache_decorator
+    memo = {}
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            key = (args, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs)
+        if key not in memo:
+            memo[key] = func(*args, **kwargs)
+        return memo[key]
+
+    wrapper.clear = memo.clear
+    return wrapper
+
+
+def fake_streamlit() -> types.SimpleNamespace:
+    st = types.SimpleNamespace()
+    st.session_state = SessionState()
+    st.secrets = {}
+    st.toasts = []
+    st.cache_resource = _cache_decorator
+    st.cache_data = _cache_decorator
+    st.fragment = lambda func=None, **_kwargs: func if func is not None else (lambda f: f)
+
+    def rerun(*_args, **_kwargs):
+        raise RerunRequested()
+
+    st.rerun = rerun
+    st.toast = lambda text, icon=None: st.toasts.append(text)
+    for name in ("error", "warning", "info", "caption", "success"):
+        setattr(st, name, lambda *args, **kwargs: None)
+    return st
+
+
+def _is_literal(node) -> bool:
+    try:
+        ast.literal_eval(node)
+        return True
+    except Exception:
+        return False
+
+
+def _wanted(node) -> bool:
+    if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef)):
+        return True
+    if isinstance(node, ast.Try):
+        return all(isinstance(n, (ast.Import, ast.ImportFrom, ast.Assign, ast.Pass)) for n in node.body)
+    if isinstance(node, (ast.Assign, ast.AnnAssign)):
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        names = []
+        for target in targets:
+            elts = target.elts if isinstance(target, ast.Tuple) else [target]
+            if not all(isinstance(e, ast.Name) for e in elts):
+                return False
+            names.extend(e.id for e in elts)
+        return all(_CONSTANT_NAME.match(n) or n in _EXTRA_NAMES for n in names) or (
+            node.value is not None and _is_literal(node.value)
+        )
+    return False
+
+
+def load_app() -> dict:
+    """Namespace with app.py's functions and constants, bound to a fresh fake `st`."""
+    st = fake_streamlit()
+    ns = {"__file__": str(APP_PATH), "__name__": "tdb_app_under_test", "st": st}
+    tree = ast.parse(APP_PATH.read_text(encoding="utf-8"))
+    for node in tree.body:
+        if not _wanted(node):
+            continue
+        if isinstance(node, ast.Import) and any(a.name == "streamlit" for a in node.names):
+            continue
+        try:
+            exec(compile(ast.Module([node], type_ignores=[]), str(APP_PATH), "exec"), ns)
+        except Exception:
+            # Statements that need the running app (widgets, loaded data) are skipped.
+            pass
+    return ns
+
+
+@pytest.fixture
+def app():
+    return load_app()
@@ -0,0 +1,167 @@
+"""Batch assistant allocator (allocate_assistants_batch).
+
+Expected assignments were produced by the per-row allocator it replaced
+(_auto_fill_assistants_for_row, called row by row in time order) on the same
+schedules, so these pin the batch path to the old behaviour.
+"""
+import datetime
+import json
+
+import pandas as pd
+import pytest
+
+ROLES = ["FIRST", "SECOND", "Third"]
+COLUMNS = ["REMINDER_ROW_ID", "In Time", "Out Time", "DR.", "STATUS"] + ROLES
+
+
+@pytest.fixture
+def alloc(app):
+    app["now"] = datetime.datetime(2026, 10, 18, 11, 0)
+    app["WEEKLY_OFF"] = {}
+    return app
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def _assign(alloc, rows, positions=None):
+    df = _frame(rows)
+    alloc["allocate_assistants_batch"](df, positions)
+    return df[ROLES].values.tolist()
+
+
+def test_inactive_row_assignments_do_not_block_later_rows(alloc):
+    # A DONE row gets filled too, but must not make its assistants busy.
+    rows = [
+        ("d1", "09:00", "10:00", "DR.HUSSAIN", "DONE", "", "", ""),
+        ("p2", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+    ]
+    assert _assign(alloc, rows) == [["ANSHIKA", "NITIN", "ARCHANA"], ["ANSHIKA", "NITIN", "ARCHANA"]]
+
+
+def test_batch_registers_an_index_matching_the_filled_frame(alloc):
+    df = _frame([
+        ("a", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+        ("b", "09:15", "10:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+    ])
+    alloc["_assistant_index"](df)
+    alloc["allocate_assistants_batch"](df)
+    assert alloc["_assistant_index"](df) == alloc["_build_assistant_index"](df)
+
+
+def test_fills_roles_by_rule_tier(alloc):
+    rows = [("p1", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "", "", "")]
+    assert _assign(alloc, rows) == [["ANSHIKA", "NITIN", "ARCHANA"]]
+    rows = [("e1", "10:00", "11:00", "DR.NIMAI", "WAITING", "", "", "")]
+    assert _assign(alloc, rows) == [["LAVANYA", "MUKHILA", "ROHINI"]]
+
+
+def test_only_empty_roles_of_the_given_row_are_filled(alloc):
+    rows = [
+        ("p1", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "RAJA", "", ""),
+        ("p2", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+    ]
+    assert _assign(alloc, rows, [0]) == [["RAJA", "NITIN", "ARCHANA"], ["", "", ""]]
+
+
+def test_overlapping_rows_take_the_next_free_assistants(alloc):
+    rows = [
+        ("a", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+        ("b", "09:15", "10:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+        ("c", "09:30", "11:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+    ]
+    assert _assign(alloc, rows) == [
+        ["ANSHIKA", "NITIN", "ARCHANA"],
+        ["RAJA", "BABU", "SHAKSHI"],
+        ["RESHMA", "PRAMOTH", ""],
+    ]
+
+
+def test_already_booked_assistants_are_skipped(alloc):
+    rows = [
+        ("b1", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "ANSHIKA", "NITIN", ""),
+        ("p2", "09:30", "10:30", "DR.HUSSAIN", "WAITING", "", "", ""),
+    ]
+    assert _assign(alloc, rows, [1])[1] == ["RAJA", "BABU", "ARCHANA"]
+
+
+def test_unranked_ties_follow_department_order(alloc):
+    # Third has no rule in ENDO: equally ranked candidates go in list order.
+    rows = [
+        ("e1", "10:00", "11:00", "DR.NIMAI", "WAITING", "", "", ""),
+        ("e2", "10:00", "11:00", "DR.FARHATH", "WAITING", "", "", ""),
+    ]
+    assert _assign(alloc, rows) == [["LAVANYA", "MUKHILA", "ROHINI"], ["ANYA", "SHAKSHI", "ARCHANA"]]
+
+
+def test_assistants_shared_between_departments_are_booked_once(alloc):
+    rows = [
+        ("p", "10:00", "11:00", "DR.HUSSAIN", "WAITING", "ANSHIKA", "ARCHANA", "SHAKSHI"),
+        ("e", "10:30", "11:30", "DR.NIMAI", "WAITING", "", "", ""),
+    ]
+    assert _assign(alloc, rows)[1] == ["LAVANYA", "MUKHILA", "ROHINI"]
+
+
+def test_exhausted_department_does_not_borrow_assistants(alloc):
+    rows = [
+        ("e0", "10:00", "11:00", "DR.NIMAI", "WAITING", "ANYA", "LAVANYA", "ROHINI"),
+        ("e1", "10:00", "11:00", "DR.NIMAI", "WAITING", "MUKHILA", "SHAKSHI", "ARCHANA"),
+        ("e2", "10:00", "11:00", "DR.NIMAI", "WAITING", "ANSHIKA", "", ""),
+        ("e3", "10:00", "11:00", "DR.NIMAI", "WAITING", "", "", ""),
+    ]
+    assert _assign(alloc, rows)[2:] == [["ANSHIKA", "", ""], ["", "", ""]]
+
+
+def _rules_file(tmp_path, rules, name="allocation_rules.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps(rules))
+    return str(path)
+
+
+def test_load_balance_breaks_ties_between_equally_ranked_preferred_assistants(alloc, tmp_path):
+    rules = {
+        "version": 1,
+        "global": {"load_balance": True},
+        "departments": {"PROSTHO": {"assistants": ["ANSHIKA", "NITIN", "RAJA"], "allocation_rules": {"FIRST": {"default": [["RAJA", "NITIN"], "ANSHIKA"]}}}},
+    }
+    alloc["ALLOCATION_RULES_PATH"] = _rules_file(tmp_path, rules)
+    rows = [
+        ("m1", "06:00", "08:00", "DR.HUSSAIN", "WAITING", "RAJA", "", ""),
+        ("p", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+    ]
+    # RAJA is listed first but already booked for two hours; NITIN ties with him and wins.
+    assert _assign(alloc, rows, [1])[1][0] == "NITIN"
+
+    rules["global"]["load_balance"] = False
+    alloc["ALLOCATION_RULES_PATH"] = _rules_file(tmp_path, rules, "off.json")
+    assert _assign(alloc, rows, [1])[1][0] == "RAJA"
+
+
+def test_load_balance_keeps_list_positions(alloc, tmp_path):
+    rules = {
+        "version": 1,
+        "global": {"load_balance": True},
+        "departments": {"PROSTHO": {"assistants": ["NITIN", "RAJA"], "allocation_rules": {"FIRST": {"default": ["RAJA", "NITIN"]}}}},
+    }
+    alloc["ALLOCATION_RULES_PATH"] = _rules_file(tmp_path, rules)
+    rows = [
+        ("m1", "06:00", "08:00", "DR.HUSSAIN", "WAITING", "RAJA", "", ""),
+        ("p", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "", "", ""),
+    ]
+    assert _assign(alloc, rows, [1])[1][0] == "RAJA"
+
+
+def test_incremental_rows_keep_rows_with_empty_roles(alloc):
+    before = _frame([
+        ("a", "09:00", "10:00", "DR.HUSSAIN", "WAITING", "ANSHIKA", "NITIN", "ARCHANA"),
+        ("b", "11:00", "12:00", "DR.HUSSAIN", "WAITING", "RAJA", "", ""),
+        ("c", "13:00", "14:00", "DR.HUSSAIN", "WAITING", "RESHMA", "BABU", "SHAKSHI"),
+    ])
+    after = before.copy()
+    after.loc[0, "STATUS"] = "ON GOING"
+
+    assert alloc["incremental_allocation_rows"](before, after) == [0, 1]
+    assert alloc["incremental_allocation_rows"](before, after, include_unfilled=False) == [0]
+    # A notes-only edit (no allocation input changed) still fills open roles
+    assert alloc["incremental_allocation_rows"](before, before.copy()) == [1]
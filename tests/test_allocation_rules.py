@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+DEPARTMENTS = {
+    "PROSTHO": {
+        "doctors": ["DR.HUSSAIN"],
+        "assistants": ["ANSHIKA", "NITIN", "ARCHANA", "RAJA"],
+        "allocation_rules": {
+            "FIRST": {
+                "default": ["ANSHIKA"],
+                "doctor_overrides": {"DR.HUSSAIN": ["RAJA"]},
+                "time_override": [{"after_hour": 13, "assistant": "ARCHANA"}],
+            },
+            "SECOND": {"when_first_is": {"ANSHIKA": ["ARCHANA"]}, "default": ["NITIN"]},
+        },
+    }
+}
+
+
+def test_compiled_ranks_follow_rule_tiers(app):
+    rules = app["_compile_allocation_rules"](DEPARTMENTS)
+    ranks = app["_allocation_role_ranks"]
+
+    morning = ranks(rules, "PROSTHO", "FIRST", "DR.HUSSAIN", 9 * 60)
+    assert morning["ANSHIKA"] == (0, 0, 0)
+    assert morning["RAJA"] == (1, 0, 0)
+    assert "ARCHANA" in morning and morning["ARCHANA"][0] == 4
+
+    afternoon = ranks(rules, "PROSTHO", "FIRST", "DR.OTHER", 13 * 60)
+    assert afternoon["ARCHANA"] == (3, 0, 0)
+    assert afternoon["RAJA"][0] == 4
+
+    second = ranks(rules, "PROSTHO", "SECOND", "DR.HUSSAIN", 9 * 60, first_assistant="anshika")
+    assert second["NITIN"] == (0, 0, 0) and second["ARCHANA"] == (2, 0, 0)
+
+    # Roles without a rule rank every department assistant equally, in list order
+    third = ranks(rules, "PROSTHO", "Third", "DR.HUSSAIN", 9 * 60)
+    assert third == {"ANSHIKA": (4, 0, 0), "NITIN": (4, 0, 1), "ARCHANA": (4, 0, 2), "RAJA": (4, 0, 3)}
+
+
+def test_nested_lists_rank_names_equally(app):
+    departments = {"X": {"assistants": ["A", "B", "C"], "allocation_rules": {"FIRST": {"default": ["C", ["B", "A"]]}}}}
+    ranks = app["_allocation_role_ranks"](app["_compile_allocation_rules"](departments), "X", "FIRST", "", 9 * 60)
+    assert ranks == {"C": (0, 0, 0), "B": (0, 1, 0), "A": (0, 1, 1)}
+
+
+@pytest.mark.parametrize(
+    "departments, flags",
+    [
+        ({"X": {"assistants": "ANYA"}}, None),
+        ({"X": {"assistants": ["ANYA"], "allocation_rules": {"FOURTH": {}}}}, None),
+        ({"X": {"assistants": ["ANYA"], "allocation_rules": {"FIRST": {"time_override": [[25, "ANYA"]]}}}}, None),
+        ({"X": {"assistants": ["ANYA"], "allocation_rules": {"FIRST": {"default": [["ANYA", 3]]}}}}, None),
+        ({}, {"load_balance": "yes"}),
+        ({}, {"no_such_flag": True}),
+    ],
+)
+def test_invalid_rules_are_rejected(app, departments, flags):
+    with pytest.raises(ValueError):
+        app["_compile_allocation_rules"](departments, flags)
+
+
+def test_invalid_file_falls_back_to_builtin_rules(app, tmp_path):
+    path = tmp_path / "allocation_rules.json"
+    path.write_text(json.dumps({"version": 1, "departments": {"PROSTHO": {"assistants": 3}}}))
+    app["ALLOCATION_RULES_PATH"] = str(path)
+
+    rules = app["get_allocation_rules"]()
+
+    assert rules["source"] == "built-in"
+    assert rules["error"].startswith("allocation_rules.json:")
+    assert set(rules["departments"]) == {"PROSTHO", "ENDO"}
+
+
+def test_shipped_rules_file_compiles(app):
+    rules = app["get_allocation_rules"]()
+    assert rules["source"] == "allocation_rules.json"
+    assert rules["error"] == ""
@@ -0,0 +1,35 @@
+import pandas as pd
+
+
+def _schedule():
+    return pd.DataFrame(
+        {
+            "REMINDER_ROW_ID": ["r1", "r2"],
+            "In Time": ["09:00", "10:00"],
+            "Out Time": ["09:30", "10:30"],
+            "STATUS": ["WAITING", "WAITING"],
+            "FIRST": ["ANYA", "BEN"],
+            "SECOND": ["", ""],
+            "Third": ["", ""],
+        }
+    )
+
+
+def test_same_length_in_place_edit_rebuilds_index(app):
+    df = _schedule()
+    assert [r[1] for r in app["_assistant_appointments"]("ANYA", df)] == ["r1"]
+
+    df.loc[1, "FIRST"] = "ANYA"
+
+    assert [r[1] for r in app["_assistant_appointments"]("ANYA", df)] == ["r1", "r2"]
+    assert app["_assistant_appointments"]("BEN", df) == []
+
+
+def test_set_assistant_cell_keeps_index_in_step(app):
+    df = _schedule()
+    app["_assistant_index"](df)
+
+    app["_set_assistant_cell"](df, 0, "SECOND", "BEN")
+
+    assert [(r[1], r[4]) for r in app["_assistant_appointments"]("BEN", df)] == [("r1", "SECOND"), ("r2", "FIRST")]
+    assert app["_assistant_index"](df) == app["_build_assistant_index"](df)
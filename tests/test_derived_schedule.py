@@ -0,0 +1,40 @@
+import pandas as pd
+
+
+def _frame(index):
+    return pd.DataFrame(
+        {"REMINDER_ROW_ID": ["a", "b"], "In Time": ["09:00", "10:00"], "Out Time": ["09:30", "10:30"]},
+        index=index,
+    )
+
+
+def test_content_key_includes_the_index(app):
+    key = app["_schedule_content_key"]
+    hashes = app["_schedule_row_hashes"]
+    first, second = _frame([0, 1]), _frame([5, 7])
+    assert key(first, hashes(first)) != key(second, hashes(second))
+    assert key(first, hashes(first)) == key(_frame([0, 1]), hashes(_frame([0, 1])))
+
+
+def test_derived_frame_keeps_the_callers_index(app):
+    app["_derive_schedule_frame"](_frame([0, 1]))
+    out, _ = app["_derive_schedule_frame"](_frame([5, 7]))
+    assert out.index.tolist() == [5, 7]
+
+
+def test_in_place_edits_do_not_reach_the_cached_frame(app):
+    out, _ = app["_derive_schedule_frame"](_frame([0, 1]))
+    out.loc[0, "In Time"] = "11:00"
+    out.iloc[1, out.columns.get_loc("Out Time")] = "12:00"
+    assert out.loc[0, "In Time"] == "11:00"
+
+    again, _ = app["_derive_schedule_frame"](_frame([0, 1]))
+    assert again["In Time"].tolist() == ["09:00", "10:00"]
+    assert again["Out Time"].tolist() == ["09:30", "10:30"]
+
+
+def test_duplicate_row_ids_are_keyed_by_position(app):
+    frame = pd.DataFrame({"REMINDER_ROW_ID": ["a", "b", "a", ""], "STATUS": ["WAITING", "DONE", "ARRIVED", ""]})
+    rows = app["_build_row_record"](frame, app["_schedule_row_hashes"](frame))
+    assert rows["pos"] == {"a": 0, "b": 1, "#2": 2, "#3": 3}
+    assert rows["status"]["a"] == "WAITING" and rows["status"]["#2"] == "ARRIVED"
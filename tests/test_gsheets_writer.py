@@ -0,0 +1,92 @@
+import re
+import types
+
+
+class FakeWorksheet:
+    """In-memory worksheet supporting the calls the diff writer makes."""
+
+    def __init__(self, grid):
+        self.grid = [list(r) for r in grid]
+        self.id = 1
+        self.title = "Sheet1"
+        self.row_count = 1000
+        self.col_count = 26
+        self.spreadsheet = types.SimpleNamespace(
+            id="s", values_batch_update=self._batch_update, values_batch_get=self._batch_get
+        )
+        self.writes = []
+        self.reads = []
+
+    def _batch_get(self, ranges):
+        self.reads.append(list(ranges))
+        out = []
+        for a1 in ranges:
+            letter = re.search(r"!([A-Z]+):", a1).group(1)
+            col = ord(letter) - ord("A")
+            column = [[r[col]] if col < len(r) and r[col] != "" else [] for r in self.grid]
+            while column and not column[-1]:
+                column.pop()
+            out.append({"range": a1, "values": column})
+        return {"valueRanges": out}
+
+    def _batch_update(self, body):
+        for entry in body["data"]:
+            first = int(re.search(r"!A(\d+):", entry["range"]).group(1))
+            self.writes.append(entry["range"])
+            for offset, row in enumerate(entry["values"]):
+                i = first - 1 + offset
+                while len(self.grid) <= i:
+                    self.grid.append([])
+                self.grid[i] = list(row)
+
+    def get_all_values(self):
+        return [list(r) for r in self.grid]
+
+    def delete_rows(self, start, end=None):
+        del self.grid[start - 1 : (end or start)]
+
+
+HEADER = ["REMINDER_ROW_ID", "Patient Name"]
+
+
+def _save(app, ws, rows):
+    import pandas as pd
+
+    app["_get_or_create_gsheets_meta_worksheet"] = lambda _ws: None
+    df = pd.DataFrame(rows, columns=HEADER)
+    assert app["save_data_to_gsheets"](ws, df)
+
+
+def test_unchanged_baseline_writes_only_changed_rows_and_deletes_tail(app):
+    ws = FakeWorksheet([HEADER, ["a", "A"], ["b", "B"], ["c", "C"]])
+    app["_gsheets_grid_baselines"]()[app["_gsheets_grid_key"](ws)] = ws.get_all_values()
+
+    _save(app, ws, [["a", "A"], ["b", "B2"]])
+
+    assert ws.writes == ["'Sheet1'!A3:B3"]
+    assert ws.reads == [["'Sheet1'!A:A"]]
+    assert ws.grid == [HEADER, ["a", "A"], ["b", "B2"]]
+
+
+def test_rows_inserted_elsewhere_fall_back_to_full_write(app):
+    ws = FakeWorksheet([HEADER, ["a", "A"], ["b", "B"]])
+    app["_gsheets_grid_baselines"]()[app["_gsheets_grid_key"](ws)] = ws.get_all_values()
+    # Another editor inserts a row above "b" after our baseline was taken.
+    ws.grid.insert(2, ["x", "X"])
+
+    _save(app, ws, [["a", "A"], ["b", "B2"]])
+
+    assert ws.grid == [HEADER, ["a", "A"], ["b", "B2"]]
+
+
+def test_values_converted_by_sheets_are_not_rewritten(app):
+    import pandas as pd
+
+    # Sheets hands back numbers and times in its own format after a manual edit.
+    ws = FakeWorksheet([HEADER + ["In Time"], ["7", "A", "9:30:00"], ["b", "2", "2:15 PM"]])
+    app["_gsheets_grid_baselines"]()[app["_gsheets_grid_key"](ws)] = ws.get_all_values()
+    app["_get_or_create_gsheets_meta_worksheet"] = lambda _ws: None
+    df = pd.DataFrame([["7.0", "A", "09:30"], ["b", "2.0", "14:15"]], columns=HEADER + ["In Time"])
+    assert app["save_data_to_gsheets"](ws, df)
+
+    assert ws.writes == []
@@ -0,0 +1,65 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+STAFF = ["ANSHIKA", "NITIN", "RAJA", "ANYA"]
+
+
+@pytest.fixture
+def occ(app):
+    app["now"] = datetime.datetime(2026, 10, 19, 11, 0)  # Monday
+    app["WEEKLY_OFF"] = {0: ["RAJA"]}
+    app["ALL_ASSISTANTS"] = list(STAFF)
+    return app
+
+
+def _schedule():
+    return pd.DataFrame(
+        {
+            "REMINDER_ROW_ID": ["a", "b", "c"],
+            "In Time": ["09:00", "10:30", ""],
+            "Out Time": ["10:00", "11:30", ""],
+            "STATUS": ["WAITING", "ON GOING", "ARRIVED"],
+            "FIRST": ["ANSHIKA", "NITIN", "ANYA"],
+            "SECOND": ["", "", ""],
+            "Third": ["", "", ""],
+        }
+    )
+
+
+def test_free_between_is_a_window_slice(occ):
+    df = _schedule()
+    free = occ["assistants_free_between"]
+    # Window queries use the minute matrix only (ANYA's row has no times).
+    assert free(df, 9 * 60 + 30, 10 * 60, STAFF) == ["NITIN", "ANYA"]
+    assert free(df, 10 * 60, 10 * 60 + 30, STAFF) == ["ANSHIKA", "NITIN", "ANYA"]
+    assert free(df, 10 * 60 + 15, 11 * 60, STAFF) == ["ANSHIKA", "ANYA"]
+    assert free(df, 10 * 60, 10 * 60 + 30, ["nitin", "RAJA", "UNKNOWN"]) == ["NITIN"]
+
+
+def test_counts_treat_forced_busy_and_weekly_off(occ):
+    df = _schedule()
+    # 08:00: NITIN is ON GOING and ANYA ARRIVED without times, so both count as busy.
+    assert occ["occupancy_counts"](df, 8 * 60, STAFF) == {"FREE": 1, "BUSY": 2, "BLOCKED": 1}
+    assert occ["occupancy_counts"](df, 9 * 60 + 15, ["ANSHIKA"]) == {"FREE": 0, "BUSY": 1, "BLOCKED": 0}
+
+
+def test_department_assistants_missing_from_staff_list_are_counted(occ):
+    df = _schedule()
+    df.loc[0, "FIRST"] = "BABU"  # PROSTHO assistant not in ALL_ASSISTANTS
+    counts = occ["occupancy_counts"](df, 9 * 60 + 15, occ["DEPARTMENTS"]["PROSTHO"]["assistants"])
+    # BABU and the ON GOING NITIN are busy, RAJA is off; all eight are counted.
+    assert counts == {"FREE": 5, "BUSY": 2, "BLOCKED": 1}
+    assert occ["get_current_assistant_status"](df)["BABU"]["status"] == "FREE"
+
+
+def test_appointments_end_at_their_out_minute(occ):
+    df = _schedule()
+    counts, free = occ["occupancy_counts"], occ["assistants_free_between"]
+    assert counts(df, 10 * 60 - 1, ["ANSHIKA"])["BUSY"] == 1
+    assert counts(df, 10 * 60, ["ANSHIKA"])["FREE"] == 1
+    occ["now"] = datetime.datetime(2026, 10, 19, 10, 0)
+    assert occ["get_current_assistant_status"](df)["ANSHIKA"]["status"] == "FREE"
+    assert free(df, 9 * 60, 10 * 60, ["ANSHIKA"]) == []
+    assert free(df, 10 * 60, 10 * 60 + 1, ["ANSHIKA"]) == ["ANSHIKA"]
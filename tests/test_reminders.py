@@ -0,0 +1,76 @@
+import json
+import threading
+
+import pandas as pd
+
+
+def _dispatcher_state():
+    return {
+        "cond": threading.Condition(), "frame": None, "rows": None, "stored": None, "dirty": False,
+        "heap": [], "heap_rows": None, "heap_day": None, "snoozed": {}, "dismissed": set(),
+        "ongoing": set(), "upcoming": set(), "minute": None, "events": [], "seq": 0, "tick_seq": 0,
+        "pending": {}, "target": None, "last_error": "",
+    }
+
+
+def _version(app, statuses):
+    frame = pd.DataFrame({
+        "REMINDER_ROW_ID": ["a", "b", "c"],
+        "Patient Name": ["P1", "P2", "P3"],
+        "STATUS": statuses,
+        "In_min": [600, 660, 720],
+    })
+    rows = app["_build_row_record"](frame, app["_schedule_row_hashes"](frame))
+    return frame, rows, app["_reminder_plan"](frame, rows)
+
+
+def test_changed_rows_queue_stored_state_clears(app):
+    d = _dispatcher_state()
+    frame, rows, plan = _version(app, ["WAITING", "WAITING", "WAITING"])
+    app["_absorb_reminder_schedule"](d, frame, rows, plan, 0, 0)
+    d["dismissed"].add("a")
+    d["snoozed"]["b"] = 10_000
+    d["pending"].clear()
+
+    frame, rows, plan = _version(app, ["WAITING", "PENDING", "DONE"])
+    frame = frame.assign(**{"Patient Name": ["P1-edited", "P2", "P3"]})
+    rows = app["_build_row_record"](frame, app["_schedule_row_hashes"](frame))
+    app["_absorb_reminder_schedule"](d, frame, rows, app["_reminder_plan"](frame, rows), 0, 0)
+
+    assert d["pending"] == {
+        "a": {"until": None, "dismissed": False},
+        "b": {"until": None, "dismissed": False},
+    }
+    assert not d["dismissed"] and not d["snoozed"]
+
+
+def test_file_writer_merges_into_the_sidecar(app, tmp_path):
+    path = tmp_path / "reminders.json"
+    path.write_text(json.dumps({"old": {"until": 5, "dismissed": True}}))
+    target = {"backend": "file", "path": str(path)}
+
+    app["_write_reminder_updates"]({"a": {"until": None, "dismissed": True}}, target)
+
+    assert json.loads(path.read_text()) == {
+        "old": {"until": 5, "dismissed": True},
+        "a": {"until": None, "dismissed": True},
+    }
+
+
+def test_store_target_is_plain_config(app):
+    app["USE_SUPABASE"] = False
+    app["USE_GOOGLE_SHEETS"] = False
+    assert app["_reminder_store_target"]() == {"backend": "file", "path": app["LOCAL_REMINDER_STATE_PATH"]}
+
+
+def test_worker_clears_last_error_after_a_clean_pass(app, tmp_path):
+    d = _dispatcher_state()
+    d["last_error"] = "Could not save reminder state: offline"
+    d["pending"] = {"a": {"until": None, "dismissed": True}}
+    d["target"] = {"backend": "file", "path": str(tmp_path / "reminders.json")}
+    d["dirty"] = True
+    threading.Thread(target=app["_reminder_worker"], args=(d,), daemon=True).start()
+
+    with d["cond"]:
+        assert d["cond"].wait_for(lambda: not d["pending"] and not d["last_error"], timeout=5)
+    assert json.loads((tmp_path / "reminders.json").read_text())["a"]["dismissed"] is True
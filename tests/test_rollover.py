@@ -0,0 +1,20 @@
+import pandas as pd
+
+
+def test_rollover_keeps_only_rows_never_started(app):
+    df = pd.DataFrame(
+        {
+            "REMINDER_ROW_ID": ["a", "b", "c", "d", "e", "f"],
+            "STATUS": ["WAITING", "ARRIVED", "ON GOING", "DONE", "", "pending"],
+            "STATUS_LOG": ["x"] * 6,
+            "REMINDER_DISMISSED": [True] * 6,
+        }
+    )
+    df.attrs["meta"] = {"schedule_day": "2026-01-01"}
+
+    out = app["_rollover_schedule"](df, "2026-01-02")
+
+    assert out["REMINDER_ROW_ID"].tolist() == ["a", "e", "f"]
+    assert out["STATUS_LOG"].tolist() == ["", "", ""]
+    assert not out["REMINDER_DISMISSED"].any()
+    assert out.attrs["meta"]["schedule_day"] == "2026-01-02"
@@ -0,0 +1,48 @@
+import pytest
+
+from conftest import RerunRequested
+
+
+def test_local_notifier_publish_subscribe_version(app):
+    notifier = app["make_local_schedule_notifier"]()
+    seen = []
+    unsubscribe = notifier["subscribe"](seen.append)
+
+    assert notifier["version"]() == 0
+    assert notifier["publish"]() == 1
+    assert notifier["version"]() == 1
+    assert seen == [1]
+
+    unsubscribe()
+    notifier["publish"]()
+    assert seen == [1]
+    assert notifier["push_connected"]() is False
+
+
+def test_watcher_reruns_after_publish_through_stub(app):
+    stub = app["make_local_schedule_notifier"]()
+    app["set_schedule_notifier"](stub)
+    st = app["st"]
+
+    app["_render_schedule_change_watcher"]()
+    assert st.session_state.seen_schedule_epoch == 0
+
+    # Nothing published: the watcher stays quiet.
+    app["_render_schedule_change_watcher"]()
+
+    stub["publish"]()
+    with pytest.raises(RerunRequested):
+        app["_render_schedule_change_watcher"]()
+    assert st.session_state.seen_schedule_epoch == stub["version"]() == 1
+
+
+def test_realtime_notifier_shares_base_epoch(app):
+    base = app["make_local_schedule_notifier"]()
+    base["publish"]()
+    realtime = app["make_supabase_realtime_notifier"]("http://x", "k", "t", "main", base)
+
+    assert realtime["version"]() == 1
+    realtime["publish"]()
+    assert base["version"]() == 2
+    assert realtime["push_connected"]() is False
+    assert callable(realtime["start"])
@@ -0,0 +1,78 @@
+import datetime
+
+import pytest
+
+HEADER = ["block_id", "date", "assistant", "start_time", "end_time", "reason"]
+
+
+class FakeBlocksSheet:
+    def __init__(self, rows):
+        self.rows = [list(r) for r in rows]
+        self.cleared = False
+
+    def col_values(self, col):
+        return [r[col - 1] for r in self.rows]
+
+    def append_rows(self, rows, value_input_option=None):
+        self.rows.extend(list(r) for r in rows)
+
+    def update(self, values=None, range_name=None, value_input_option=None):
+        n = int(range_name.split(":")[0][1:])
+        self.rows[n - 1] = list(values[0])
+
+    def delete_rows(self, start, end=None):
+        del self.rows[start - 1 : (end or start)]
+
+    def clear(self):
+        self.cleared = True
+
+
+@pytest.fixture
+def blocks_app(app):
+    app["USE_SUPABASE"] = False
+    app["USE_GOOGLE_SHEETS"] = True
+    app["gsheet_worksheet"] = object()
+    return app
+
+
+def _block(block_id, day):
+    return {
+        "id": block_id, "date": day, "assistant": "RAJA", "reason": "Lunch",
+        "start_time": datetime.time(13, 0), "end_time": datetime.time(13, 30),
+    }
+
+
+def _use_sheet(app, sheet):
+    app["_get_gsheets_time_blocks_worksheet"] = lambda _ws: sheet
+    return sheet
+
+
+def test_add_appends_one_row_and_keeps_other_blocks(blocks_app):
+    sheet = _use_sheet(blocks_app, FakeBlocksSheet([HEADER, ["other", "2026-10-18", "ANYA", "09:00", "10:00", "x"]]))
+
+    assert blocks_app["_persist_time_block_change"](added=_block("b1", "2026-10-18"))
+
+    assert not sheet.cleared
+    assert sheet.rows[1][0] == "other"
+    assert sheet.rows[2] == ["b1", "2026-10-18", "RAJA", "13:00", "13:30", "Lunch"]
+
+
+def test_add_to_empty_sheet_writes_header(blocks_app):
+    sheet = _use_sheet(blocks_app, FakeBlocksSheet([]))
+    blocks_app["_persist_time_block_change"](added=_block("b1", "2026-10-18"))
+    assert sheet.rows[0] == HEADER and sheet.rows[1][0] == "b1"
+
+
+def test_remove_and_prune_delete_only_matching_rows(blocks_app):
+    sheet = _use_sheet(blocks_app, FakeBlocksSheet([
+        HEADER,
+        ["old1", "2026-10-16", "RAJA", "09:00", "10:00", ""],
+        ["keep", "2026-10-18", "RAJA", "09:00", "10:00", ""],
+        ["old2", "2026-10-17", "RAJA", "09:00", "10:00", ""],
+        ["gone", "2026-10-18", "RAJA", "11:00", "12:00", ""],
+    ]))
+
+    blocks_app["_persist_time_block_change"](removed=_block("gone", "2026-10-18"))
+    blocks_app["_persist_time_block_change"](pruned_before="2026-10-18")
+
+    assert [r[0] for r in sheet.rows] == ["block_id", "keep"]
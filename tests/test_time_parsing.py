@@ -0,0 +1,25 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+SAMPLES = [
+    "09:30", "9:05", " 14:45:10 ", "2:30 PM", "12:00 am", "12:15PM", "11:59:59 pm",
+    "9.30", "13.5", "N/A", "", "none", "NaT", "garbage", "25:00",
+    0.5, 0.0, 9.3, 9.75, 23.99, 1, 24, -1,
+    datetime.time(8, 20), pd.Timestamp("2026-01-01 07:45"), None, np.nan, pd.NA,
+]
+
+
+def test_vectorized_parser_matches_scalar_parser(app):
+    series = pd.Series(SAMPLES, dtype=object)
+    got = app["_times_to_minutes_vectorized"](series).tolist()
+    want = [app["time_to_minutes"](v) for v in SAMPLES]
+    assert [None if pd.isna(v) else int(v) for v in got] == want
+
+
+def test_vectorized_parser_numeric_column(app):
+    series = pd.Series([0.25, 9.3, np.nan, 30.0])
+    got = app["_times_to_minutes_vectorized"](series)
+    assert str(got.dtype) == "Int64"
+    assert [None if pd.isna(v) else int(v) for v in got] == [360, 570, None, None]